@@ -0,0 +1,262 @@
+"""
+地图点聚合索引
+点按Web墨卡托坐标的Z序（Morton）编码排序：任一缩放级别下同一网格内的点在数组中连续，
+各级别的聚合只需记录每个网格的起始下标，数量和中心由前缀和求出。
+每个级别另存按行优先排序的网格键，视口查询对每个网格行做一次二分查找
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 聚合的最大缩放级别，更大的级别返回单个点
+MAX_CLUSTER_ZOOM = 16
+
+# 每个256像素瓦片在每个方向上划分的网格数的对数（2即64像素的网格）
+CELL_BITS = 2
+
+# 单次查询最多覆盖的网格行数
+MAX_QUERY_ROWS = 2048
+
+# Web墨卡托的纬度范围
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def mercator_x(lngs: np.ndarray) -> np.ndarray:
+    """经度转换为[0, 1)的墨卡托x"""
+    return np.mod(np.asarray(lngs, dtype=np.float64) + 180.0, 360.0) / 360.0
+
+
+def mercator_y(lats: np.ndarray) -> np.ndarray:
+    """纬度转换为[0, 1]的墨卡托y（北为0）"""
+    sin_lat = np.sin(np.radians(np.clip(np.asarray(lats, dtype=np.float64), -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT)))
+    return 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+
+
+def _lat_from_y(y: np.ndarray) -> np.ndarray:
+    return np.degrees(np.arctan(np.sinh(math.pi * (1 - 2 * y))))
+
+
+def _spread_bits(values: np.ndarray) -> np.ndarray:
+    """把32位以内整数的各位间隔一位展开"""
+    v = values.astype(np.uint64)
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+                        (2, 0x3333333333333333), (1, 0x5555555555555555)):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+class ClusterIndex:
+    """
+    可增量更新的分级网格聚合索引，位置（position）指构建时传入点的下标，
+    增量加入的点使用调用方给定的新位置
+    """
+
+    def __init__(self, lats: Sequence[float], lngs: Sequence[float], max_zoom: int = MAX_CLUSTER_ZOOM):
+        """
+        构建索引
+
+        Args:
+            lats: 纬度（度）
+            lngs: 经度（度）
+            max_zoom: 聚合的最大缩放级别
+        """
+        self.max_zoom = int(max_zoom)
+        self.bits = self.max_zoom + CELL_BITS
+        self.size = len(lats)
+
+        xs = mercator_x(lngs)
+        ys = mercator_y(lats)
+        codes = self._codes(xs, ys)
+        order = np.argsort(codes, kind='stable')
+        self._codes_sorted = codes[order]
+        self._positions = order.astype(np.int64)
+        self._ranks = np.empty(self.size, dtype=np.int64)
+        self._ranks[order] = np.arange(self.size, dtype=np.int64)
+        self._x = xs[order]
+        self._y = ys[order]
+        self._prefix_x = np.concatenate([[0.0], np.cumsum(self._x)])
+        self._prefix_y = np.concatenate([[0.0], np.cumsum(self._y)])
+
+        # 每个级别：网格起始下标（末尾附加size）、按行优先排序的网格键及其对应的网格序号
+        self._levels = []
+        for zoom in range(self.max_zoom + 1):
+            shifted = self._codes_sorted >> (2 * (self.max_zoom - zoom))
+            starts = np.flatnonzero(np.concatenate([[True], shifted[1:] != shifted[:-1]])) if self.size else \
+                np.empty(0, dtype=np.int64)
+            cols, rows = self._cell_of(starts, zoom)
+            row_keys = rows * (1 << (zoom + CELL_BITS)) + cols
+            key_order = np.argsort(row_keys, kind='stable')
+            self._levels.append((
+                np.append(starts, self.size).astype(np.int64),
+                row_keys[key_order],
+                key_order.astype(np.int32)
+            ))
+
+        # 已删除的构建时点（按排序下标）及其坐标前缀和
+        self._removed_ranks = np.empty(0, dtype=np.int64)
+        self._removed_prefix_x = np.zeros(1)
+        self._removed_prefix_y = np.zeros(1)
+        # 增量加入的点：位置 -> (x, y)
+        self._pending: Dict[int, Tuple[float, float]] = {}
+
+    def _codes(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """最细级别网格的Morton编码"""
+        n = 1 << self.bits
+        cols = np.clip((xs * n).astype(np.int64), 0, n - 1)
+        rows = np.clip((ys * n).astype(np.int64), 0, n - 1)
+        return (_spread_bits(cols) | (_spread_bits(rows) << np.uint64(1))).astype(np.int64)
+
+    def _cell_of(self, sorted_index: np.ndarray, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+        """排序下标处的点在指定级别的网格列和行"""
+        n = 1 << self.bits
+        shift = self.max_zoom - zoom
+        cols = np.clip((self._x[sorted_index] * n).astype(np.int64), 0, n - 1) >> shift
+        rows = np.clip((self._y[sorted_index] * n).astype(np.int64), 0, n - 1) >> shift
+        return cols, rows
+
+    def add(self, position: int, lat: float, lng: float):
+        """增量加入点（位置不小于构建时的点数）"""
+        self._pending[position] = (float(mercator_x([lng])[0]), float(mercator_y([lat])[0]))
+
+    def remove(self, position: int):
+        """删除点"""
+        if position >= self.size:
+            self._pending.pop(position, None)
+            return
+        rank = self._ranks[position]
+        index = np.searchsorted(self._removed_ranks, rank)
+        if index < len(self._removed_ranks) and self._removed_ranks[index] == rank:
+            return
+        self._removed_ranks = np.insert(self._removed_ranks, index, rank)
+        self._removed_prefix_x = np.concatenate([[0.0], np.cumsum(self._x[self._removed_ranks])])
+        self._removed_prefix_y = np.concatenate([[0.0], np.cumsum(self._y[self._removed_ranks])])
+
+    def _viewport_cells(self, west: float, south: float, east: float, north: float,
+                        zoom: int) -> Tuple[Tuple[int, int], List[Tuple[int, int]]]:
+        """视口覆盖的网格行范围和列范围（跨越±180°经线时为两段）"""
+        n = 1 << (zoom + CELL_BITS)
+        row_start, row_end = np.clip((mercator_y([north, south]) * n).astype(np.int64), 0, n - 1).tolist()
+        if row_end - row_start + 1 > MAX_QUERY_ROWS:
+            raise ValueError('视口范围过大，请提高缩放级别')
+
+        if east - west >= 360.0:
+            return (row_start, row_end), [(0, n - 1)]
+        col_start, col_end = np.minimum((mercator_x([west, east]) * n).astype(np.int64), n - 1).tolist()
+        if col_start <= col_end:
+            return (row_start, row_end), [(col_start, col_end)]
+        return (row_start, row_end), [(col_start, n - 1), (0, col_end)]
+
+    def _expansion_zooms(self, starts: np.ndarray, ends: np.ndarray, zoom: int) -> np.ndarray:
+        """网格中的点开始分开显示的级别（超过最大聚合级别后逐点显示）"""
+        first = self._codes_sorted[starts]
+        last = self._codes_sorted[ends - 1]
+        result = np.full(len(starts), self.max_zoom + 1, dtype=np.int64)
+        for level in range(self.max_zoom, zoom, -1):
+            shift = 2 * (self.max_zoom - level)
+            result[(first >> shift) != (last >> shift)] = level
+        return result
+
+    def query(self, west: float, south: float, east: float, north: float,
+              zoom: int) -> Tuple[List[Dict], List[int]]:
+        """
+        视口聚合查询
+
+        返回与视口相交的网格的聚合结果：含多个点的网格作为聚合点（坐标为墨卡托平面上的中心），
+        只含一个点的网格直接返回该点；缩放级别超过最大聚合级别时返回全部单个点。
+
+        Args:
+            west: 视口西边界经度
+            south: 视口南边界纬度
+            east: 视口东边界经度（小于west时表示跨越±180°经线）
+            north: 视口北边界纬度
+            zoom: 地图缩放级别
+
+        Returns:
+            (聚合点列表, 单个点的位置列表)；聚合点含id、coordinates、count、expansionZoom
+
+        Raises:
+            ValueError: 视口覆盖的网格过多
+        """
+        zoom = max(int(zoom), 0)
+        expand = zoom > self.max_zoom
+        level = min(zoom, self.max_zoom)
+        (row_start, row_end), col_ranges = self._viewport_cells(west, south, east, north, level)
+        starts_all, row_keys, key_order = self._levels[level]
+        n = 1 << (level + CELL_BITS)
+        shift = 2 * (self.max_zoom - level)
+
+        rows = np.arange(row_start, row_end + 1, dtype=np.int64) * n
+        lows = np.concatenate([rows + start for start, _ in col_ranges])
+        highs = np.concatenate([rows + end + 1 for _, end in col_ranges])
+        lefts = np.searchsorted(row_keys, lows, side='left')
+        rights = np.searchsorted(row_keys, highs, side='left')
+        cells = [key_order[left:right] for left, right in zip(lefts.tolist(), rights.tolist()) if right > left]
+        cells = np.concatenate(cells).astype(np.int64) if cells else np.empty(0, dtype=np.int64)
+
+        starts, ends = starts_all[cells], starts_all[cells + 1]
+        counts = ends - starts
+        sum_x = self._prefix_x[ends] - self._prefix_x[starts]
+        sum_y = self._prefix_y[ends] - self._prefix_y[starts]
+        if len(self._removed_ranks):
+            removed_lo = np.searchsorted(self._removed_ranks, starts)
+            removed_hi = np.searchsorted(self._removed_ranks, ends)
+            counts = counts - (removed_hi - removed_lo)
+            sum_x = sum_x - (self._removed_prefix_x[removed_hi] - self._removed_prefix_x[removed_lo])
+            sum_y = sum_y - (self._removed_prefix_y[removed_hi] - self._removed_prefix_y[removed_lo])
+
+        keys = self._codes_sorted[starts] >> shift
+        expansion = self._expansion_zooms(starts, ends, level) if len(starts) and not expand else None
+
+        # 增量点按网格合并进结果
+        pending_by_key: Dict[int, List[int]] = {}
+        if self._pending:
+            pending_positions = list(self._pending)
+            px = np.array([self._pending[position][0] for position in pending_positions])
+            py = np.array([self._pending[position][1] for position in pending_positions])
+            pending_keys = (self._codes(px, py) >> shift).tolist()
+            cols = np.minimum((px * n).astype(np.int64), n - 1).tolist()
+            prows = np.clip((py * n).astype(np.int64), 0, n - 1).tolist()
+            for position, key, col, row in zip(pending_positions, pending_keys, cols, prows):
+                if row_start <= row <= row_end and any(start <= col <= end for start, end in col_ranges):
+                    pending_by_key.setdefault(key, []).append(position)
+
+        clusters, singles = [], []
+        removed = set(self._removed_ranks.tolist()) if len(self._removed_ranks) else ()
+        for index, key in enumerate(keys.tolist()):
+            extra = pending_by_key.pop(key, [])
+            count = int(counts[index]) + len(extra)
+            if count == 0:
+                continue
+            if expand or count == 1:
+                singles.extend(self._positions[rank] for rank in range(int(starts[index]), int(ends[index]))
+                               if rank not in removed)
+                singles.extend(extra)
+                continue
+            x = float(sum_x[index]) + sum(self._pending[position][0] for position in extra)
+            y = float(sum_y[index]) + sum(self._pending[position][1] for position in extra)
+            clusters.append(self._cluster(level, key, count, x, y, int(expansion[index])))
+
+        for key, extra in pending_by_key.items():
+            if expand or len(extra) == 1:
+                singles.extend(extra)
+                continue
+            x = sum(self._pending[position][0] for position in extra)
+            y = sum(self._pending[position][1] for position in extra)
+            clusters.append(self._cluster(level, key, len(extra), x, y, level + 1))
+
+        return clusters, [int(position) for position in singles]
+
+    @staticmethod
+    def _cluster(zoom: int, key: int, count: int, sum_x: float, sum_y: float, expansion_zoom: int) -> Dict:
+        x, y = sum_x / count, sum_y / count
+        return {
+            'id': f'{zoom}/{key}',
+            'coordinates': {
+                'lat': round(float(_lat_from_y(np.array([y]))[0]), 6),
+                'lng': round(x * 360.0 - 180.0, 6)
+            },
+            'count': count,
+            'expansionZoom': expansion_zoom
+        }
@@ -0,0 +1,367 @@
+"""
+容量与时间感知的POI聚类
+在地理聚类的基础上考虑每个POI的停留时间和当天的估算交通时间，使每天的行程一次性落在时间预算内
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from algorithms.distance_matrix import haversine_matrix
+
+# 以最近邻距离之和估算单日路线长度时的放大系数（路线长度通常比最近邻距离之和长）
+TOUR_LENGTH_FACTOR = 1.3
+
+# 分配-更新中心的最大迭代轮数
+MAX_ASSIGNMENT_ROUNDS = 10
+
+# 为估算误差预留的预算比例（按95%的时间预算做分配）
+CAPACITY_SAFETY_RATIO = 0.95
+
+# 达到该POI数量时改用sklearn的MiniBatchKMeans，否则使用内置NumPy实现
+DEFAULT_SKLEARN_THRESHOLD = 500
+
+# 内置k-means的重启次数和最大迭代次数
+KMEANS_N_INIT = 4
+KMEANS_MAX_ITER = 50
+
+
+def _project(coordinates: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    等距圆柱投影：经度按平均纬度的余弦缩放，使欧氏距离近似地面距离
+
+    Returns:
+        (投影后的点, 经度缩放系数)
+    """
+    scale = float(np.cos(np.radians(coordinates[:, 0].mean())))
+    scale = max(scale, 1e-6)
+    return coordinates * np.array([1.0, scale]), scale
+
+
+def _kmeans_plus_plus(points: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """k-means++初始化：按与已选中心距离的平方加权抽样"""
+    n = len(points)
+    centers = np.empty((k, points.shape[1]))
+    centers[0] = points[rng.integers(n)]
+    closest = ((points - centers[0]) ** 2).sum(axis=1)
+
+    for i in range(1, k):
+        total = closest.sum()
+        if total <= 0:
+            # 剩余点与已有中心重合，随机补齐
+            centers[i:] = points[rng.integers(n, size=k - i)]
+            break
+        index = int(np.searchsorted(np.cumsum(closest), rng.random() * total))
+        centers[i] = points[min(index, n - 1)]
+        closest = np.minimum(closest, ((points - centers[i]) ** 2).sum(axis=1))
+
+    return centers
+
+
+def lloyd_kmeans(points: np.ndarray, k: int, n_init: int = KMEANS_N_INIT,
+                 max_iter: int = KMEANS_MAX_ITER, seed: int = 42,
+                 deadline: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    k-means++初始化的Lloyd算法（NumPy实现），适用于小规模输入
+
+    Args:
+        points: (n, d)点集
+        k: 簇数
+        n_init: 重启次数，取惯性最小的结果
+        max_iter: 每次的最大迭代次数
+        seed: 随机种子
+        deadline: 截止时间（time.perf_counter()），到期后不再重启，返回已有的最好结果
+
+    Returns:
+        (中心(k, d), 标签(n,))
+    """
+    rng = np.random.default_rng(seed)
+    best = None
+
+    for _ in range(n_init):
+        if best is not None and deadline is not None and time.perf_counter() >= deadline:
+            break
+        centers = _kmeans_plus_plus(points, k, rng)
+        labels = None
+        for _ in range(max_iter):
+            distances = ((points[:, np.newaxis, :] - centers[np.newaxis, :, :]) ** 2).sum(axis=2)
+            new_labels = distances.argmin(axis=1)
+            if labels is not None and np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+
+            counts = np.bincount(labels, minlength=k)
+            sums = np.zeros_like(centers)
+            np.add.at(sums, labels, points)
+            occupied = counts > 0
+            centers[occupied] = sums[occupied] / counts[occupied, np.newaxis]
+
+        inertia = float(distances[np.arange(len(points)), labels].sum())
+        if best is None or inertia < best[0]:
+            best = (inertia, centers.copy(), labels)
+
+    return best[1], best[2]
+
+
+def kmeans_centers(coordinates: np.ndarray, k: int,
+                   sklearn_threshold: int = DEFAULT_SKLEARN_THRESHOLD,
+                   seed: int = 42, deadline: Optional[float] = None) -> np.ndarray:
+    """
+    计算地理聚类中心：小规模输入使用内置实现，大规模输入按需导入sklearn
+
+    Args:
+        coordinates: (n, 2)坐标（度）
+        k: 簇数
+        sklearn_threshold: 达到该数量时使用sklearn的MiniBatchKMeans
+        seed: 随机种子
+        deadline: 内置实现的截止时间（time.perf_counter()）
+
+    Returns:
+        (k, 2)中心坐标（度）
+    """
+    points, scale = _project(np.asarray(coordinates, dtype=np.float64))
+
+    if len(points) < sklearn_threshold:
+        centers, _ = lloyd_kmeans(points, k, seed=seed, deadline=deadline)
+    else:
+        # 延迟导入，避免sklearn拖慢工作进程启动
+        from sklearn.cluster import MiniBatchKMeans
+        model = MiniBatchKMeans(n_clusters=k, random_state=seed, n_init=3, batch_size=1024)
+        centers = model.fit(points).cluster_centers_
+
+    return centers / np.array([1.0, scale])
+
+
+class DayCostModel:
+    """单日耗时估算：停留时间 + 按线性模型估算的交通时间"""
+
+    def __init__(self, matrix: np.ndarray, stay_minutes: np.ndarray,
+                 leg_base_minutes: float, leg_minutes_per_km: float):
+        """
+        Args:
+            matrix: N×N距离矩阵（公里）
+            stay_minutes: 每个POI的停留时间（分钟）
+            leg_base_minutes: 每段交通的固定耗时（分钟，如等车时间）
+            leg_minutes_per_km: 每公里交通耗时（分钟）
+        """
+        self.matrix = matrix
+        self.stay = np.asarray(stay_minutes, dtype=np.float64)
+        self.leg_base = leg_base_minutes
+        self.per_km = leg_minutes_per_km
+
+    def day_cost(self, members: Sequence[int]) -> float:
+        """
+        估算一天访问members的总耗时（分钟）
+
+        Args:
+            members: 当天POI索引
+
+        Returns:
+            估算耗时
+        """
+        count = len(members)
+        if count == 0:
+            return 0.0
+        stay = float(self.stay[list(members)].sum())
+        if count == 1:
+            return stay
+
+        sub = self.matrix[np.ix_(members, members)].astype(np.float64, copy=True)
+        np.fill_diagonal(sub, np.inf)
+        nearest_sum = float(sub.min(axis=1).sum())
+        # n个点的开放路径共n-1段，最近邻距离之和按段数折算
+        travel_km = nearest_sum * (count - 1) / count * TOUR_LENGTH_FACTOR
+        return stay + (count - 1) * self.leg_base + travel_km * self.per_km
+
+    def insertion_cost(self, index: int, members: Sequence[int]) -> float:
+        """
+        估算把index加入members后增加的耗时（分钟）
+
+        Args:
+            index: 待加入的POI索引
+            members: 当天已有POI索引
+
+        Returns:
+            增加的耗时
+        """
+        if not members:
+            return float(self.stay[index])
+        nearest = float(self.matrix[index, list(members)].min())
+        return float(self.stay[index]) + self.leg_base + nearest * TOUR_LENGTH_FACTOR * self.per_km
+
+
+def _assign(centroid_distance: np.ndarray, model: DayCostModel,
+            capacity: float) -> List[List[int]]:
+    """
+    按后悔值从大到小依次将POI分配到最近且容量允许的中心
+
+    Args:
+        centroid_distance: (n, k) POI到各中心的距离
+        model: 单日耗时模型
+        capacity: 每天的时间容量（分钟）
+
+    Returns:
+        每天的POI索引
+    """
+    n, k = centroid_distance.shape
+    ranked = np.argsort(centroid_distance, axis=1)
+
+    if k > 1:
+        sorted_distance = np.take_along_axis(centroid_distance, ranked[:, :2], axis=1)
+        regret = sorted_distance[:, 1] - sorted_distance[:, 0]
+    else:
+        regret = np.zeros(n)
+
+    clusters: List[List[int]] = [[] for _ in range(k)]
+    loads = np.zeros(k)
+
+    # 后悔值大的POI（离次近中心远）优先分配，避免被挤到很远的天
+    for index in np.argsort(-regret, kind='stable'):
+        index = int(index)
+        best_cluster = None
+        best_overload = None
+        for cluster in ranked[index]:
+            cluster = int(cluster)
+            increase = model.insertion_cost(index, clusters[cluster])
+            if loads[cluster] + increase <= capacity:
+                best_cluster = cluster
+                break
+            overload = loads[cluster] + increase
+            if best_overload is None or overload < best_overload:
+                best_cluster, best_overload = cluster, overload
+        clusters[best_cluster].append(index)
+        loads[best_cluster] += model.insertion_cost(index, clusters[best_cluster][:-1])
+
+    return clusters
+
+
+def _repair(clusters: List[List[int]], model: DayCostModel, capacity: float,
+            max_moves: int, deadline: Optional[float] = None) -> List[List[int]]:
+    """
+    将超出时间预算的天中的POI移动到有余量的天，每次选择增加耗时最少的移动
+
+    Args:
+        clusters: 每天的POI索引
+        model: 单日耗时模型
+        capacity: 每天的时间容量（分钟）
+        max_moves: 最大移动次数
+        deadline: 截止时间（time.perf_counter()），到期后停止移动
+
+    Returns:
+        修复后的每天POI索引
+    """
+    loads = [model.day_cost(members) for members in clusters]
+
+    for _ in range(max_moves):
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+        overloaded = max(range(len(clusters)), key=lambda day: loads[day])
+        if loads[overloaded] <= capacity or len(clusters[overloaded]) <= 1:
+            break
+
+        best = None
+        for index in clusters[overloaded]:
+            remaining = [i for i in clusters[overloaded] if i != index]
+            source_load = model.day_cost(remaining)
+            for day, members in enumerate(clusters):
+                if day == overloaded:
+                    continue
+                target_load = model.day_cost(members + [index])
+                if target_load > capacity:
+                    continue
+                added = target_load - loads[day]
+                if best is None or added < best[0]:
+                    best = (added, index, day, source_load, target_load)
+
+        if best is None:
+            break
+
+        _, index, day, source_load, target_load = best
+        clusters[overloaded].remove(index)
+        clusters[day].append(index)
+        loads[overloaded] = source_load
+        loads[day] = target_load
+
+    return clusters
+
+
+def _fill_empty_days(clusters: List[List[int]], coordinates: np.ndarray) -> List[List[int]]:
+    """确保每天至少有一个POI：从POI最多的天移出离其中心最远的POI"""
+    for empty_day in [day for day, members in enumerate(clusters) if not members]:
+        fullest = max(range(len(clusters)), key=lambda day: len(clusters[day]))
+        if len(clusters[fullest]) <= 1:
+            break
+        members = clusters[fullest]
+        center = coordinates[members].mean(axis=0, keepdims=True)
+        farthest = members[int(np.argmax(haversine_matrix(coordinates[members], center)[:, 0]))]
+        members.remove(farthest)
+        clusters[empty_day].append(farthest)
+    return clusters
+
+
+def balanced_clusters(coordinates: np.ndarray, matrix: np.ndarray, stay_minutes: np.ndarray,
+                      num_days: int, capacity: float, initial_centers: np.ndarray,
+                      leg_base_minutes: float, leg_minutes_per_km: float,
+                      max_rounds: int = MAX_ASSIGNMENT_ROUNDS,
+                      deadline: Optional[float] = None,
+                      stats: Optional[Dict[str, Any]] = None) -> Tuple[List[List[int]], List[float]]:
+    """
+    容量感知的平衡聚类
+
+    1. 以地理聚类中心为种子，按后悔值顺序做容量约束分配，并迭代更新中心；
+    2. 对仍超出预算的天，把POI移动到增加耗时最少且有余量的天；
+    3. 总耗时超过num_days×capacity时，容量放宽为平均负载，使各天尽量均衡。
+
+    设置deadline时，第一轮分配之后每一步都会检查截止时间，到期后直接返回当前分配。
+
+    Args:
+        coordinates: (n, 2)坐标（度）
+        matrix: N×N距离矩阵（公里）
+        stay_minutes: 每个POI的停留时间（分钟）
+        num_days: 天数
+        capacity: 每天时间预算（分钟）
+        initial_centers: (num_days, 2)初始中心
+        leg_base_minutes: 每段交通的固定耗时（分钟）
+        leg_minutes_per_km: 每公里交通耗时（分钟）
+        max_rounds: 分配-更新中心的最大迭代轮数
+        deadline: 截止时间（time.perf_counter()）
+        stats: 传入字典时写入迭代轮数、是否收敛和是否因截止时间提前结束
+
+    Returns:
+        (每天的POI索引列表, 每天的估算耗时)
+    """
+    model = DayCostModel(matrix, stay_minutes, leg_base_minutes, leg_minutes_per_km)
+
+    # 总量超出时按平均负载均衡，而不是让少数几天严重超时
+    total_estimate = model.day_cost(list(range(len(coordinates))))
+    capacity = max(capacity * CAPACITY_SAFETY_RATIO, total_estimate / num_days)
+
+    centers = np.asarray(initial_centers, dtype=np.float64)
+    clusters = None
+    rounds = 0
+    converged = False
+    for _ in range(max_rounds):
+        if clusters is not None and deadline is not None and time.perf_counter() >= deadline:
+            break
+        rounds += 1
+        assigned = [sorted(members) for members in
+                    _assign(haversine_matrix(coordinates, centers), model, capacity)]
+        if assigned == clusters:
+            converged = True
+            break
+        clusters = assigned
+        centers = np.array([
+            coordinates[members].mean(axis=0) if members else centers[day]
+            for day, members in enumerate(clusters)
+        ])
+
+    clusters = _repair(clusters, model, capacity, max_moves=len(coordinates), deadline=deadline)
+    clusters = [sorted(members) for members in _fill_empty_days(clusters, coordinates)]
+
+    if stats is not None:
+        stats['rounds'] = rounds
+        stats['converged'] = converged
+        stats['budget_exhausted'] = deadline is not None and time.perf_counter() >= deadline
+
+    return clusters, [model.day_cost(members) for members in clusters]
@@ -0,0 +1,174 @@
+"""
+优化过程诊断
+分阶段计时、缓存命中、每天的求解器与迭代次数；未启用时使用空实现，开销可忽略
+"""
+
+import json
+import logging
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, List
+
+
+class _PhaseTimer:
+    """阶段计时上下文，退出时将耗时累加到所属诊断对象"""
+
+    __slots__ = ('diagnostics', 'name', 'started')
+
+    def __init__(self, diagnostics: 'Diagnostics', name: str):
+        self.diagnostics = diagnostics
+        self.name = name
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.diagnostics.add_time(self.name, (time.perf_counter() - self.started) * 1000)
+        return False
+
+
+class _NullTimer:
+    """空计时上下文"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Diagnostics:
+    """单次优化的诊断信息"""
+
+    enabled = True
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.values: Dict[str, Any] = {}
+        self.days: List[Dict[str, Any]] = []
+
+    def phase(self, name: str) -> _PhaseTimer:
+        """
+        阶段计时上下文，同名阶段多次进入时累加
+
+        Args:
+            name: 阶段名称
+
+        Returns:
+            上下文管理器
+        """
+        return _PhaseTimer(self, name)
+
+    def add_time(self, name: str, elapsed_ms: float):
+        """累加阶段耗时（毫秒）"""
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed_ms
+
+    def set(self, key: str, value: Any):
+        """记录一项诊断值"""
+        self.values[key] = value
+
+    def add_day(self, day_stats: Dict[str, Any]):
+        """记录单日求解信息"""
+        self.days.append(day_stats)
+
+    def activate(self):
+        """设为当前上下文的诊断对象，返回用于deactivate的令牌"""
+        return _current.set(self)
+
+    def deactivate(self, token):
+        """恢复activate之前的诊断对象"""
+        if token is not None:
+            _current.reset(token)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为字典
+
+        Returns:
+            包含phases（毫秒）、days及其他诊断值的字典
+        """
+        data = dict(self.values)
+        data['phases'] = {name: round(elapsed, 3) for name, elapsed in self.phases.items()}
+        data['days'] = sorted(self.days, key=lambda day: day.get('day', 0))
+        return data
+
+
+class NullDiagnostics(Diagnostics):
+    """未启用诊断时的空实现，所有记录操作均为空操作"""
+
+    enabled = False
+
+    def phase(self, name: str) -> _NullTimer:
+        return _NULL_TIMER
+
+    def add_time(self, name: str, elapsed_ms: float):
+        pass
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def add_day(self, day_stats: Dict[str, Any]):
+        pass
+
+    def activate(self):
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {}
+
+
+NULL_DIAGNOSTICS = NullDiagnostics()
+
+_current: ContextVar[Diagnostics] = ContextVar('travelmap_diagnostics', default=NULL_DIAGNOSTICS)
+
+
+def current_diagnostics() -> Diagnostics:
+    """获取当前上下文的诊断对象，未启用时返回空实现"""
+    return _current.get()
+
+
+def timed(name: str) -> Callable:
+    """
+    装饰器：在当前诊断对象启用时为函数调用计时
+
+    Args:
+        name: 阶段名称
+
+    Returns:
+        装饰器
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            diagnostics = _current.get()
+            if not diagnostics.enabled:
+                return func(*args, **kwargs)
+            with diagnostics.phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def emit_diagnostics(logger: logging.Logger, event: str, diagnostics: Dict[str, Any],
+                     **context):
+    """
+    以单行JSON输出结构化诊断日志，便于日志系统解析和汇总指标
+
+    Args:
+        logger: 日志记录器
+        event: 事件名称
+        diagnostics: 诊断字典
+        **context: 附加字段（如trip_id、job_id）
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    payload = dict(context, event=event, diagnostics=diagnostics)
+    logger.info('%s', json.dumps(payload, ensure_ascii=False, default=str))
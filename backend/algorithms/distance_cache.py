@@ -0,0 +1,375 @@
+"""
+进程级距离缓存
+在同一工作进程内的所有请求之间共享距离计算结果，带内存上限、LRU/TTL淘汰和命中统计。
+距离矩阵按坐标哈希分桶后逐块缓存，块的键只取决于桶内坐标集合，增删或重排POI时只有涉及变动的块需要重算
+"""
+
+import hashlib
+import io
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+# 默认内存上限（字节）
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# 默认过期时间（秒），距离不会变化，过期主要用于回收冷数据
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+# 坐标量化精度（小数位数），6位约为0.1米
+DEFAULT_PRECISION = 6
+
+# 单个标量条目的估算内存占用（键元组 + 浮点数 + OrderedDict节点）
+SCALAR_ENTRY_BYTES = 256
+
+# 距离矩阵分块时每个桶的目标点数；桶数取2的幂，只在点数翻倍时变化
+MATRIX_BUCKET_POINTS = 32
+
+
+class DistanceCache:
+    """线程安全的LRU距离缓存"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS,
+                 precision: int = DEFAULT_PRECISION, namespace: str = 'distance'):
+        """
+        初始化缓存
+
+        Args:
+            max_bytes: 内存上限（字节），超出时按LRU淘汰
+            ttl_seconds: 条目过期时间（秒），为空时不过期
+            precision: 坐标量化的小数位数
+            namespace: 共享后端中的键前缀，不同用途的缓存互不覆盖
+        """
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.precision = precision
+        self._scale = 10 ** precision
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, float, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.shared_backend = None
+        self.shared_ttl = None
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    def attach_shared_backend(self, backend, ttl: Optional[int] = None):
+        """
+        挂载跨进程共享的二级缓存（如Redis），矩阵类条目会同时读写该后端
+
+        Args:
+            backend: 提供get(key)/set(key, value, ttl)字节接口的缓存后端，为None时卸载
+            ttl: 共享条目的过期时间（秒）
+        """
+        self.shared_backend = backend
+        self.shared_ttl = ttl
+
+    def quantize(self, lat: float, lng: float) -> Tuple[int, int]:
+        """
+        将坐标量化为整数，使浮点误差不影响缓存键
+
+        Args:
+            lat: 纬度
+            lng: 经度
+
+        Returns:
+            量化后的(纬度, 经度)整数对
+        """
+        return int(round(lat * self._scale)), int(round(lng * self._scale))
+
+    def pair_key(self, coord1: Tuple[float, float], coord2: Tuple[float, float],
+                 mode: str) -> Tuple:
+        """
+        生成与方向无关的点对缓存键
+
+        Args:
+            coord1: (纬度, 经度)
+            coord2: (纬度, 经度)
+            mode: 距离计算模式
+
+        Returns:
+            缓存键
+        """
+        q1 = self.quantize(*coord1)
+        q2 = self.quantize(*coord2)
+        if q2 < q1:
+            q1, q2 = q2, q1
+        return ('pair', mode, q1, q2)
+
+    def matrix_key(self, coordinates: np.ndarray, mode: str, kind: str = 'matrix') -> Tuple:
+        """
+        生成坐标序列对应矩阵的缓存键
+
+        Args:
+            coordinates: (n, 2)坐标数组
+            mode: 距离计算模式
+            kind: 键的类别前缀
+
+        Returns:
+            缓存键
+        """
+        quantized = np.round(np.asarray(coordinates, dtype=np.float64) * self._scale).astype(np.int64)
+        digest = hashlib.blake2b(quantized.tobytes(), digest_size=16).hexdigest()
+        return (kind, mode, len(quantized), digest)
+
+    def _bucket_digest(self, quantized: np.ndarray) -> str:
+        return hashlib.blake2b(quantized.tobytes(), digest_size=16).hexdigest()
+
+    def cached_matrix(self, coordinates: np.ndarray, mode: str,
+                      compute: Callable[[np.ndarray, np.ndarray], np.ndarray]) -> Tuple[np.ndarray, int, int]:
+        """
+        分块读取或计算N×N距离矩阵
+
+        点按量化坐标的哈希分入若干桶，桶内按坐标排序；每对桶的距离块以两个桶的坐标集合为键缓存，
+        距离对称因此只存上三角的块。同一组POI换个顺序时全部命中，增删一个POI只需重算它所在桶的行和列。
+
+        Args:
+            coordinates: (n, 2)坐标数组
+            mode: 距离计算模式
+            compute: 计算两组坐标之间距离块的函数
+
+        Returns:
+            (只读距离矩阵, 命中的块数, 总块数)
+        """
+        coordinates = np.asarray(coordinates, dtype=np.float64)
+        n = len(coordinates)
+        quantized = np.round(coordinates * self._scale).astype(np.int64)
+
+        num_buckets = 1
+        while num_buckets * MATRIX_BUCKET_POINTS < n:
+            num_buckets <<= 1
+        buckets = ((quantized[:, 0] * 73856093) ^ (quantized[:, 1] * 19349663)) % num_buckets
+
+        members = []
+        for bucket in range(num_buckets):
+            index = np.flatnonzero(buckets == bucket)
+            if len(index):
+                index = index[np.lexsort((quantized[index, 1], quantized[index, 0]))]
+                members.append((index, self._bucket_digest(quantized[index])))
+
+        matrix = np.empty((n, n), dtype=np.float64)
+        hits = total = 0
+        for a, (rows, digest_a) in enumerate(members):
+            for cols, digest_b in members[a:]:
+                key = ('tile', mode, digest_a, digest_b)
+                tile = self.get_array(key)
+                total += 1
+                if tile is None:
+                    tile = compute(coordinates[rows], coordinates[cols])
+                    self.set_array(key, tile)
+                else:
+                    hits += 1
+                matrix[np.ix_(rows, cols)] = tile
+                if digest_a != digest_b:
+                    matrix[np.ix_(cols, rows)] = tile.T
+
+        matrix.setflags(write=False)
+        return matrix, hits, total
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        读取缓存条目，命中时将其移动到LRU末尾
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存值，未命中或已过期时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at, size = entry
+            if expires_at and expires_at < time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, size: Optional[int] = None):
+        """
+        写入缓存条目，必要时淘汰最久未使用的条目
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+            size: 条目估算大小（字节），为空时自动估算
+        """
+        if size is None:
+            size = self._estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else 0.0
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_array(self, key: Tuple) -> Optional[np.ndarray]:
+        """
+        读取数组条目，本地未命中时查询共享后端并回填本地缓存
+
+        Args:
+            key: 由matrix_key生成的缓存键
+
+        Returns:
+            只读数组，未命中时返回None
+        """
+        array = self.get(key)
+        if array is not None or self.shared_backend is None:
+            return array
+
+        blob = self.shared_backend.get(self._shared_key(key))
+        if blob is None:
+            self.shared_misses += 1
+            return None
+
+        try:
+            array = np.load(io.BytesIO(blob), allow_pickle=False)
+        except ValueError:
+            self.shared_misses += 1
+            return None
+
+        self.shared_hits += 1
+        array.setflags(write=False)
+        self.set(key, array)
+        return array
+
+    def set_array(self, key: Tuple, array: np.ndarray):
+        """
+        写入数组条目到本地缓存和共享后端
+
+        Args:
+            key: 由matrix_key生成的缓存键
+            array: 数组（写入后设为只读）
+        """
+        array.setflags(write=False)
+        self.set(key, array)
+
+        if self.shared_backend is not None:
+            buffer = io.BytesIO()
+            np.save(buffer, array, allow_pickle=False)
+            self.shared_backend.set(self._shared_key(key), buffer.getvalue(), self.shared_ttl)
+
+    def _shared_key(self, key: Tuple) -> str:
+        """将元组键转换为共享后端使用的字符串键"""
+        return f'travelmap:{self.namespace}:' + ':'.join(str(part) for part in key)
+
+    def clear(self):
+        """清空缓存并重置统计"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+            self.shared_hits = 0
+            self.shared_misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息，用于监控
+
+        Returns:
+            命中、未命中、淘汰次数及内存占用
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'shared_backend': type(self.shared_backend).__name__ if self.shared_backend else None,
+                'shared_hits': self.shared_hits,
+                'shared_misses': self.shared_misses
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _estimate_size(value: Any) -> int:
+        """估算条目占用的内存（字节）"""
+        if isinstance(value, np.ndarray):
+            return int(value.nbytes) + SCALAR_ENTRY_BYTES
+        if isinstance(value, float):
+            return SCALAR_ENTRY_BYTES
+        return sys.getsizeof(value) + SCALAR_ENTRY_BYTES
+
+
+def _env_number(name: str, default, cast):
+    """读取数值型环境变量，格式错误时使用默认值"""
+    value = os.getenv(name)
+    if value in (None, ''):
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        return default
+
+
+# 每个工作进程一个共享实例，首次使用时按环境变量创建（此时.env已经加载）
+_shared_cache: Optional[DistanceCache] = None
+_matrix_tile_cache: Optional[DistanceCache] = None
+_instances_lock = threading.Lock()
+
+
+def get_distance_cache() -> DistanceCache:
+    """获取当前工作进程的共享距离缓存"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _instances_lock:
+            if _shared_cache is None:
+                _shared_cache = DistanceCache(
+                    max_bytes=_env_number('DISTANCE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES, int),
+                    ttl_seconds=_env_number('DISTANCE_CACHE_TTL', DEFAULT_TTL_SECONDS, float) or None
+                )
+    return _shared_cache
+
+
+def get_matrix_tile_cache() -> DistanceCache:
+    """获取当前工作进程的距离矩阵接口瓦片缓存（内存上限独立，大矩阵请求不会挤掉行程规划的条目）"""
+    global _matrix_tile_cache
+    if _matrix_tile_cache is None:
+        with _instances_lock:
+            if _matrix_tile_cache is None:
+                _matrix_tile_cache = DistanceCache(
+                    max_bytes=_env_number('MATRIX_TILE_CACHE_MAX_BYTES', 32 * 1024 * 1024, int),
+                    ttl_seconds=_env_number('DISTANCE_CACHE_TTL', DEFAULT_TTL_SECONDS, float) or None,
+                    namespace='matrix-tile'
+                )
+    return _matrix_tile_cache
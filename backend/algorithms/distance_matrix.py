@@ -0,0 +1,187 @@
+"""
+距离矩阵计算
+使用NumPy向量化一次性计算N×N距离矩阵，供各TSP求解器按索引使用
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# 地球平均半径（公里）
+EARTH_RADIUS_KM = 6371.0088
+
+# WGS-84椭球参数
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+
+# 支持的距离计算模式
+DISTANCE_MODES = ('haversine', 'accurate')
+
+
+def extract_coordinates(pois: Sequence[Dict]) -> np.ndarray:
+    """
+    提取POI坐标
+
+    Args:
+        pois: POI列表，包含coordinates字段
+
+    Returns:
+        形状为(n, 2)的[纬度, 经度]数组（度）
+    """
+    if not pois:
+        return np.empty((0, 2), dtype=np.float64)
+
+    return np.array(
+        [[poi['coordinates']['lat'], poi['coordinates']['lng']] for poi in pois],
+        dtype=np.float64
+    )
+
+
+def _central_angle(lat1: np.ndarray, lng1: np.ndarray,
+                   lat2: np.ndarray, lng2: np.ndarray) -> np.ndarray:
+    """
+    计算球面中心角（弧度），输入为弧度且可广播
+    """
+    sin_dlat = np.sin((lat2 - lat1) / 2)
+    sin_dlng = np.sin((lng2 - lng1) / 2)
+    h = sin_dlat ** 2 + np.cos(lat1) * np.cos(lat2) * sin_dlng ** 2
+    return 2 * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def haversine_matrix(coords_a: np.ndarray, coords_b: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    使用Haversine公式计算距离矩阵（公里）
+
+    Args:
+        coords_a: (n, 2)坐标数组（度）
+        coords_b: (m, 2)坐标数组（度），为空时计算coords_a自身的N×N矩阵
+
+    Returns:
+        (n, m)距离矩阵
+    """
+    if coords_b is None:
+        coords_b = coords_a
+
+    a = np.radians(coords_a)
+    b = np.radians(coords_b)
+
+    angle = _central_angle(
+        a[:, 0:1], a[:, 1:2],
+        b[:, 0][np.newaxis, :], b[:, 1][np.newaxis, :]
+    )
+    return EARTH_RADIUS_KM * angle
+
+
+def ellipsoidal_matrix(coords_a: np.ndarray, coords_b: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    使用Lambert椭球公式计算距离矩阵（公里），城市尺度下误差在10米以内
+
+    Args:
+        coords_a: (n, 2)坐标数组（度）
+        coords_b: (m, 2)坐标数组（度），为空时计算coords_a自身的N×N矩阵
+
+    Returns:
+        (n, m)距离矩阵
+    """
+    if coords_b is None:
+        coords_b = coords_a
+
+    a = np.radians(coords_a)
+    b = np.radians(coords_b)
+
+    # 归化纬度
+    beta1 = np.arctan((1 - WGS84_F) * np.tan(a[:, 0:1]))
+    beta2 = np.arctan((1 - WGS84_F) * np.tan(b[:, 0]))[np.newaxis, :]
+
+    sigma = _central_angle(beta1, a[:, 1:2], beta2, b[:, 1][np.newaxis, :])
+
+    p = (beta1 + beta2) / 2
+    q = (beta2 - beta1) / 2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = (sigma - np.sin(sigma)) * (np.sin(p) ** 2) * (np.cos(q) ** 2) / (np.cos(sigma / 2) ** 2)
+        y = (sigma + np.sin(sigma)) * (np.cos(p) ** 2) * (np.sin(q) ** 2) / (np.sin(sigma / 2) ** 2)
+        distance = WGS84_A_KM * (sigma - WGS84_F / 2 * (x + y))
+
+    # 同一点的中心角为0，公式中出现0/0
+    return np.where(sigma > 0, distance, 0.0)
+
+
+def compute_distance_matrix(coords_a: np.ndarray, coords_b: Optional[np.ndarray] = None,
+                            mode: str = 'haversine') -> np.ndarray:
+    """
+    按指定模式计算距离矩阵（公里）
+
+    Args:
+        coords_a: (n, 2)坐标数组（度）
+        coords_b: (m, 2)坐标数组（度），为空时计算N×N矩阵
+        mode: 'haversine'（默认，球面）或'accurate'（WGS-84椭球）
+
+    Returns:
+        距离矩阵
+    """
+    if mode == 'haversine':
+        return haversine_matrix(coords_a, coords_b)
+    if mode == 'accurate':
+        return ellipsoidal_matrix(coords_a, coords_b)
+    raise ValueError(f'不支持的距离计算模式: {mode}')
+
+
+def pairwise_distance(coord1, coord2, mode: str = 'haversine') -> float:
+    """
+    计算单对坐标之间的距离（公里），与矩阵计算使用相同公式
+
+    Args:
+        coord1: (纬度, 经度)
+        coord2: (纬度, 经度)
+        mode: 距离计算模式
+
+    Returns:
+        距离（公里）
+    """
+    if mode == 'haversine':
+        lat1, lng1 = math.radians(coord1[0]), math.radians(coord1[1])
+        lat2, lng2 = math.radians(coord2[0]), math.radians(coord2[1])
+        h = (math.sin((lat2 - lat1) / 2) ** 2
+             + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+        return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(max(h, 0.0), 1.0)))
+
+    matrix = compute_distance_matrix(
+        np.array([coord1], dtype=np.float64),
+        np.array([coord2], dtype=np.float64),
+        mode=mode
+    )
+    return float(matrix[0, 0])
+
+
+def route_length(matrix: np.ndarray, order: Sequence[int]) -> float:
+    """
+    按索引计算开放路线总长度
+
+    Args:
+        matrix: 距离矩阵
+        order: POI索引顺序
+
+    Returns:
+        总距离（公里）
+    """
+    if len(order) <= 1:
+        return 0.0
+    order = np.asarray(order, dtype=np.intp)
+    return float(matrix[order[:-1], order[1:]].sum())
+
+
+def submatrix(matrix: np.ndarray, indices: List[int]) -> np.ndarray:
+    """
+    提取子集的距离矩阵
+
+    Args:
+        matrix: 完整距离矩阵
+        indices: 子集索引
+
+    Returns:
+        子集距离矩阵
+    """
+    idx = np.asarray(indices, dtype=np.intp)
+    return matrix[np.ix_(idx, idx)]
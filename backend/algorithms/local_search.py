@@ -0,0 +1,308 @@
+"""
+局部搜索改进
+在距离矩阵上对开放路径（固定起点）执行2-opt和Or-opt改进
+"""
+
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 每个POI保留的近邻数量
+DEFAULT_NEIGHBOUR_COUNT = 8
+
+# Or-opt移动的最大片段长度
+OR_OPT_MAX_SEGMENT = 3
+
+# 浮点比较容差（公里）
+EPSILON = 1e-9
+
+
+def build_neighbour_lists(matrix: np.ndarray, k: int = DEFAULT_NEIGHBOUR_COUNT) -> List[List[int]]:
+    """
+    为每个POI构建按距离升序排列的近邻列表
+
+    Args:
+        matrix: N×N距离矩阵
+        k: 近邻数量
+
+    Returns:
+        近邻索引列表
+    """
+    n = len(matrix)
+    k = min(k, n - 1)
+    if k <= 0:
+        return [[] for _ in range(n)]
+
+    masked = np.array(matrix, dtype=np.float64, copy=True)
+    np.fill_diagonal(masked, np.inf)
+    nearest = np.argpartition(masked, k - 1, axis=1)[:, :k]
+    order = np.argsort(np.take_along_axis(masked, nearest, axis=1), axis=1)
+    return np.take_along_axis(nearest, order, axis=1).tolist()
+
+
+class _Budget:
+    """迭代次数与时间预算"""
+
+    def __init__(self, max_iterations: Optional[int], deadline: Optional[float]):
+        self.max_iterations = max_iterations
+        self.deadline = deadline
+        self.iterations = 0
+
+    def exhausted(self) -> bool:
+        """预算是否已用尽"""
+        if self.max_iterations is not None and self.iterations >= self.max_iterations:
+            return True
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+
+def two_opt(dist: List[List[float]], route: List[int], neighbours: List[List[int]],
+            budget: _Budget) -> int:
+    """
+    使用近邻列表和don't-look位的2-opt改进（原地修改route）
+
+    对城市a考虑后继方向（断开a-succ(a)与c-succ(c)，连接a-c与succ(a)-succ(c)）
+    和前驱方向（断开pred(a)-a与pred(c)-c，连接a-c与pred(a)-pred(c)），
+    路径末端缺失的边按长度0计算，起点位置固定不动。
+
+    Args:
+        dist: 距离矩阵（嵌套列表）
+        route: 索引路线
+        neighbours: 近邻列表
+        budget: 迭代预算
+
+    Returns:
+        执行的改进次数
+    """
+    n = len(route)
+    if n < 4:
+        return 0
+
+    pos = [0] * n
+    for index, city in enumerate(route):
+        pos[city] = index
+
+    active = [True] * n
+    queue = deque(route)
+    moves = 0
+
+    def edge(i: int, j: int) -> float:
+        # 越界位置表示路径末端之外，对应边长为0
+        if i < 0 or j >= n:
+            return 0.0
+        return dist[route[i]][route[j]]
+
+    def reverse(p: int, q: int):
+        route[p + 1:q + 1] = route[p + 1:q + 1][::-1]
+        for index in range(p + 1, q + 1):
+            pos[route[index]] = index
+
+    while queue and not budget.exhausted():
+        a = queue.popleft()
+        active[a] = False
+        improved = False
+
+        for successor in (True, False):
+            i = pos[a]
+            if successor:
+                # a位于末端时该方向的移动会从c的视角被发现
+                if i == n - 1:
+                    continue
+                removed_a = edge(i, i + 1)
+            else:
+                if i == 0:
+                    continue
+                removed_a = edge(i - 1, i)
+
+            for c in neighbours[a]:
+                gain_bound = removed_a - dist[a][c]
+                if gain_bound <= EPSILON:
+                    break
+
+                j = pos[c]
+                if successor:
+                    if abs(i - j) < 2:
+                        continue
+                    p, q = min(i, j), max(i, j)
+                    delta = (dist[a][c] + edge(p + 1, q + 1)
+                             - edge(p, p + 1) - edge(q, q + 1))
+                else:
+                    if j == 0 or abs(i - j) < 2:
+                        continue
+                    p, q = min(i, j) - 1, max(i, j) - 1
+                    delta = (dist[a][c] + edge(p, q)
+                             - edge(p, p + 1) - edge(q, q + 1))
+
+                if delta < -EPSILON:
+                    touched = {route[p], route[p + 1], route[q]}
+                    if q + 1 < n:
+                        touched.add(route[q + 1])
+                    reverse(p, q)
+                    moves += 1
+                    budget.iterations += 1
+                    for city in touched:
+                        if not active[city]:
+                            active[city] = True
+                            queue.append(city)
+                    improved = True
+                    break
+
+            if improved:
+                break
+
+        if improved and not active[a]:
+            active[a] = True
+            queue.append(a)
+
+    return moves
+
+
+def or_opt(dist: List[List[float]], route: List[int], neighbours: List[List[int]],
+           budget: _Budget) -> int:
+    """
+    Or-opt片段移动：将长度1..3的连续片段（可反转）移动到近邻附近（原地修改route）
+
+    Args:
+        dist: 距离矩阵（嵌套列表）
+        route: 索引路线
+        neighbours: 近邻列表
+        budget: 迭代预算
+
+    Returns:
+        执行的改进次数
+    """
+    n = len(route)
+    if n < 3:
+        return 0
+
+    pos = [0] * n
+    for index, city in enumerate(route):
+        pos[city] = index
+
+    moves = 0
+    improved = True
+
+    while improved and not budget.exhausted():
+        improved = False
+
+        for length in range(1, OR_OPT_MAX_SEGMENT + 1):
+            # 起点（位置0）固定，不参与移动
+            for start in range(1, n - length + 1):
+                if budget.exhausted():
+                    return moves
+
+                end = start + length - 1
+                first, last = route[start], route[end]
+                before = route[start - 1]
+                after = route[end + 1] if end + 1 < n else None
+
+                removal_gain = dist[before][first]
+                if after is not None:
+                    removal_gain += dist[last][after] - dist[before][after]
+
+                best_delta = -EPSILON
+                best_move = None
+
+                for c in set(neighbours[first]) | set(neighbours[last]):
+                    k = pos[c]
+                    # 插入到c之后（c与其后继之间）或c之前（前驱与c之间）
+                    for t in (k, k - 1):
+                        # t为插入点前一个位置，不能落在片段内或原位置
+                        if t < 0 or start - 1 <= t <= end:
+                            continue
+                        x = route[t]
+                        y = route[t + 1] if t + 1 < n else None
+                        base = dist[x][y] if y is not None else 0.0
+                        for reversed_segment in (False, True):
+                            head, tail = (last, first) if reversed_segment else (first, last)
+                            added = dist[x][head] + (dist[tail][y] if y is not None else 0.0) - base
+                            delta = added - removal_gain
+                            if delta < best_delta:
+                                best_delta = delta
+                                best_move = (t, reversed_segment)
+
+                if best_move is not None:
+                    t, reversed_segment = best_move
+                    segment = route[start:end + 1]
+                    moved = segment[::-1] if reversed_segment else segment
+                    if t < start:
+                        route[t + 1:end + 1] = moved + route[t + 1:start]
+                        changed = range(t + 1, end + 1)
+                    else:
+                        route[start:t + 1] = route[end + 1:t + 1] + moved
+                        changed = range(start, t + 1)
+                    for index in changed:
+                        pos[route[index]] = index
+                    moves += 1
+                    budget.iterations += 1
+                    improved = True
+
+    return moves
+
+
+# 可用的改进阶段，按名称注册
+IMPROVEMENT_STAGES: Dict[str, Callable] = {
+    '2-opt': two_opt,
+    'or-opt': or_opt,
+}
+
+DEFAULT_STAGES = ('2-opt', 'or-opt')
+
+
+def improve_route(matrix: np.ndarray, route: Sequence[int],
+                  stages: Sequence[str] = DEFAULT_STAGES,
+                  max_iterations: Optional[int] = None,
+                  time_budget_ms: Optional[float] = None,
+                  neighbour_count: int = DEFAULT_NEIGHBOUR_COUNT,
+                  stats: Optional[Dict[str, Any]] = None) -> Tuple[List[int], int]:
+    """
+    依次执行各改进阶段，直到没有改进或预算用尽
+
+    Args:
+        matrix: N×N距离矩阵
+        route: 初始索引路线（起点固定）
+        stages: 改进阶段名称序列
+        max_iterations: 最大改进次数
+        time_budget_ms: 时间预算（毫秒）
+        neighbour_count: 近邻列表长度
+        stats: 传入字典时写入轮数和预算是否用尽，用于诊断
+
+    Returns:
+        (改进后的路线, 执行的改进次数)
+    """
+    unknown = [stage for stage in stages if stage not in IMPROVEMENT_STAGES]
+    if unknown:
+        raise ValueError(f'未知的改进阶段: {", ".join(unknown)}')
+
+    route = list(route)
+    if len(route) < 3 or not stages:
+        return route, 0
+
+    deadline = None
+    if time_budget_ms is not None:
+        deadline = time.perf_counter() + time_budget_ms / 1000
+    budget = _Budget(max_iterations, deadline)
+
+    dist = np.asarray(matrix, dtype=np.float64).tolist()
+    neighbours = build_neighbour_lists(matrix, neighbour_count)
+
+    total_moves = 0
+    rounds = 0
+    while not budget.exhausted():
+        rounds += 1
+        round_moves = 0
+        for stage in stages:
+            round_moves += IMPROVEMENT_STAGES[stage](dist, route, neighbours, budget)
+            if budget.exhausted():
+                break
+        total_moves += round_moves
+        # 单一阶段已在内部收敛，多阶段时需要交替直到都无改进
+        if round_moves == 0 or len(stages) == 1:
+            break
+
+    if stats is not None:
+        stats['rounds'] = rounds
+        stats['budget_exhausted'] = budget.exhausted()
+
+    return route, total_moves
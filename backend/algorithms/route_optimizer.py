@@ -4,17 +4,201 @@
 """
 
 import numpy as np
-from sklearn.cluster import KMeans
-from geopy.distance import geodesic
-import itertools
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Optional, Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 import math
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+from algorithms.distance_matrix import (
+    DISTANCE_MODES,
+    compute_distance_matrix,
+    extract_coordinates,
+    pairwise_distance,
+    route_length,
+    submatrix,
+)
+from algorithms.tsp_solvers import (
+    HELD_KARP_MAX_SIZE,
+    held_karp_path,
+    nearest_neighbour_path,
+)
+from algorithms.local_search import DEFAULT_STAGES, improve_route
+from algorithms.distance_cache import DistanceCache, get_distance_cache
+from algorithms.clustering import DEFAULT_SKLEARN_THRESHOLD, balanced_clusters, kmeans_centers
+from algorithms.time_windows import TimeWindowProblem, parse_open_hours, solve_with_time_windows, visit_start
+from algorithms.diagnostics import (
+    NULL_DIAGNOSTICS,
+    Diagnostics,
+    current_diagnostics,
+    timed,
+)
+
+logger = logging.getLogger(__name__)
+
+# 默认使用精确算法的最大POI数量
+DEFAULT_EXACT_THRESHOLD = 13
+
+# 默认每天局部搜索改进的时间预算（毫秒）
+DEFAULT_IMPROVEMENT_BUDGET_MS = 50
+
+# 各天优化的执行方式
+EXECUTION_MODES = ('auto', 'serial', 'thread', 'process')
+
+# 设置总时间预算时，聚类最多使用剩余预算的比例，其余留给各天求解
+CLUSTERING_BUDGET_SHARE = 0.4
+
+# Held-Karp每个(子集, 终点, 前驱)状态的估算耗时（毫秒），用于判断剩余预算能否完成精确求解
+HELD_KARP_MS_PER_STATE = 5e-6
+
+# auto模式下启用并行的最小POI数量
+PARALLEL_MIN_POIS = 60
+
+# 并行执行各天优化的最大工作数
+DAY_WORKERS = int(os.getenv('OPTIMIZER_DAY_WORKERS', os.cpu_count() or 2))
+
+_day_executors: Dict[str, Executor] = {}
+_day_executors_lock = threading.Lock()
+
+
+def _get_day_executor(mode: str) -> Executor:
+    """获取各天并行优化使用的常驻执行器（按需创建，进程内复用）"""
+    executor = _day_executors.get(mode)
+    if executor is None:
+        with _day_executors_lock:
+            executor = _day_executors.get(mode)
+            if executor is None:
+                if mode == 'thread':
+                    executor = ThreadPoolExecutor(max_workers=DAY_WORKERS, thread_name_prefix='plan-day')
+                else:
+                    # 使用spawn避免复制父进程中的锁和线程状态
+                    executor = ProcessPoolExecutor(
+                        max_workers=DAY_WORKERS,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                _day_executors[mode] = executor
+    return executor
+
+
+def parse_clock(value: str) -> int:
+    """
+    将'HH:MM'（或只有小时'HH'）解析为当天分钟数
+
+    Args:
+        value: 时间字符串
+
+    Returns:
+        当天分钟数
+
+    Raises:
+        ValueError: 格式错误或超出00:00-23:59
+    """
+    hour, _, minute = str(value).strip().partition(':')
+    hour, minute = int(hour), int(minute or 0)
+    if not 0 <= hour <= 23 or not 0 <= minute <= 59:
+        raise ValueError(f'时间超出范围: {value}')
+    return hour * 60 + minute
+
+
+def _format_clock(minutes: float) -> str:
+    """将当天分钟数格式化为'HH:MM'"""
+    minutes = int(round(minutes))
+    return f'{minutes // 60 % 24:02d}:{minutes % 60:02d}'
+
+
+def _remaining_ms(deadline: Optional[float]) -> Optional[float]:
+    """距截止时间（time.time()）的剩余毫秒数，未设置时返回None"""
+    if deadline is None:
+        return None
+    return max((deadline - time.time()) * 1000, 0.0)
+
+
+def _capped_budget(budget_ms: Optional[float], deadline: Optional[float]) -> Optional[float]:
+    """局部搜索预算不超过距截止时间的剩余时间"""
+    remaining = _remaining_ms(deadline)
+    if remaining is None:
+        return budget_ms
+    return remaining if budget_ms is None else min(budget_ms, remaining)
+
+
+def _day_deadlines(deadline: Optional[float], num_tasks: int, parallelism: int) -> List[Optional[float]]:
+    """
+    将剩余预算分配给各天：并行度内的天同时开始，超出部分按批次顺延
+    
+    Args:
+        deadline: 总截止时间（time.time()），为空时不限制
+        num_tasks: 天数
+        parallelism: 同时执行的天数
+        
+    Returns:
+        每天的截止时间
+    """
+    if deadline is None:
+        return [None] * num_tasks
+    now = time.time()
+    remaining = max(deadline - now, 0.0)
+    waves = math.ceil(num_tasks / parallelism)
+    return [now + remaining * (k // parallelism + 1) / waves for k in range(num_tasks)]
+
+
+def _cheapest_insertion(matrix: np.ndarray) -> Tuple[int, float]:
+    """
+    求最后一个点插入到其余点（按索引顺序组成的路径）中的最便宜位置
+    
+    Args:
+        matrix: (n+1)×(n+1)距离矩阵，前n个点为现有路径，最后一个点为待插入点
+        
+    Returns:
+        (插入位置, 增加的距离)
+    """
+    n = len(matrix) - 1
+    if n == 0:
+        return 0, 0.0
+    
+    row = np.asarray(matrix[n, :n], dtype=np.float64)
+    # 位置0和n分别接在路径首尾，中间位置替换原有的一条边
+    costs = np.empty(n + 1)
+    costs[0] = row[0]
+    costs[n] = row[n - 1]
+    if n > 1:
+        costs[1:n] = row[:-1] + row[1:] - np.diagonal(matrix, 1)[:n - 1]
+    position = int(np.argmin(costs))
+    return position, float(costs[position])
+
+
+def _plan_day_in_worker(config: Dict[str, Any], day_pois: List[Dict], day_matrix: np.ndarray,
+                        options: Dict[str, Any]) -> Tuple[List[int], Dict[str, Any], Dict[str, Any]]:
+    """在进程池工作进程中优化单日路线（模块级函数，便于序列化）"""
+    return RouteOptimizer(**config)._plan_day(day_pois, day_matrix, options)
 
 class RouteOptimizer:
     """路线优化器"""
     
-    def __init__(self):
-        self.distance_cache = {}
+    def __init__(self, distance_mode: str = 'haversine',
+                 exact_threshold: int = DEFAULT_EXACT_THRESHOLD,
+                 improvement_stages: Sequence[str] = DEFAULT_STAGES,
+                 distance_cache: Optional[DistanceCache] = None,
+                 sklearn_threshold: int = DEFAULT_SKLEARN_THRESHOLD):
+        """
+        初始化路线优化器
+        
+        Args:
+            distance_mode: 距离计算模式，'haversine'（球面，默认）或'accurate'（WGS-84椭球）
+            exact_threshold: 使用Held-Karp精确算法的最大POI数量（不超过16）
+            improvement_stages: 最近邻之后依次执行的局部搜索阶段，如('2-opt', 'or-opt')
+            distance_cache: 距离缓存，为空时使用进程级共享缓存
+            sklearn_threshold: 聚类使用sklearn的最小POI数量，更小的输入使用内置NumPy k-means
+        """
+        if distance_mode not in DISTANCE_MODES:
+            raise ValueError(f'不支持的距离计算模式: {distance_mode}')
+        self.distance_mode = distance_mode
+        self.exact_threshold = min(exact_threshold, HELD_KARP_MAX_SIZE)
+        self.improvement_stages = tuple(improvement_stages)
+        self.distance_cache = distance_cache if distance_cache is not None else get_distance_cache()
+        self.sklearn_threshold = sklearn_threshold
     
     def calculate_distance(self, poi1: Dict, poi2: Dict) -> float:
         """
@@ -30,143 +214,237 @@ class RouteOptimizer:
         coord1 = (poi1['coordinates']['lat'], poi1['coordinates']['lng'])
         coord2 = (poi2['coordinates']['lat'], poi2['coordinates']['lng'])
         
-        # 使用缓存避免重复计算
-        cache_key = (coord1, coord2)
-        if cache_key in self.distance_cache:
-            return self.distance_cache[cache_key]
+        # 使用共享缓存避免重复计算（键与方向无关）
+        cache_key = self.distance_cache.pair_key(coord1, coord2, self.distance_mode)
+        distance = self.distance_cache.get(cache_key)
+        if distance is not None:
+            return distance
         
-        distance = geodesic(coord1, coord2).kilometers
-        self.distance_cache[cache_key] = distance
-        self.distance_cache[(coord2, coord1)] = distance  # 对称缓存
+        distance = pairwise_distance(coord1, coord2, self.distance_mode)
+        self.distance_cache.set(cache_key, distance)
         
         return distance
     
-    def cluster_pois(self, pois: List[Dict], num_days: int) -> List[List[Dict]]:
+    @timed('distance_matrix')
+    def build_distance_matrix(self, pois: List[Dict]) -> np.ndarray:
         """
-        使用K-means聚类将POI分组到不同天数
+        一次性向量化计算POI之间的N×N距离矩阵（公里）
+        
+        Args:
+            pois: POI列表
+            
+        Returns:
+            距离矩阵，matrix[i, j]为第i个POI到第j个POI的距离
+        """
+        coordinates = extract_coordinates(pois)
+        
+        # 热门城市的POI集合会被反复规划和增删，矩阵按坐标分块缓存，重叠的POI集合共用缓存块
+        matrix, hits, total = self.distance_cache.cached_matrix(
+            coordinates, self.distance_mode,
+            lambda rows, cols: compute_distance_matrix(rows, cols, mode=self.distance_mode)
+        )
+        current_diagnostics().set('matrix_cached', total > 0 and hits == total)
+        current_diagnostics().set('matrix_tiles', {'hits': hits, 'total': total})
+        return matrix
+    
+    def cluster_pois(self, pois: List[Dict], num_days: int, daily_time_limit: int = 480,
+                     transport_mode: str = 'driving', start_time: str = '09:00',
+                     is_weekend: bool = False) -> List[List[Dict]]:
+        """
+        将POI按地理位置分组到不同天数，并使每天的停留与交通时间落在时间预算内
         
         Args:
             pois: POI列表
             num_days: 天数
+            daily_time_limit: 每日时间限制（分钟）
+            transport_mode: 交通方式
+            start_time: 每天开始时间（HH:MM）
+            is_weekend: 是否为周末
             
         Returns:
             每天的POI列表
         """
+        return [
+            [pois[i] for i in day_indices]
+            for day_indices in self._cluster_indices(
+                pois, num_days,
+                daily_time_limit=daily_time_limit,
+                transport_mode=transport_mode,
+                start_time=start_time,
+                is_weekend=is_weekend
+            )
+        ]
+    
+    @timed('clustering')
+    def _cluster_indices(self, pois: List[Dict], num_days: int,
+                         distance_matrix: Optional[np.ndarray] = None,
+                         daily_time_limit: int = 480, transport_mode: str = 'driving',
+                         start_time: str = '09:00', is_weekend: bool = False,
+                         deadline: Optional[float] = None,
+                         stats: Optional[Dict[str, Any]] = None) -> List[List[int]]:
+        """
+        容量感知聚类：以k-means中心为种子，按停留时间和估算交通时间分配POI索引
+        
+        Args:
+            pois: POI列表
+            num_days: 天数
+            distance_matrix: 预先计算的距离矩阵，为空时自动计算
+            daily_time_limit: 每日时间限制（分钟）
+            transport_mode: 交通方式
+            start_time: 每天开始时间（HH:MM）
+            is_weekend: 是否为周末
+            deadline: 截止时间（time.perf_counter()），到期后返回当前最好的分配
+            stats: 传入字典时写入聚类迭代信息
+            
+        Returns:
+            每天的POI索引列表
+        """
         if len(pois) <= num_days:
             # 如果POI数量少于天数，每天分配一个POI
-            return [[poi] for poi in pois] + [[] for _ in range(num_days - len(pois))]
+            return [[i] for i in range(len(pois))] + [[] for _ in range(num_days - len(pois))]
         
         # 提取坐标
-        coordinates = np.array([
-            [poi['coordinates']['lat'], poi['coordinates']['lng']] 
-            for poi in pois
-        ])
-        
-        # K-means聚类
-        kmeans = KMeans(n_clusters=num_days, random_state=42, n_init=10)
-        cluster_labels = kmeans.fit_predict(coordinates)
-        
-        # 按聚类分组POI
-        clustered_pois = [[] for _ in range(num_days)]
-        for i, label in enumerate(cluster_labels):
-            clustered_pois[label].append(pois[i])
-        
-        # 确保每天至少有一个POI（如果可能）
-        empty_days = [i for i, day_pois in enumerate(clustered_pois) if not day_pois]
-        full_days = [i for i, day_pois in enumerate(clustered_pois) if len(day_pois) > 1]
-        
-        # 重新分配POI以平衡各天
-        for empty_day in empty_days:
-            if full_days:
-                # 从POI最多的天移动一个POI到空天
-                fullest_day = max(full_days, key=lambda x: len(clustered_pois[x]))
-                if len(clustered_pois[fullest_day]) > 1:
-                    poi_to_move = clustered_pois[fullest_day].pop()
-                    clustered_pois[empty_day].append(poi_to_move)
-                    
-                    if len(clustered_pois[fullest_day]) <= 1:
-                        full_days.remove(fullest_day)
-        
-        return clustered_pois
-    
-    def solve_tsp_greedy(self, pois: List[Dict]) -> List[Dict]:
-        """
-        使用贪心算法解决TSP问题（适用于小规模问题）
+        coordinates = extract_coordinates(pois)
+        if distance_matrix is None:
+            distance_matrix = self.build_distance_matrix(pois)
+        
+        # K-means聚类中心作为分配种子
+        centers = kmeans_centers(coordinates, num_days, sklearn_threshold=self.sklearn_threshold,
+                                 deadline=deadline)
+        
+        # 每个POI的停留时间
+        start_hour = parse_clock(start_time) // 60
+        stay_minutes = np.array([
+            self.calculate_poi_stay_duration(poi, start_hour) for poi in pois
+        ], dtype=np.float64)
+        
+        # 将时间预估线性化为“固定耗时 + 每公里耗时”，供聚类快速估算
+        base_minutes, per_km_minutes = self._linear_time_model(transport_mode, start_hour, is_weekend)
+        
+        clustered, _ = balanced_clusters(
+            coordinates=coordinates,
+            matrix=distance_matrix,
+            stay_minutes=stay_minutes,
+            num_days=num_days,
+            capacity=daily_time_limit,
+            initial_centers=centers,
+            leg_base_minutes=base_minutes,
+            leg_minutes_per_km=per_km_minutes,
+            deadline=deadline,
+            stats=stats
+        )
+        return clustered
+    
+    def _linear_time_model(self, transport_mode: str, hour: int, is_weekend: bool) -> Tuple[float, float]:
+        """
+        将calculate_time_estimate线性化为“固定耗时 + 每公里耗时”，用于批量快速估算
+        
+        Args:
+            transport_mode: 交通方式
+            hour: 一天中的小时
+            is_weekend: 是否为周末
+            
+        Returns:
+            (固定耗时, 每公里耗时)，单位分钟
+        """
+        base_minutes = self.calculate_time_estimate(0, transport_mode, hour, is_weekend)
+        per_km_minutes = (
+            self.calculate_time_estimate(10, transport_mode, hour, is_weekend) - base_minutes
+        ) / 10
+        return base_minutes, per_km_minutes
+    
+    def solve_tsp_greedy(self, pois: List[Dict],
+                         distance_matrix: Optional[np.ndarray] = None,
+                         exact_threshold: Optional[int] = None) -> List[Dict]:
+        """
+        求解单日TSP问题，小规模使用精确算法，大规模使用贪心算法
         
         Args:
             pois: POI列表
+            distance_matrix: 预先计算的距离矩阵，为空时自动计算
+            exact_threshold: 使用精确算法的最大POI数量，为空时使用实例配置
             
         Returns:
             优化后的POI顺序
         """
-        if len(pois) <= 1:
-            return pois
-        
-        if len(pois) == 2:
+        if len(pois) <= 2:
             return pois
         
-        # 对于小规模问题（<=8个POI），使用精确算法
-        if len(pois) <= 8:
-            return self._solve_tsp_exact(pois)
+        if distance_matrix is None:
+            distance_matrix = self.build_distance_matrix(pois)
         
-        # 对于大规模问题，使用贪心算法
-        return self._solve_tsp_greedy_heuristic(pois)
+        order = self._solve_tsp(distance_matrix, exact_threshold)
+        return [pois[i] for i in order]
     
-    def _solve_tsp_exact(self, pois: List[Dict]) -> List[Dict]:
+    def _solve_tsp(self, matrix: np.ndarray, exact_threshold: Optional[int] = None,
+                   max_iterations: Optional[int] = None,
+                   time_budget_ms: Optional[float] = DEFAULT_IMPROVEMENT_BUDGET_MS,
+                   stats: Optional[Dict[str, Any]] = None) -> List[int]:
         """
-        精确解决TSP问题（暴力搜索）
+        按规模选择TSP求解器，路线从索引0出发
         
         Args:
-            pois: POI列表
+            matrix: 距离矩阵
+            exact_threshold: 使用精确算法的最大POI数量，为空时使用实例配置
+            max_iterations: 局部搜索最大改进次数，为空时不限制
+            time_budget_ms: 局部搜索时间预算（毫秒），为空时不限制
+            stats: 传入字典时写入所用求解器和改进次数，用于诊断
             
         Returns:
-            最优POI顺序
+            优化后的索引顺序
         """
-        if len(pois) <= 1:
-            return pois
-        
-        min_distance = float('inf')
-        best_route = pois
+        n = len(matrix)
+        if n <= 2:
+            if stats is not None:
+                stats['solver'] = 'trivial'
+            return list(range(n))
         
-        # 固定第一个POI，排列其余POI
-        first_poi = pois[0]
-        remaining_pois = pois[1:]
+        if exact_threshold is None:
+            exact_threshold = self.exact_threshold
         
-        for permutation in itertools.permutations(remaining_pois):
-            route = [first_poi] + list(permutation)
-            total_distance = self._calculate_route_distance(route)
-            
-            if total_distance < min_distance:
-                min_distance = total_distance
-                best_route = route
+        # 对于小规模问题，使用Held-Karp精确算法
+        if n <= min(exact_threshold, HELD_KARP_MAX_SIZE):
+            if stats is not None:
+                stats['solver'] = 'held-karp'
+            return self._solve_tsp_exact(matrix)
         
-        return best_route
+        # 对于大规模问题，使用贪心算法构造初始路线，再做局部搜索改进
+        route = self._solve_tsp_greedy_heuristic(matrix)
+        route, moves = improve_route(
+            matrix, route,
+            stages=self.improvement_stages,
+            max_iterations=max_iterations,
+            time_budget_ms=time_budget_ms,
+            stats=stats
+        )
+        if stats is not None:
+            stats['solver'] = '+'.join(('nearest-neighbour',) + self.improvement_stages)
+            stats['moves'] = moves
+        return route
     
-    def _solve_tsp_greedy_heuristic(self, pois: List[Dict]) -> List[Dict]:
+    def _solve_tsp_exact(self, matrix: np.ndarray) -> List[int]:
         """
-        使用贪心启发式算法解决TSP问题
+        精确解决TSP问题（Held-Karp动态规划）
         
         Args:
-            pois: POI列表
+            matrix: 距离矩阵
             
         Returns:
-            优化后的POI顺序
+            最优索引顺序
         """
-        if len(pois) <= 1:
-            return pois
-        
-        # 从第一个POI开始
-        route = [pois[0]]
-        remaining = pois[1:]
-        
-        while remaining:
-            current_poi = route[-1]
-            # 找到距离当前POI最近的未访问POI
-            nearest_poi = min(remaining, key=lambda poi: self.calculate_distance(current_poi, poi))
-            route.append(nearest_poi)
-            remaining.remove(nearest_poi)
+        return held_karp_path(matrix, start=0)
+    
+    def _solve_tsp_greedy_heuristic(self, matrix: np.ndarray) -> List[int]:
+        """
+        使用贪心启发式算法（最近邻）解决TSP问题
         
-        return route
+        Args:
+            matrix: 距离矩阵
+            
+        Returns:
+            优化后的索引顺序
+        """
+        return nearest_neighbour_path(matrix, start=0)
     
     def _calculate_route_distance(self, route: List[Dict]) -> float:
         """
@@ -181,15 +459,16 @@ class RouteOptimizer:
         if len(route) <= 1:
             return 0
         
-        total_distance = 0
-        for i in range(len(route) - 1):
-            total_distance += self.calculate_distance(route[i], route[i + 1])
-        
-        return total_distance
+        return route_length(self.build_distance_matrix(route), range(len(route)))
     
     def optimize_trip(self, pois: List[Dict], num_days: int, 
                      daily_time_limit: int = 480, transport_mode: str = 'driving',
-                     start_time: str = '09:00', is_weekend: bool = False) -> Dict[str, Any]:
+                     start_time: str = '09:00', is_weekend: bool = False,
+                     max_improvement_iterations: Optional[int] = None,
+                     improvement_time_budget_ms: Optional[float] = DEFAULT_IMPROVEMENT_BUDGET_MS,
+                     execution: str = 'auto',
+                     diagnostics: bool = False,
+                     time_budget_ms: Optional[float] = None) -> Dict[str, Any]:
         """
         优化整个行程
         
@@ -197,6 +476,12 @@ class RouteOptimizer:
             pois: POI列表
             num_days: 天数
             daily_time_limit: 每日时间限制（分钟），默认8小时
+            max_improvement_iterations: 每天局部搜索的最大改进次数，为空时不限制
+            improvement_time_budget_ms: 每天局部搜索的时间预算（毫秒），默认50毫秒
+            execution: 各天优化的执行方式，'serial'、'thread'、'process'或'auto'（小行程串行）
+            diagnostics: 是否在结果的diagnostics字段中返回分阶段耗时、缓存命中和各天求解信息
+            time_budget_ms: 整个优化的时间预算（毫秒），到期时各阶段返回当前最好的结果，
+                并在summary中标记best_effort；为空时不限制
             
         Returns:
             优化后的行程安排
@@ -213,122 +498,532 @@ class RouteOptimizer:
                 'error': '天数必须大于0'
             }
         
+        if execution not in EXECUTION_MODES:
+            return {
+                'success': False,
+                'error': f'不支持的执行方式: {execution}'
+            }
+        
+        # 截止时间使用墙钟时间，便于传给进程池中的工作进程
+        deadline = time.time() + time_budget_ms / 1000 if time_budget_ms is not None else None
+        
+        diag = Diagnostics() if diagnostics else NULL_DIAGNOSTICS
+        token = diag.activate()
+        started = time.perf_counter() if diag.enabled else 0.0
+        cache_before = self.distance_cache.stats() if diag.enabled else None
+        
         try:
-            # 第一步：使用K-means聚类分组POI
-            clustered_pois = self.cluster_pois(pois, num_days)
+            # 第一步：一次性计算整个行程的距离矩阵
+            distance_matrix = self.build_distance_matrix(pois)
+            
+            # 第二步：按地理位置和每日时间预算分组POI
+            clustering_deadline = None
+            if deadline is not None:
+                remaining = max(deadline - time.time(), 0.0)
+                clustering_deadline = time.perf_counter() + remaining * CLUSTERING_BUDGET_SHARE
+            clustering_stats = {}
+            clustered_indices = self._cluster_indices(
+                pois, num_days,
+                distance_matrix=distance_matrix,
+                daily_time_limit=daily_time_limit,
+                transport_mode=transport_mode,
+                start_time=start_time,
+                is_weekend=is_weekend,
+                deadline=clustering_deadline,
+                stats=clustering_stats
+            )
+            best_effort = bool(clustering_stats.get('budget_exhausted')) and not clustering_stats.get('converged')
+            
+            # 第三步：为每天的POI优化顺序（各天相互独立，可并行）
+            options = {
+                'daily_time_limit': daily_time_limit,
+                'transport_mode': transport_mode,
+                'start_time': start_time,
+                'is_weekend': is_weekend,
+                'max_improvement_iterations': max_improvement_iterations,
+                'improvement_time_budget_ms': improvement_time_budget_ms,
+                'diagnostics': diag.enabled,
+                'deadline': deadline
+            }
+            tasks = [
+                (day_index, [pois[i] for i in day_indices], submatrix(distance_matrix, day_indices))
+                for day_index, day_indices in enumerate(clustered_indices)
+                if day_indices
+            ]
+            mode = self._resolve_execution(execution, len(pois), len(tasks))
+            with diag.phase('days'):
+                day_results = self._run_day_tasks(tasks, options, mode)
+            
+            # 按天序确定性合并结果；POI对象取自输入列表，与执行方式无关
+            planned = {}
+            for (day_index, _, _), (order, day_result, day_stats) in zip(tasks, day_results):
+                planned[day_index] = (order, day_result)
+                best_effort = best_effort or day_stats.get('best_effort', False)
+                diag.add_day(dict(day_stats, day=day_index + 1))
             
-            # 第二步：为每天的POI优化顺序
             optimized_days = []
             total_distance = 0
             total_duration = 0
             
-            for day_index, day_pois in enumerate(clustered_pois):
-                if not day_pois:
+            for day_index, day_indices in enumerate(clustered_indices):
+                if day_index not in planned:
                     optimized_days.append({
                         'day': day_index + 1,
                         'pois': [],
                         'routes': [],
+                        'visits': [],
                         'total_distance': 0,
                         'total_duration': 0,
                         'estimated_time': 0
                     })
                     continue
                 
-                # 优化当天POI顺序
-                optimized_pois = self.solve_tsp_greedy(day_pois)
-                
-                # 计算路线信息
-                routes = []
-                day_distance = 0
-                day_duration = 0
+                order, day_result = planned[day_index]
+                optimized_pois = [pois[day_indices[k]] for k in order]
                 
-                # 解析开始时间
-                start_hour = int(start_time.split(':')[0])
-                current_time = start_hour
+                optimized_days.append(dict(day_result, day=day_index + 1, pois=optimized_pois))
                 
-                for i in range(len(optimized_pois) - 1):
-                    distance = self.calculate_distance(optimized_pois[i], optimized_pois[i + 1])
-                    
-                    # 使用改进的时间预估算法
-                    travel_time = self.calculate_time_estimate(
-                        distance_km=distance,
-                        transport_mode=transport_mode,
-                        time_of_day=int(current_time),
-                        is_weekend=is_weekend
-                    )
-                    
-                    # 计算费用
-                    cost = self._calculate_transport_cost(distance, transport_mode)
-                    
-                    routes.append({
-                        'from_poi_id': optimized_pois[i]['id'],
-                        'to_poi_id': optimized_pois[i + 1]['id'],
-                        'distance': round(distance * 1000, 0),  # 转换为米
-                        'duration': travel_time,
-                        'mode': transport_mode,
-                        'cost': cost
-                    })
-                    
-                    day_distance += distance
-                    day_duration += travel_time
-                    
-                    # 更新当前时间（加上旅行时间）
-                    current_time += travel_time / 60
-                
-                # 计算POI游览时间（使用改进的停留时间计算）
-                poi_time = 0
-                poi_current_time = start_hour  # 使用实际开始时间
-                
-                for poi in optimized_pois:
-                    stay_duration = self.calculate_poi_stay_duration(poi, int(poi_current_time))
-                    poi_time += stay_duration
-                    poi_current_time += stay_duration / 60
-                total_day_time = day_duration + poi_time
-                
-                optimized_days.append({
-                    'day': day_index + 1,
-                    'pois': optimized_pois,
-                    'routes': routes,
-                    'total_distance': round(day_distance, 2),
-                    'total_duration': round(day_duration, 0),
-                    'poi_time': poi_time,
-                    'estimated_time': round(total_day_time, 0),
-                    'time_exceeded': total_day_time > daily_time_limit
-                })
-                
-                total_distance += day_distance
-                total_duration += day_duration
+                total_distance += day_result['total_distance']
+                total_duration += day_result['total_duration']
             
-            return {
+            result = {
                 'success': True,
                 'days': optimized_days,
                 'summary': {
                     'total_distance': round(total_distance, 2),
                     'total_duration': round(total_duration, 0),
                     'total_pois': len(pois),
-                    'num_days': num_days
+                    'num_days': num_days,
+                    'execution': mode,
+                    'best_effort': best_effort
                 }
             }
             
+            if diag.enabled:
+                diag.add_time('total', (time.perf_counter() - started) * 1000)
+                diag.set('execution', mode)
+                diag.set('clustering', clustering_stats)
+                diag.set('distance_cache', self._cache_delta(cache_before, self.distance_cache.stats()))
+                result['diagnostics'] = diag.to_dict()
+            
+            return result
+            
         except Exception as e:
             return {
                 'success': False,
                 'error': f'路线优化失败: {str(e)}'
             }
+        finally:
+            diag.deactivate(token)
     
-    def calculate_time_estimate(self, distance_km: float, transport_mode: str = 'driving', 
-                              time_of_day: int = 12, is_weekend: bool = False) -> int:
+    @staticmethod
+    def _cache_delta(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
         """
-        根据距离和交通方式估算时间（考虑现实因素）
+        计算本次优化期间距离缓存的命中情况（共享缓存被并发请求使用时为近似值）
+        
+        Args:
+            before: 优化前的缓存统计
+            after: 优化后的缓存统计
+            
+        Returns:
+            命中次数、未命中次数和命中率
+        """
+        hits = after['hits'] - before['hits']
+        misses = after['misses'] - before['misses']
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+            'shared_hits': after['shared_hits'] - before['shared_hits'],
+            'shared_misses': after['shared_misses'] - before['shared_misses']
+        }
+    
+    def _resolve_execution(self, execution: str, num_pois: int, num_tasks: int) -> str:
+        """
+        确定各天优化的实际执行方式
+        
+        Args:
+            execution: 请求的执行方式
+            num_pois: POI总数
+            num_tasks: 非空天数
+            
+        Returns:
+            'serial'、'thread'或'process'
+        """
+        if num_tasks <= 1:
+            return 'serial'
+        if execution != 'auto':
+            return execution
+        
+        # 小行程的调度开销大于收益，保持串行
+        if num_pois < PARALLEL_MIN_POIS:
+            return 'serial'
+        
+        # 已在进程池工作进程中（如异步规划任务）时改用线程，避免进程数相乘
+        if multiprocessing.parent_process() is not None:
+            return 'thread'
+        return 'process'
+    
+    def _run_day_tasks(self, tasks: List[Tuple[int, List[Dict], np.ndarray]],
+                       options: Dict[str, Any], mode: str) -> List[Tuple[List[int], Dict[str, Any], Dict[str, Any]]]:
+        """
+        按执行方式运行各天的优化任务，结果顺序与任务顺序一致
+        
+        Args:
+            tasks: (天索引, 当天POI, 当天距离矩阵)列表
+            options: 每天优化参数，deadline为总截止时间
+            mode: 'serial'、'thread'或'process'
+            
+        Returns:
+            (索引顺序, 当天结果, 当天求解信息)列表
+        """
+        if mode == 'serial':
+            results = []
+            for k, (_, day_pois, day_matrix) in enumerate(tasks):
+                # 串行时每天开始前按剩余天数重新分配剩余预算，前面节省的时间留给后面
+                day_options = dict(options, deadline=_day_deadlines(options['deadline'], len(tasks) - k, 1)[0])
+                results.append(self._plan_day(day_pois, day_matrix, day_options))
+            return results
+        
+        deadlines = _day_deadlines(options['deadline'], len(tasks), DAY_WORKERS)
+        executor = _get_day_executor(mode)
+        if mode == 'thread':
+            futures = [
+                executor.submit(self._plan_day, day_pois, day_matrix, dict(options, deadline=day_deadline))
+                for (_, day_pois, day_matrix), day_deadline in zip(tasks, deadlines)
+            ]
+        else:
+            config = {
+                'distance_mode': self.distance_mode,
+                'exact_threshold': self.exact_threshold,
+                'improvement_stages': self.improvement_stages
+            }
+            futures = [
+                executor.submit(_plan_day_in_worker, config, day_pois, day_matrix,
+                                dict(options, deadline=day_deadline))
+                for (_, day_pois, day_matrix), day_deadline in zip(tasks, deadlines)
+            ]
+        return [future.result() for future in futures]
+    
+    def _plan_day(self, day_pois: List[Dict], day_matrix: np.ndarray,
+                  options: Dict[str, Any]) -> Tuple[List[int], Dict[str, Any], Dict[str, Any]]:
+        """
+        优化单日POI顺序并计算路线与时间
+        
+        Args:
+            day_pois: 当天POI列表
+            day_matrix: 当天距离矩阵
+            options: 优化参数（见optimize_trip），deadline为当天的截止时间
+            
+        Returns:
+            (当天POI的索引顺序, 不含pois字段的当天结果, 当天求解信息)
+        """
+        stats = {'pois': len(day_pois)}
+        if not options.get('diagnostics'):
+            order = self._order_day(day_pois, day_matrix, options, stats)
+            return order, self._build_day_schedule(day_pois, day_matrix, order, options), stats
+        
+        # 启用诊断时在工作线程/进程内计时，结果随返回值带回
+        started = time.perf_counter()
+        order = self._order_day(day_pois, day_matrix, options, stats)
+        solved = time.perf_counter()
+        day_result = self._build_day_schedule(day_pois, day_matrix, order, options)
+        stats['tsp_ms'] = round((solved - started) * 1000, 3)
+        stats['schedule_ms'] = round((time.perf_counter() - solved) * 1000, 3)
+        return order, day_result, stats
+    
+    def _order_day(self, day_pois: List[Dict], day_matrix: np.ndarray,
+                   options: Dict[str, Any], stats: Optional[Dict[str, Any]] = None) -> List[int]:
+        """
+        确定单日POI的访问顺序：先按距离求解，有营业时间限制时再按时间窗调整
+        
+        Args:
+            day_pois: 当天POI列表
+            day_matrix: 当天距离矩阵
+            options: 优化参数（见optimize_trip）
+            stats: 传入字典时写入求解信息；设置截止时间时包含best_effort
+            
+        Returns:
+            当天POI的索引顺序
+        """
+        deadline = options.get('deadline')
+        if stats is None:
+            stats = {}
+        
+        # 剩余预算不足以完成精确求解时改用启发式，局部搜索不超过剩余预算
+        exact_threshold = self._exact_threshold_within(_remaining_ms(deadline))
+        downgraded = exact_threshold < len(day_matrix) <= self.exact_threshold
+        
+        # 优化当天POI顺序（基于当天的子矩阵按索引求解）
+        order = self._solve_tsp(
+            day_matrix,
+            exact_threshold=exact_threshold,
+            max_iterations=options['max_improvement_iterations'],
+            time_budget_ms=_capped_budget(options['improvement_time_budget_ms'], deadline),
+            stats=stats
+        )
+        
+        order = self._apply_time_windows(day_pois, day_matrix, order, options, stats)
+        if deadline is not None:
+            stats['best_effort'] = downgraded or time.time() >= deadline
+        return order
+    
+    def _apply_time_windows(self, day_pois: List[Dict], day_matrix: np.ndarray, order: List[int],
+                            options: Dict[str, Any], stats: Dict[str, Any]) -> List[int]:
+        """
+        有营业时间限制时按时间窗调整访问顺序，否则原样返回
+        
+        Args:
+            day_pois: 当天POI列表
+            day_matrix: 当天距离矩阵
+            order: 按距离求解的索引顺序
+            options: 优化参数（见optimize_trip）
+            stats: 写入时间窗求解信息
+            
+        Returns:
+            调整后的索引顺序
+        """
+        windows = [parse_open_hours(poi.get('openHours')) for poi in day_pois]
+        if len(order) < 2 or all(day_windows is None for day_windows in windows):
+            return order
+        
+        deadline = options.get('deadline')
+        
+        # 按开始时间线性化交通时间，构造带时间窗的路径问题
+        day_start = parse_clock(options['start_time'])
+        base_minutes, per_km_minutes = self._linear_time_model(
+            options['transport_mode'], day_start // 60, options['is_weekend']
+        )
+        travel = base_minutes + per_km_minutes * np.asarray(day_matrix)
+        stay = [self.calculate_poi_stay_duration(poi, day_start // 60) for poi in day_pois]
+        problem = TimeWindowProblem(day_matrix, travel, stay, windows, day_start)
+        
+        order, lateness, moves = solve_with_time_windows(
+            problem, order,
+            max_iterations=options['max_improvement_iterations'],
+            time_budget_ms=_capped_budget(options['improvement_time_budget_ms'], deadline)
+        )
+        stats['time_window_moves'] = moves
+        stats['time_window_lateness'] = round(lateness, 1)
+        return order
+    
+    def insert_poi(self, days: List[List[Dict]], poi: Dict,
+                   options: Optional[Dict[str, Any]] = None) -> Tuple[int, List[Dict], Dict[str, Any]]:
+        """
+        增量规划：将新POI插入已有日程，只重新计算受影响的一天
+        
+        对每天求最便宜的插入位置，优先选择插入后不超时、不违反营业时间、已有安排且
+        增加距离最少的一天，再对该天做局部修复。
+        
+        Args:
+            days: 每天按访问顺序排列的POI列表（可以包含空列表）
+            poi: 新POI
+            options: 规划参数（见optimize_trip），缺省项使用默认值；time_budget_ms限制局部修复的总耗时
+            
+        Returns:
+            (天索引, 当天新的POI顺序, 不含pois字段的当天结果)
+        """
+        if not days:
+            raise ValueError('日程不能为空')
+        options = self._incremental_options(options)
+        
+        best = None
+        for day_index, day_pois in enumerate(days):
+            candidate = list(day_pois) + [poi]
+            matrix = self.build_distance_matrix(candidate)
+            position, added = _cheapest_insertion(matrix)
+            order = list(range(len(day_pois)))
+            order.insert(position, len(day_pois))
+            
+            schedule = self._build_day_schedule(candidate, matrix, order, options)
+            key = (schedule['time_exceeded'], schedule['window_violations'], not day_pois, added)
+            if best is None or key < best[0]:
+                best = (key, day_index, candidate, matrix, order)
+        
+        _, day_index, candidate, matrix, order = best
+        order = self._repair_day(candidate, matrix, order, options)
+        return day_index, [candidate[k] for k in order], self._build_day_schedule(candidate, matrix, order, options)
+    
+    def remove_poi(self, day_pois: List[Dict], poi_id: str,
+                   options: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict], Optional[Dict[str, Any]]]:
+        """
+        增量规划：从一天的日程中移除POI并局部修复该天
+        
+        Args:
+            day_pois: 当天按访问顺序排列的POI列表
+            poi_id: 要移除的POI ID
+            options: 规划参数（见optimize_trip），缺省项使用默认值；time_budget_ms限制局部修复的总耗时
+            
+        Returns:
+            (当天新的POI顺序, 不含pois字段的当天结果)，当天没有剩余POI时结果为None
+        """
+        remaining = [poi for poi in day_pois if poi['id'] != poi_id]
+        if not remaining:
+            return [], None
+        options = self._incremental_options(options)
+        
+        matrix = self.build_distance_matrix(remaining)
+        order = self._repair_day(remaining, matrix, list(range(len(remaining))), options)
+        return [remaining[k] for k in order], self._build_day_schedule(remaining, matrix, order, options)
+    
+    def _incremental_options(self, options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """补全增量规划参数（默认值与optimize_trip一致）；time_budget_ms换算为本次调用的截止时间"""
+        defaults = {
+            'daily_time_limit': 480,
+            'transport_mode': 'driving',
+            'start_time': '09:00',
+            'is_weekend': False,
+            'max_improvement_iterations': None,
+            'improvement_time_budget_ms': DEFAULT_IMPROVEMENT_BUDGET_MS
+        }
+        options = dict(defaults, **{key: value for key, value in (options or {}).items() if value is not None})
+        time_budget_ms = options.pop('time_budget_ms', None)
+        options['deadline'] = time.time() + time_budget_ms / 1000 if time_budget_ms is not None else None
+        return options
+    
+    def _repair_day(self, day_pois: List[Dict], day_matrix: np.ndarray, order: List[int],
+                    options: Dict[str, Any]) -> List[int]:
+        """
+        对插入或移除后的单日路线做局部修复（起点不变），再按营业时间调整
+        
+        Args:
+            day_pois: 当天POI列表
+            day_matrix: 当天距离矩阵
+            order: 当前索引顺序
+            options: 规划参数
+            
+        Returns:
+            修复后的索引顺序
+        """
+        if len(order) > 2:
+            order, _ = improve_route(
+                day_matrix, order,
+                stages=self.improvement_stages,
+                max_iterations=options['max_improvement_iterations'],
+                time_budget_ms=_capped_budget(options['improvement_time_budget_ms'], options['deadline'])
+            )
+        return self._apply_time_windows(day_pois, day_matrix, order, options, {})
+    
+    def _exact_threshold_within(self, remaining_ms: Optional[float]) -> int:
+        """
+        剩余预算内能完成Held-Karp精确求解的最大POI数量
+        
+        Args:
+            remaining_ms: 剩余时间（毫秒），为空时不限制
+            
+        Returns:
+            精确求解阈值（不超过实例配置）
+        """
+        threshold = self.exact_threshold
+        if remaining_ms is None:
+            return threshold
+        while threshold > 2 and threshold ** 2 * 2 ** threshold * HELD_KARP_MS_PER_STATE > remaining_ms:
+            threshold -= 1
+        return threshold
+    
+    def _build_day_schedule(self, day_pois: List[Dict], day_matrix: np.ndarray,
+                            order: List[int], options: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        按给定顺序计算单日的路线、交通时间、费用和游览时间
+        
+        Args:
+            day_pois: 当天POI列表
+            day_matrix: 当天距离矩阵
+            order: 当天POI的索引顺序
+            options: 优化参数（见optimize_trip）
+            
+        Returns:
+            不含pois字段的当天结果
+        """
+        transport_mode = options['transport_mode']
+        is_weekend = options['is_weekend']
+        optimized_pois = [day_pois[k] for k in order]
+        
+        # 计算路线信息
+        routes = []
+        visits = []
+        day_distance = 0
+        day_duration = 0
+        poi_time = 0
+        wait_time = 0
+        window_violations = 0
+        
+        # 按时间线依次计算交通、等待开门和游览时间（分钟）
+        clock = parse_clock(options['start_time'])
+        
+        for i, poi in enumerate(optimized_pois):
+            if i > 0:
+                distance = float(day_matrix[order[i - 1], order[i]])
+                
+                # 使用改进的时间预估算法
+                travel_time = self.calculate_time_estimate(
+                    distance_km=distance,
+                    transport_mode=transport_mode,
+                    time_of_day=int(clock // 60) % 24,
+                    is_weekend=is_weekend
+                )
+                
+                # 计算费用
+                cost = self._calculate_transport_cost(distance, transport_mode)
+                
+                routes.append({
+                    'from_poi_id': optimized_pois[i - 1]['id'],
+                    'to_poi_id': poi['id'],
+                    'distance': round(distance * 1000, 0),  # 转换为米
+                    'duration': travel_time,
+                    'mode': transport_mode,
+                    'cost': cost
+                })
+                
+                day_distance += distance
+                day_duration += travel_time
+                clock += travel_time
+            
+            # 计算POI游览时间（使用改进的停留时间计算），早到时等待开门
+            stay_duration = self.calculate_poi_stay_duration(poi, int(clock // 60) % 24)
+            visit_begin, late = visit_start(clock, stay_duration, parse_open_hours(poi.get('openHours')))
+            if late > 0:
+                window_violations += 1
+            
+            visits.append({
+                'arrival': _format_clock(clock),
+                'start': _format_clock(visit_begin),
+                'end': _format_clock(visit_begin + stay_duration),
+                'wait': round(visit_begin - clock),
+                'late': round(late)
+            })
+            
+            wait_time += visit_begin - clock
+            poi_time += stay_duration
+            clock = visit_begin + stay_duration
+        
+        total_day_time = day_duration + poi_time + wait_time
+        
+        return {
+            'routes': routes,
+            'visits': visits,
+            'total_distance': round(day_distance, 2),
+            'total_duration': round(day_duration, 0),
+            'poi_time': poi_time,
+            'wait_time': round(wait_time),
+            'window_violations': window_violations,
+            'estimated_time': round(total_day_time, 0),
+            'time_exceeded': total_day_time > options['daily_time_limit']
+        }
+    
+    @staticmethod
+    def _time_parameters(transport_mode: str, time_of_day: int, is_weekend: bool) -> Tuple[float, float, float]:
+        """
+        时间预估的参数（考虑现实因素）
         
         Args:
-            distance_km: 距离（公里）
             transport_mode: 交通方式
             time_of_day: 一天中的小时（0-23）
             is_weekend: 是否为周末
             
         Returns:
-            估算时间（分钟）
+            (速度km/h, 固定等待分钟, 每公里额外分钟)
         """
         # 基础速度（km/h）
         base_speeds = {
@@ -359,19 +1054,53 @@ class RouteOptimizer:
         else:
             waiting_time = 0
         
+        # 额外时间（红绿灯、路口等）：每公里增加1-2分钟
+        extra_per_km = 1.5 if transport_mode in ['driving', 'cycling'] else 0
+        
+        return base_speed, waiting_time, extra_per_km
+    
+    def calculate_time_estimate(self, distance_km: float, transport_mode: str = 'driving', 
+                              time_of_day: int = 12, is_weekend: bool = False) -> int:
+        """
+        根据距离和交通方式估算时间（考虑现实因素）
+        
+        Args:
+            distance_km: 距离（公里）
+            transport_mode: 交通方式
+            time_of_day: 一天中的小时（0-23）
+            is_weekend: 是否为周末
+            
+        Returns:
+            估算时间（分钟）
+        """
+        base_speed, waiting_time, extra_per_km = self._time_parameters(transport_mode, time_of_day, is_weekend)
+        
         # 计算行驶时间
         travel_time = (distance_km / base_speed) * 60  # 分钟
-        
-        # 添加额外时间（红绿灯、路口等）
-        if transport_mode in ['driving', 'cycling']:
-            # 每公里增加1-2分钟的额外时间
-            extra_time = distance_km * 1.5
-        else:
-            extra_time = 0
+        extra_time = distance_km * extra_per_km
         
         total_time = travel_time + waiting_time + extra_time
         return round(max(total_time, 1))  # 至少1分钟
     
+    def calculate_time_estimates(self, distances_km: np.ndarray, transport_mode: str = 'driving',
+                                 time_of_day: int = 12, is_weekend: bool = False) -> np.ndarray:
+        """
+        calculate_time_estimate的向量化版本，逐元素结果与之一致
+        
+        Args:
+            distances_km: 距离数组（公里）
+            transport_mode: 交通方式
+            time_of_day: 一天中的小时（0-23）
+            is_weekend: 是否为周末
+            
+        Returns:
+            估算时间数组（分钟，整数）
+        """
+        base_speed, waiting_time, extra_per_km = self._time_parameters(transport_mode, time_of_day, is_weekend)
+        distances_km = np.asarray(distances_km, dtype=np.float64)
+        total_time = (distances_km / base_speed) * 60 + waiting_time + distances_km * extra_per_km
+        return np.round(np.maximum(total_time, 1)).astype(np.int32)
+    
     def calculate_poi_stay_duration(self, poi: Dict, time_of_day: int = 12) -> int:
         """
         计算景点的建议停留时间（考虑实际因素）
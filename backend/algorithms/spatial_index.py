@@ -0,0 +1,179 @@
+"""
+空间索引
+按经纬度网格排序的静态点集：网格键有序存放，同一网格行内的相邻网格在数组中连续，
+半径查询只需对每个网格行做一次二分查找取出连续区间，再用Haversine距离精确过滤和排序
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from algorithms.distance_matrix import EARTH_RADIUS_KM
+
+EARTH_RADIUS_M = EARTH_RADIUS_KM * 1000
+
+# 默认网格边长（度），约1.1公里
+DEFAULT_CELL_DEG = 0.01
+
+# 每度纬度对应的米数
+METERS_PER_DEG = math.pi * EARTH_RADIUS_M / 180
+
+
+class SpatialIndex:
+    """只读的网格空间索引，位置（position）指构建时传入点的下标"""
+
+    def __init__(self, lats: Sequence[float], lngs: Sequence[float],
+                 categories: Optional[Sequence[Optional[str]]] = None,
+                 cell_deg: float = DEFAULT_CELL_DEG):
+        """
+        构建索引
+
+        Args:
+            lats: 纬度（度）
+            lngs: 经度（度）
+            categories: 每个点的类别，用于类别过滤
+            cell_deg: 网格边长（度）
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        self.size = len(lats)
+        self.cell_deg = float(cell_deg)
+        self.num_cols = int(math.ceil(360.0 / self.cell_deg))
+        self.num_rows = int(math.ceil(180.0 / self.cell_deg)) + 1
+
+        # 类别编码：0表示无类别
+        self.category_codes: Dict[str, int] = {}
+        codes = np.zeros(self.size, dtype=np.int32)
+        if categories is not None:
+            for position, category in enumerate(categories):
+                if category:
+                    codes[position] = self.category_codes.setdefault(category, len(self.category_codes) + 1)
+
+        keys = self._cell_keys(lats, lngs)
+        order = np.argsort(keys, kind='stable')
+        self._keys = keys[order]
+        self._positions = order.astype(np.int64)
+        self._lat = np.radians(lats[order])
+        self._lng = np.radians(lngs[order])
+        self._cos_lat = np.cos(self._lat)
+        self._codes = codes[order]
+
+    def _cell_rows(self, lats: np.ndarray) -> np.ndarray:
+        return np.clip(((lats + 90.0) / self.cell_deg).astype(np.int64), 0, self.num_rows - 1)
+
+    def _cell_cols(self, lngs: np.ndarray) -> np.ndarray:
+        wrapped = np.mod(lngs + 180.0, 360.0)
+        return np.minimum((wrapped / self.cell_deg).astype(np.int64), self.num_cols - 1)
+
+    def _cell_keys(self, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        return self._cell_rows(lats) * self.num_cols + self._cell_cols(lngs)
+
+    def _candidate_slices(self, lat: float, lng: float, radius_m: float) -> List[slice]:
+        """半径外接矩形覆盖的网格在有序数组中的区间（每个网格行最多两段）"""
+        dlat = radius_m / METERS_PER_DEG
+        lat_min, lat_max = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        row_start, row_end = self._cell_rows(np.array([lat_min, lat_max]))
+
+        # 经度跨度取矩形内纬度绝对值最大处；接近极点时覆盖全部经度
+        widest = max(abs(lat_min), abs(lat_max))
+        cos_widest = math.cos(math.radians(widest))
+        if cos_widest <= 1e-9 or radius_m / (METERS_PER_DEG * cos_widest) >= 180.0:
+            col_ranges = [(0, self.num_cols - 1)]
+        else:
+            dlng = radius_m / (METERS_PER_DEG * cos_widest)
+            col_start, col_end = self._cell_cols(np.array([lng - dlng, lng + dlng]))
+            if col_start <= col_end:
+                col_ranges = [(col_start, col_end)]
+            else:
+                # 跨越±180°经线
+                col_ranges = [(col_start, self.num_cols - 1), (0, col_end)]
+
+        rows = np.arange(row_start, row_end + 1, dtype=np.int64) * self.num_cols
+        lows = np.concatenate([rows + start for start, _ in col_ranges])
+        highs = np.concatenate([rows + end + 1 for _, end in col_ranges])
+        starts = np.searchsorted(self._keys, lows, side='left')
+        ends = np.searchsorted(self._keys, highs, side='left')
+        return [slice(start, end) for start, end in zip(starts.tolist(), ends.tolist()) if end > start]
+
+    def _category_filter(self, categories: Optional[Iterable[str]]) -> Optional[np.ndarray]:
+        if not categories:
+            return None
+        return np.array([self.category_codes.get(category, -1) for category in categories], dtype=np.int32)
+
+    def _distances(self, lat: float, lng: float, sorted_index: np.ndarray) -> np.ndarray:
+        """查询点到有序数组中指定点的Haversine距离（米）"""
+        lat_rad, lng_rad = math.radians(lat), math.radians(lng)
+        sin_dlat = np.sin((self._lat[sorted_index] - lat_rad) / 2)
+        sin_dlng = np.sin((self._lng[sorted_index] - lng_rad) / 2)
+        h = sin_dlat ** 2 + math.cos(lat_rad) * self._cos_lat[sorted_index] * sin_dlng ** 2
+        return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+    def query_radius(self, lat: float, lng: float, radius_m: float,
+                     categories: Optional[Iterable[str]] = None,
+                     limit: Optional[int] = None,
+                     exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        半径查询
+
+        Args:
+            lat: 查询点纬度
+            lng: 查询点经度
+            radius_m: 半径（米）
+            categories: 只返回这些类别
+            limit: 最多返回的数量
+            exclude: 按位置标记的布尔数组，为True的点被排除（如已删除）
+
+        Returns:
+            (位置数组, 距离数组（米）)，按距离升序
+        """
+        slices = self._candidate_slices(lat, lng, radius_m)
+        if not slices:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        candidates = np.concatenate([np.arange(s.start, s.stop) for s in slices])
+        codes = self._category_filter(categories)
+        if codes is not None:
+            candidates = candidates[np.isin(self._codes[candidates], codes)]
+        if exclude is not None and len(candidates):
+            candidates = candidates[~exclude[self._positions[candidates]]]
+
+        distances = self._distances(lat, lng, candidates)
+        inside = distances <= radius_m
+        candidates, distances = candidates[inside], distances[inside]
+
+        if limit is not None and len(distances) > limit:
+            nearest = np.argpartition(distances, limit - 1)[:limit]
+            candidates, distances = candidates[nearest], distances[nearest]
+        order = np.argsort(distances, kind='stable')
+        return self._positions[candidates[order]], distances[order]
+
+    def nearest(self, lat: float, lng: float, k: int,
+                categories: Optional[Iterable[str]] = None,
+                max_radius_m: Optional[float] = None,
+                exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        k近邻查询：从一个网格的半径开始逐步扩大，直到半径内已有k个点
+
+        Args:
+            lat: 查询点纬度
+            lng: 查询点经度
+            k: 返回数量
+            categories: 只返回这些类别
+            max_radius_m: 最大搜索半径（米），为空时不限
+            exclude: 按位置标记的布尔数组，为True的点被排除
+
+        Returns:
+            (位置数组, 距离数组（米）)，按距离升序
+        """
+        if k <= 0 or self.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        limit_m = max_radius_m if max_radius_m is not None else math.pi * EARTH_RADIUS_M
+        radius = min(self.cell_deg * METERS_PER_DEG, limit_m)
+        while True:
+            positions, distances = self.query_radius(lat, lng, radius, categories, k, exclude)
+            # 半径内的点已按精确距离筛选，够k个即为真正的k近邻
+            if len(positions) >= k or radius >= limit_m:
+                return positions, distances
+            radius = min(radius * 4, limit_m)
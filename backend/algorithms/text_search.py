@@ -0,0 +1,257 @@
+"""
+POI全文检索
+倒排索引：中文按单字和相邻二字切分，字母数字按词切分；多字段加权的BM25打分；
+名称前缀索引（有序名称数组+二分查找）用于输入联想。文档ID为调用方给定的连续整数
+"""
+
+import bisect
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 字段权重：名称命中远比描述命中重要
+FIELD_WEIGHTS = (('name', 3.0), ('category', 2.0), ('address', 1.0), ('description', 0.5))
+
+# BM25参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 文档频率超过该比例的词在有其他查询词时跳过（相当于停用词）
+COMMON_TERM_RATIO = 0.5
+
+_CJK = r'㐀-䶿一-鿿豈-﫿'
+_RUNS = re.compile(rf'[{_CJK}]+|[a-z0-9]+')
+_IS_CJK = re.compile(rf'[{_CJK}]')
+
+
+def normalize(text: Optional[str]) -> str:
+    """全角转半角、转小写"""
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def index_terms(text: Optional[str]) -> List[str]:
+    """
+    索引时的切分：中文连续段输出所有单字和相邻二字，字母数字输出整词
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        词列表（含重复）
+    """
+    terms = []
+    for run in _RUNS.findall(normalize(text)):
+        if _IS_CJK.match(run):
+            terms.extend(run)
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            terms.append(run)
+    return terms
+
+
+def query_terms(text: Optional[str]) -> List[str]:
+    """
+    查询时的切分：中文单字查单字，两个字以上查相邻二字，字母数字查整词
+
+    Args:
+        text: 查询文本
+
+    Returns:
+        去重后的词列表
+    """
+    terms = []
+    for run in _RUNS.findall(normalize(text)):
+        if _IS_CJK.match(run) and len(run) > 1:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            terms.append(run)
+    return list(dict.fromkeys(terms))
+
+
+def _name_key(name: Optional[str]) -> str:
+    """前缀索引使用的名称键"""
+    return re.sub(r'\s+', '', normalize(name))
+
+
+def name_has_prefix(name: Optional[str], prefix: str) -> bool:
+    """名称（忽略大小写、全半角和空白）是否以prefix开头"""
+    key = _name_key(prefix)
+    return bool(key) and _name_key(name).startswith(key)
+
+
+class TextIndex:
+    """可增量更新的倒排索引"""
+
+    def __init__(self, records: Sequence[Dict] = ()):
+        """
+        批量构建索引，records[i]的文档ID为i
+
+        Args:
+            records: 含name、category、address、description字段的记录
+        """
+        postings: Dict[str, Tuple[List[int], List[float]]] = defaultdict(lambda: ([], []))
+        lengths = np.zeros(len(records), dtype=np.float32)
+        names = []
+        for doc, record in enumerate(records):
+            weights, length = self._term_weights(record)
+            lengths[doc] = length
+            for term, weight in weights.items():
+                docs, tfs = postings[term]
+                docs.append(doc)
+                tfs.append(weight)
+            names.append((_name_key(record.get('name')), doc))
+
+        # 构建后的倒排表为只读数组，增量文档写入_delta
+        self._postings = {
+            term: (np.array(docs, dtype=np.int64), np.array(tfs, dtype=np.float32))
+            for term, (docs, tfs) in postings.items()
+        }
+        self._delta: Dict[str, Tuple[List[int], List[float]]] = defaultdict(lambda: ([], []))
+        self._lengths = lengths
+        self._total_length = float(lengths.sum())
+        self._size = len(records)
+        self._deleted = set()
+        names.sort()
+        self._names = names
+
+    @staticmethod
+    def _term_weights(record: Dict) -> Tuple[Counter, float]:
+        """记录的加权词频及加权长度"""
+        weights = Counter()
+        length = 0.0
+        for field, weight in FIELD_WEIGHTS:
+            terms = index_terms(record.get(field))
+            for term in terms:
+                weights[term] += weight
+            length += weight * len(terms)
+        return weights, length
+
+    @property
+    def document_count(self) -> int:
+        """有效文档数"""
+        return self._size - len(self._deleted)
+
+    def add(self, doc: int, record: Dict):
+        """
+        增量加入文档
+
+        Args:
+            doc: 文档ID（不小于当前已加入的最大ID）
+            record: 记录
+        """
+        weights, length = self._term_weights(record)
+        for term, weight in weights.items():
+            docs, tfs = self._delta[term]
+            docs.append(doc)
+            tfs.append(weight)
+
+        if doc >= len(self._lengths):
+            grown = np.zeros(max(doc + 1, len(self._lengths) * 2, 16), dtype=np.float32)
+            grown[:len(self._lengths)] = self._lengths
+            self._lengths = grown
+        self._lengths[doc] = length
+        self._total_length += length
+        self._size = max(self._size, doc + 1)
+        bisect.insort(self._names, (_name_key(record.get('name')), doc))
+
+    def remove(self, doc: int):
+        """删除文档（查询时过滤）"""
+        if doc < self._size and doc not in self._deleted:
+            self._deleted.add(doc)
+            self._total_length -= float(self._lengths[doc])
+
+    def _term_postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        docs, tfs = self._postings.get(term, (None, None))
+        delta = self._delta.get(term)
+        if delta is None or not delta[0]:
+            if docs is None:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            return docs, tfs
+        delta_docs = np.array(delta[0], dtype=np.int64)
+        delta_tfs = np.array(delta[1], dtype=np.float32)
+        if docs is None:
+            return delta_docs, delta_tfs
+        return np.concatenate([docs, delta_docs]), np.concatenate([tfs, delta_tfs])
+
+    def search(self, query: str, limit: int = 20) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        BM25检索
+
+        未命中全部查询词的文档按命中比例降低得分。
+
+        Args:
+            query: 查询文本
+            limit: 返回数量
+
+        Returns:
+            (文档ID数组, 得分数组)，按得分降序
+        """
+        terms = query_terms(query)
+        count = self.document_count
+        if not terms or count == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        postings = [(term, *self._term_postings(term)) for term in terms]
+        postings = [item for item in postings if len(item[1])]
+        if not postings:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        # 有更具区分度的词时跳过极常见的词
+        rare = [item for item in postings if len(item[1]) <= count * COMMON_TERM_RATIO]
+        if rare:
+            postings = rare
+
+        average_length = max(self._total_length / count, 1e-9)
+        all_docs, all_scores = [], []
+        for _, docs, tfs in postings:
+            df = len(docs)
+            idf = np.log(1 + (count - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[docs] / average_length)
+            all_docs.append(docs)
+            all_scores.append(idf * tfs * (BM25_K1 + 1) / (tfs + norm))
+
+        if len(all_docs) == 1:
+            docs, scores = all_docs[0], all_scores[0].astype(np.float64)
+        else:
+            docs, inverse = np.unique(np.concatenate(all_docs), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+            matched = np.bincount(inverse)
+            scores *= matched / len(terms)
+
+        if self._deleted:
+            alive = ~np.isin(docs, np.fromiter(self._deleted, dtype=np.int64))
+            docs, scores = docs[alive], scores[alive]
+
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            docs, scores = docs[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return docs[order], scores[order]
+
+    def suggest(self, prefix: str, limit: int = 10, scan: int = 200) -> List[int]:
+        """
+        名称前缀联想：返回名称以prefix开头的文档，较短的名称优先
+
+        Args:
+            prefix: 输入前缀
+            limit: 返回数量
+            scan: 最多检查的匹配数量
+
+        Returns:
+            文档ID列表
+        """
+        key = _name_key(prefix)
+        if not key:
+            return []
+        start = bisect.bisect_left(self._names, (key,))
+        matches = []
+        for name, doc in self._names[start:start + scan]:
+            if not name.startswith(key):
+                break
+            if doc not in self._deleted:
+                matches.append((len(name), name, doc))
+        matches.sort()
+        return [doc for _, _, doc in matches[:limit]]
@@ -0,0 +1,353 @@
+"""
+营业时间窗
+将POI的open_hours解析为分钟区间，并按时间窗调整单日访问顺序（带时间窗的TSP）
+"""
+
+import re
+import time
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+
+# 时间窗冲突（分钟）相对距离（公里）的权重，使局部搜索优先消除冲突
+LATENESS_WEIGHT = 1000.0
+
+# Or-opt移动的最大片段长度
+MAX_SEGMENT_LENGTH = 3
+
+# 时间窗类型：按开门时间排序的(开门, 关门)分钟区间，None表示不限制
+TimeWindows = Optional[Tuple[Tuple[int, int], ...]]
+
+_TIME_RANGE = re.compile(
+    r'(\d{1,2})\s*[:：]\s*(\d{2})\s*(?:-|~|～|—|–|－|至|到)\s*(次日)?\s*(\d{1,2})\s*[:：]\s*(\d{2})'
+)
+
+_ALWAYS_OPEN_MARKERS = ('全天', '24小时', '24h')
+
+_UNBOUNDED = float('inf')
+
+
+@lru_cache(maxsize=4096)
+def parse_open_hours(text: Optional[str]) -> TimeWindows:
+    """
+    将营业时间文本解析为分钟区间（按文本缓存，同一POI只解析一次）
+
+    支持'09:00-18:00'、'周一至周日 08:30-17:00'、'09:00-12:00，14:00-17:00'
+    以及跨午夜的'18:00-次日02:00'等格式；星期限制暂不解析。
+
+    Args:
+        text: 营业时间文本
+
+    Returns:
+        按开门时间排序的(开门, 关门)分钟区间；为空、全天开放或无法识别时返回None
+    """
+    if not text:
+        return None
+    if any(marker in text.lower() for marker in _ALWAYS_OPEN_MARKERS):
+        return None
+
+    windows = []
+    for match in _TIME_RANGE.finditer(text):
+        open_hour, open_minute, next_day, close_hour, close_minute = match.groups()
+        opens = int(open_hour) * 60 + int(open_minute)
+        closes = int(close_hour) * 60 + int(close_minute)
+        if opens >= MINUTES_PER_DAY or closes > MINUTES_PER_DAY:
+            continue
+        if next_day or closes <= opens:
+            closes += MINUTES_PER_DAY
+        windows.append((opens, closes))
+
+    if not windows:
+        return None
+
+    # 合并重叠区间
+    windows.sort()
+    merged = [list(windows[0])]
+    for opens, closes in windows[1:]:
+        if opens <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], closes)
+        else:
+            merged.append([opens, closes])
+
+    if len(merged) == 1 and merged[0][0] == 0 and merged[0][1] >= MINUTES_PER_DAY:
+        return None
+    return tuple((opens, closes) for opens, closes in merged)
+
+
+def visit_start(arrival: float, stay: float, windows: TimeWindows) -> Tuple[float, float]:
+    """
+    计算POI的开始游览时间及超出营业时间的分钟数
+
+    选择第一个能在关门前完成游览的时间窗，早到时等待开门；
+    没有可行时间窗时选择超时最少的一个。
+
+    Args:
+        arrival: 到达时间（当天分钟数）
+        stay: 停留时间（分钟）
+        windows: 时间窗
+
+    Returns:
+        (开始游览时间, 超出营业时间的分钟数)
+    """
+    if windows is None:
+        return arrival, 0.0
+
+    best_start, best_lateness = arrival, _UNBOUNDED
+    for opens, closes in windows:
+        start = arrival if arrival > opens else opens
+        lateness = start + stay - closes
+        if lateness <= 0:
+            return start, 0.0
+        if lateness < best_lateness:
+            best_start, best_lateness = start, lateness
+    return best_start, best_lateness
+
+
+class TimeWindowProblem:
+    """单日带时间窗的路径问题：起点不固定，路线从第一个POI开始计时"""
+
+    def __init__(self, dist: np.ndarray, travel: np.ndarray, stay: Sequence[float],
+                 windows: Sequence[TimeWindows], day_start: float):
+        """
+        初始化问题
+
+        Args:
+            dist: 距离矩阵（公里）
+            travel: 交通时间矩阵（分钟）
+            stay: 每个POI的停留时间（分钟）
+            windows: 每个POI的时间窗
+            day_start: 当天开始时间（分钟）
+        """
+        self.n = len(dist)
+        self.dist = np.asarray(dist, dtype=np.float64).tolist()
+        self.travel = np.asarray(travel, dtype=np.float64).tolist()
+        self.stay = [float(value) for value in stay]
+        self.windows = list(windows)
+        self.day_start = float(day_start)
+        self.can_precede = self._precedence()
+
+    def _precedence(self) -> List[List[bool]]:
+        """
+        预计算两两先后可行性：i最早完成后赶往j仍晚于j最晚开始时间时，i不能排在j之前
+
+        Returns:
+            can_precede[i][j]
+        """
+        earliest_finish = []
+        latest_start = []
+        for i in range(self.n):
+            start, lateness = visit_start(self.day_start, self.stay[i], self.windows[i])
+            earliest_finish.append(start + self.stay[i] if lateness == 0 else _UNBOUNDED)
+            windows = self.windows[i]
+            latest_start.append(_UNBOUNDED if windows is None else windows[-1][1] - self.stay[i])
+
+        return [
+            [earliest_finish[i] + self.travel[i][j] <= latest_start[j] for j in range(self.n)]
+            for i in range(self.n)
+        ]
+
+    def length(self, route: Sequence[int]) -> float:
+        """路线距离（公里）"""
+        dist = self.dist
+        return sum(dist[route[k]][route[k + 1]] for k in range(len(route) - 1))
+
+    def timeline(self, route: Sequence[int]) -> Tuple[List[float], List[float]]:
+        """
+        计算每个位置的离开时间和累计超时
+
+        Args:
+            route: 索引路线
+
+        Returns:
+            (离开时间列表, 累计超时列表)
+        """
+        departures, lateness = [], []
+        t, total = self.day_start, 0.0
+        previous = -1
+        for city in route:
+            arrival = t if previous < 0 else t + self.travel[previous][city]
+            start, late = visit_start(arrival, self.stay[city], self.windows[city])
+            total += late
+            t = start + self.stay[city]
+            departures.append(t)
+            lateness.append(total)
+            previous = city
+        return departures, lateness
+
+    def suffix_lateness(self, route: Sequence[int], position: int, departures: List[float],
+                        lateness: List[float], bound: float) -> float:
+        """
+        只重新计算从position开始的时间线，累计超时达到bound时提前结束
+
+        Args:
+            route: 候选路线（position之前与当前路线相同）
+            position: 第一个变化的位置
+            departures: 当前路线的离开时间
+            lateness: 当前路线的累计超时
+            bound: 剪枝上限
+
+        Returns:
+            候选路线的总超时（提前结束时返回不小于bound的值）
+        """
+        if position == 0:
+            t, total, previous = self.day_start, 0.0, -1
+        else:
+            t, total, previous = departures[position - 1], lateness[position - 1], route[position - 1]
+
+        travel, stay, windows = self.travel, self.stay, self.windows
+        for k in range(position, len(route)):
+            city = route[k]
+            arrival = t if previous < 0 else t + travel[previous][city]
+            start, late = visit_start(arrival, stay[city], windows[city])
+            total += late
+            if total >= bound:
+                return total
+            t = start + stay[city]
+            previous = city
+        return total
+
+
+def _edge(dist: List[List[float]], a: int, b: int) -> float:
+    """路径端点处缺失的边按0计算"""
+    return 0.0 if a < 0 or b < 0 else dist[a][b]
+
+
+def _improve(problem: TimeWindowProblem, route: List[int], max_iterations: Optional[int],
+             deadline: Optional[float]) -> Tuple[List[int], float, int]:
+    """
+    以(超时, 距离)为目标的Or-opt与2-opt局部搜索
+
+    每个候选先用O(1)的距离增量和两两先后可行性筛选，只有可能改进的候选才重新计算
+    变化位置之后的时间线，并在超时超过上限时提前结束。
+
+    Returns:
+        (路线, 总超时, 改进次数)
+    """
+    n = len(route)
+    dist = problem.dist
+    can_precede = problem.can_precede
+    departures, lateness = problem.timeline(route)
+    current_lateness = lateness[-1]
+    moves = 0
+
+    def accept(candidate: List[int], position: int, delta: float) -> bool:
+        nonlocal route, departures, lateness, current_lateness, moves
+        # 候选更优当且仅当 W·(新超时 - 当前超时) + 距离增量 < 0
+        bound = current_lateness - delta / LATENESS_WEIGHT - 1e-9
+        if bound <= 0:
+            return False
+        if problem.suffix_lateness(candidate, position, departures, lateness, bound) >= bound:
+            return False
+        route = candidate
+        departures, lateness = problem.timeline(route)
+        current_lateness = lateness[-1]
+        moves += 1
+        return True
+
+    def feasible_pair(a: int, b: int) -> bool:
+        return a < 0 or b < 0 or can_precede[a][b]
+
+    improved = True
+    while improved:
+        if max_iterations is not None and moves >= max_iterations:
+            break
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+        improved = False
+        strict = current_lateness == 0
+
+        # Or-opt：移动长度1..3的片段到其他位置
+        for length in range(1, min(MAX_SEGMENT_LENGTH, n - 1) + 1):
+            for i in range(n - length + 1):
+                j = i + length - 1
+                first, last = route[i], route[j]
+                before = route[i - 1] if i > 0 else -1
+                after = route[j + 1] if j + 1 < n else -1
+                removal = _edge(dist, before, after) - _edge(dist, before, first) - _edge(dist, last, after)
+                rest = route[:i] + route[j + 1:]
+                for k in range(len(rest) + 1):
+                    if k == i:
+                        continue
+                    a = rest[k - 1] if k > 0 else -1
+                    b = rest[k] if k < len(rest) else -1
+                    delta = removal + _edge(dist, a, first) + _edge(dist, last, b) - _edge(dist, a, b)
+                    # 当前已无冲突时只考虑缩短距离且相邻先后可行的移动
+                    if strict and (delta >= -1e-9 or not feasible_pair(a, first) or not feasible_pair(last, b)):
+                        continue
+                    if accept(rest[:k] + route[i:j + 1] + rest[k:], min(i, k), delta):
+                        improved = True
+                        break
+                if improved:
+                    break
+            if improved:
+                break
+        if improved:
+            continue
+
+        # 2-opt：反转区间[i, j]
+        for i in range(n - 1):
+            before = route[i - 1] if i > 0 else -1
+            for j in range(i + 1, n):
+                after = route[j + 1] if j + 1 < n else -1
+                delta = (_edge(dist, before, route[j]) + _edge(dist, route[i], after)
+                         - _edge(dist, before, route[i]) - _edge(dist, route[j], after))
+                if strict and (delta >= -1e-9 or not feasible_pair(before, route[j])):
+                    continue
+                if accept(route[:i] + route[i:j + 1][::-1] + route[j + 1:], i, delta):
+                    improved = True
+                    break
+            if improved:
+                break
+
+    return route, current_lateness, moves
+
+
+def solve_with_time_windows(problem: TimeWindowProblem, initial_route: Sequence[int],
+                            max_iterations: Optional[int] = None,
+                            time_budget_ms: Optional[float] = None) -> Tuple[List[int], float, int]:
+    """
+    在时间窗约束下调整访问顺序
+
+    分别从给定路线（通常为距离最优路线）和按关门时间排序的路线出发做局部搜索，
+    取超时最少、其次距离最短的结果。
+
+    Args:
+        problem: 时间窗问题
+        initial_route: 初始路线
+        max_iterations: 每个起点的最大改进次数
+        time_budget_ms: 总时间预算（毫秒）
+
+    Returns:
+        (路线, 总超时分钟数, 改进次数)
+    """
+    deadline = None
+    if time_budget_ms is not None:
+        deadline = time.perf_counter() + time_budget_ms / 1000
+
+    initial_route = list(initial_route)
+    _, lateness = problem.timeline(initial_route)
+    if not lateness or lateness[-1] == 0:
+        return initial_route, 0.0, 0
+
+    # 按最晚关门时间排序（最早截止优先），不限时的POI排在最后
+    def closing(city: int) -> float:
+        windows = problem.windows[city]
+        return _UNBOUNDED if windows is None else windows[-1][1]
+
+    rank = {city: position for position, city in enumerate(initial_route)}
+    seeds = [initial_route, sorted(initial_route, key=lambda city: (closing(city), rank[city]))]
+
+    best = None
+    total_moves = 0
+    for seed in seeds:
+        route, route_lateness, moves = _improve(problem, list(seed), max_iterations, deadline)
+        total_moves += moves
+        cost = (route_lateness, problem.length(route))
+        if best is None or cost < best[0]:
+            best = (cost, route)
+
+    (best_lateness, _), best_route = best
+    return best_route, best_lateness, total_moves
@@ -0,0 +1,114 @@
+"""
+TSP求解器
+基于距离矩阵按索引求解开放路径TSP（固定起点、终点自由）
+"""
+
+from typing import List
+
+import numpy as np
+
+# Held-Karp动态规划的最大规模（DP表大小为 2^(n-1) × (n-1)）
+HELD_KARP_MAX_SIZE = 16
+
+
+def _popcounts(size: int, bits: int) -> np.ndarray:
+    """
+    计算0..size-1每个掩码中置位的个数
+    """
+    masks = np.arange(size, dtype=np.int64)
+    counts = np.zeros(size, dtype=np.int8)
+    for bit in range(bits):
+        counts += ((masks >> bit) & 1).astype(np.int8)
+    return counts
+
+
+def held_karp_path(matrix: np.ndarray, start: int = 0) -> List[int]:
+    """
+    使用位掩码Held-Karp动态规划求解开放路径TSP的最优解
+
+    按子集大小分层，每层对所有包含终点j的子集向量化计算
+    dp[S, j] = min_k(dp[S - {j}, k] + d[k, j])。
+
+    Args:
+        matrix: N×N距离矩阵
+        start: 起点索引
+
+    Returns:
+        最优索引顺序（从start出发，终点自由）
+
+    Raises:
+        ValueError: 规模超过HELD_KARP_MAX_SIZE
+    """
+    n = len(matrix)
+    if n > HELD_KARP_MAX_SIZE:
+        raise ValueError(f'Held-Karp仅支持不超过{HELD_KARP_MAX_SIZE}个POI，当前为{n}个')
+    if n <= 2:
+        return [start] + [i for i in range(n) if i != start]
+
+    # 将起点之外的节点重新编号为0..m-1
+    others = np.array([i for i in range(n) if i != start], dtype=np.intp)
+    m = len(others)
+    dist = np.asarray(matrix, dtype=np.float64)[np.ix_(others, others)]
+    from_start = np.asarray(matrix, dtype=np.float64)[start, others]
+
+    size = 1 << m
+    dp = np.full((size, m), np.inf)
+    parent = np.full((size, m), -1, dtype=np.int8)
+
+    singles = 1 << np.arange(m, dtype=np.int64)
+    dp[singles, np.arange(m)] = from_start
+
+    masks = np.arange(size, dtype=np.int64)
+    counts = _popcounts(size, m)
+
+    for subset_size in range(2, m + 1):
+        layer = masks[counts == subset_size]
+        for j in range(m):
+            selected = layer[((layer >> j) & 1) == 1]
+            previous = selected ^ (1 << j)
+            # dp[previous, k]在k不属于previous时为inf，因此可直接对全部k取最小
+            candidates = dp[previous] + dist[:, j]
+            best = np.argmin(candidates, axis=1)
+            dp[selected, j] = candidates[np.arange(len(selected)), best]
+            parent[selected, j] = best
+
+    # 回溯最优路径
+    mask = size - 1
+    last = int(np.argmin(dp[mask]))
+    reversed_path = []
+    while last >= 0:
+        reversed_path.append(int(others[last]))
+        previous_last = int(parent[mask, last])
+        mask ^= 1 << last
+        last = previous_last
+
+    return [start] + reversed_path[::-1]
+
+
+def nearest_neighbour_path(matrix: np.ndarray, start: int = 0) -> List[int]:
+    """
+    最近邻启发式构造开放路径
+
+    Args:
+        matrix: N×N距离矩阵
+        start: 起点索引
+
+    Returns:
+        索引顺序
+    """
+    n = len(matrix)
+    if n <= 1:
+        return list(range(n))
+
+    route = [start]
+    visited = np.zeros(n, dtype=bool)
+    visited[start] = True
+
+    for _ in range(n - 1):
+        # 找到距离当前POI最近的未访问POI
+        distances = np.where(visited, np.inf, matrix[route[-1]])
+        nearest = int(np.argmin(distances))
+        route.append(nearest)
+        visited[nearest] = True
+
+    return route
@@ -4,14 +4,17 @@ from flask import Flask, jsonify
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from datetime import timedelta
+import json
 import os
 from dotenv import load_dotenv
 
+# 加载环境变量（须在导入读取配置的模块之前）
+load_dotenv()
+
 # 导入数据库实例
 from database import db
-
-# 加载环境变量
-load_dotenv()
+from algorithms.distance_cache import get_distance_cache, get_matrix_tile_cache
+from services.cache import get_cache_backend
 
 # 创建扩展实例
 jwt = JWTManager()
@@ -24,6 +27,10 @@ def create_app():
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///travelmap.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # JSON列使用紧凑编码（无多余空格、中文不转义）
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'json_serializer': lambda value: json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+    }
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-string')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=7)
     
@@ -32,6 +39,15 @@ def create_app():
     jwt.init_app(app)
     CORS(app)
     
+    # 配置了Redis时，距离矩阵在所有工作进程之间共享
+    cache_backend = get_cache_backend()
+    if cache_backend.shared:
+        for cache in (get_distance_cache(), get_matrix_tile_cache()):
+            cache.attach_shared_backend(
+                cache_backend,
+                ttl=int(os.getenv('DISTANCE_CACHE_TTL', 86400))
+            )
+    
     # 导入模型（确保在db初始化后）
     from models.user import User
     from models.trip import Trip, POI, DayItinerary
@@ -40,10 +56,12 @@ def create_app():
     from routes.auth import auth_bp
     from routes.trips import trips_bp
     from routes.pois import pois_bp
+    from routes.routes import routes_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(trips_bp)
     app.register_blueprint(pois_bp)
+    app.register_blueprint(routes_bp)
 
     # 健康检查端点
     @app.route('/health')
@@ -51,7 +69,9 @@ def create_app():
         """健康检查"""
         return jsonify({
             'status': 'healthy',
-            'message': 'Travel Map API is running'
+            'message': 'Travel Map API is running',
+            'distance_cache': get_distance_cache().stats(),
+            'matrix_tile_cache': get_matrix_tile_cache().stats()
         }), 200
     
     # API信息端点
@@ -85,9 +105,10 @@ def create_app():
 app = create_app()
 
 if __name__ == '__main__':
-    # 创建数据库表
+    # 执行数据库迁移
+    from migrations.runner import upgrade
     with app.app_context():
-        db.create_all()
+        upgrade(db.engine)
     
     # 运行应用
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
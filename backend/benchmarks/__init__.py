@@ -0,0 +1 @@
+# benchmarks包初始化文件
\ No newline at end of file
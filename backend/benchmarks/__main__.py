@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+优化器基准测试入口
+
+用法（在backend目录下）：
+    python -m benchmarks                    # 运行并与基线比较，退化时返回非零退出码
+    python -m benchmarks --update-baseline  # 运行并覆盖基线
+"""
+
+import argparse
+import sys
+
+from benchmarks.runner import (
+    BASELINE_PATH,
+    DEFAULT_LATENCY_TOLERANCE,
+    DEFAULT_QUALITY_TOLERANCE,
+    check_workload_sizing,
+    compare_with_baseline,
+    load_baseline,
+    run_benchmarks,
+    save_baseline,
+)
+from benchmarks.workloads import default_workloads
+
+COLUMNS = ('pois', 'num_days', 'matrix_ms', 'clustering_ms', 'tsp_ms', 'schedule_ms',
+           'total_ms', 'quality_gap', 'time_exceeded_days', 'window_violations')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='RouteOptimizer基准测试')
+    parser.add_argument('--repeat', type=int, default=5, help='每个负载的重复次数')
+    parser.add_argument('--workload', action='append', help='只运行指定名称的负载（可重复）')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='基线文件路径')
+    parser.add_argument('--update-baseline', action='store_true', help='用本次结果覆盖基线')
+    parser.add_argument('--latency-tolerance', type=float, default=DEFAULT_LATENCY_TOLERANCE,
+                        help='允许的耗时增加比例')
+    parser.add_argument('--quality-tolerance', type=float, default=DEFAULT_QUALITY_TOLERANCE,
+                        help='允许的路线差距增加量')
+    args = parser.parse_args()
+
+    workloads = default_workloads()
+    if args.workload:
+        workloads = [workload for workload in workloads if workload.name in args.workload]
+        if not workloads:
+            print('没有匹配的负载')
+            return 2
+
+    results = run_benchmarks(workloads, repeat=args.repeat)
+
+    print('  '.join(['workload'.ljust(18)] + [column.rjust(13) for column in COLUMNS]))
+    for name, metrics in results.items():
+        row = [name.ljust(18)]
+        for column in COLUMNS:
+            value = metrics.get(column)
+            row.append(('-' if value is None else str(value)).rjust(13))
+        print('  '.join(row))
+
+    if args.update_baseline:
+        # 过满的负载不写入基线，否则之后的超时退化无从发现
+        problems = check_workload_sizing(results)
+        if problems:
+            print('负载过满，未更新基线:')
+            for problem in problems:
+                print(f'  {problem}')
+            return 1
+        save_baseline(results, args.baseline)
+        print(f'基线已更新: {args.baseline}')
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print('未找到基线，使用 --update-baseline 生成')
+        return 0
+
+    regressions = compare_with_baseline(
+        results, baseline,
+        latency_tolerance=args.latency_tolerance,
+        quality_tolerance=args.quality_tolerance
+    )
+    if regressions:
+        print('性能退化:')
+        for regression in regressions:
+            print(f'  {regression}')
+        return 1
+
+    print('与基线相比无退化')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
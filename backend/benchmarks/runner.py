@@ -0,0 +1,259 @@
+"""
+优化器基准测试
+分阶段计时（距离矩阵、聚类、TSP、路线与时间估算，取自优化器的诊断信息）并记录路线长度相对最优解的差距，
+与基线比较判断是否退化
+"""
+
+import json
+import os
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from algorithms.distance_cache import DistanceCache
+from algorithms.distance_matrix import route_length, submatrix
+from algorithms.route_optimizer import RouteOptimizer
+from algorithms.tsp_solvers import held_karp_path
+from benchmarks.workloads import Workload
+
+# 默认基线文件
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+# 使用Held-Karp计算参考最优解的单日最大POI数量
+REFERENCE_MAX_DAY_SIZE = 12
+
+# 质量评估时的精确求解阈值：所有多于2个POI的天都走启发式（最近邻+局部搜索），
+# 否则优化器会对小规模的天直接精确求解，与参考解比较没有意义
+QUALITY_EXACT_THRESHOLD = 2
+
+# 默认容差：耗时允许增加到基线的2倍（且至少放宽5毫秒，吸收计时噪声），路线差距允许增加2个百分点
+DEFAULT_LATENCY_TOLERANCE = 1.0
+DEFAULT_LATENCY_SLACK_MS = 5.0
+DEFAULT_QUALITY_TOLERANCE = 0.02
+
+# 超时天数占比上限：超过时说明负载本身塞得过满（每天都超时），基线没有参考价值
+MAX_TIME_EXCEEDED_SHARE = 0.25
+
+# 与plan_trip一致的默认规划参数
+PLAN_OPTIONS = {
+    'daily_time_limit': 480,
+    'transport_mode': 'driving',
+    'start_time': '09:00',
+    'is_weekend': False,
+    'max_improvement_iterations': None,
+    'improvement_time_budget_ms': 50
+}
+
+
+def _elapsed_ms(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+def reference_length(day_pois: List[Dict], day_matrix: np.ndarray) -> Optional[float]:
+    """
+    从第一个POI出发的最优开放路线长度
+
+    不超过REFERENCE_MAX_DAY_SIZE个POI时用Held-Karp精确求解；全部位于同一经线上时距离可加，
+    最优路线为先走到较近的一端再走完整段。其他情况返回None（不参与质量评估）。
+
+    Args:
+        day_pois: 当天POI，第一个为起点
+        day_matrix: 当天距离矩阵
+
+    Returns:
+        最优长度（公里）
+    """
+    if len(day_pois) <= 2:
+        return route_length(day_matrix, list(range(len(day_pois))))
+    if len(day_pois) <= REFERENCE_MAX_DAY_SIZE:
+        return route_length(day_matrix, held_karp_path(day_matrix))
+
+    lngs = [poi['coordinates']['lng'] for poi in day_pois]
+    if max(lngs) - min(lngs) > 1e-9:
+        return None
+    lats = [poi['coordinates']['lat'] for poi in day_pois]
+    south, north = int(np.argmin(lats)), int(np.argmax(lats))
+    return float(day_matrix[south, north] + min(day_matrix[0, south], day_matrix[0, north]))
+
+
+def _phase_timings(result: Dict[str, Any]) -> Dict[str, float]:
+    """从优化结果的诊断信息中取出各阶段耗时（毫秒）"""
+    diagnostics = result['diagnostics']
+    phases = diagnostics['phases']
+    return {
+        'matrix_ms': phases.get('distance_matrix', 0.0),
+        'clustering_ms': phases.get('clustering', 0.0),
+        'tsp_ms': sum(day.get('tsp_ms', 0.0) for day in diagnostics['days']),
+        'schedule_ms': sum(day.get('schedule_ms', 0.0) for day in diagnostics['days'])
+    }
+
+
+def measure_quality(workload: Workload) -> Optional[float]:
+    """
+    强制使用启发式求解各天路线，计算总长度相对参考最优解的差距
+
+    Args:
+        workload: 工作负载
+
+    Returns:
+        差距比例，没有可评估的天时为None
+    """
+    optimizer = RouteOptimizer(distance_cache=DistanceCache(), exact_threshold=QUALITY_EXACT_THRESHOLD)
+    result = optimizer.optimize_trip(workload.pois, workload.num_days, execution='serial', **PLAN_OPTIONS)
+    if not result['success']:
+        raise RuntimeError(f'{workload.name}: {result["error"]}')
+
+    matrix = optimizer.build_distance_matrix(workload.pois)
+    position = {poi['id']: index for index, poi in enumerate(workload.pois)}
+    tour_length = best_length = 0.0
+    for day in result['days']:
+        if not day['pois']:
+            continue
+        day_matrix = submatrix(matrix, [position[poi['id']] for poi in day['pois']])
+        reference = reference_length(day['pois'], day_matrix)
+        if reference is None:
+            continue
+        tour_length += route_length(day_matrix, list(range(len(day['pois']))))
+        best_length += reference
+
+    return round(tour_length / best_length - 1, 4) + 0.0 if best_length > 0 else None
+
+
+def run_workload(workload: Workload, repeat: int = 5) -> Dict[str, Any]:
+    """
+    对单个工作负载分阶段计时并评估路线质量
+
+    计时通过optimize_trip的诊断信息获得（串行执行，每次使用独立的距离缓存，避免缓存命中掩盖真实耗时）；
+    质量单独评估，见measure_quality。
+
+    Args:
+        workload: 工作负载
+        repeat: 重复次数，计时取中位数
+
+    Returns:
+        计时（毫秒）与质量指标
+    """
+    samples: Dict[str, List[float]] = {
+        'matrix_ms': [], 'clustering_ms': [], 'tsp_ms': [], 'schedule_ms': [], 'total_ms': []
+    }
+
+    for _ in range(repeat):
+        optimizer = RouteOptimizer(distance_cache=DistanceCache())
+        start = time.perf_counter()
+        result = optimizer.optimize_trip(
+            workload.pois, workload.num_days, execution='serial', diagnostics=True, **PLAN_OPTIONS
+        )
+        samples['total_ms'].append(_elapsed_ms(start))
+        if not result['success']:
+            raise RuntimeError(f'{workload.name}: {result["error"]}')
+        for name, elapsed in _phase_timings(result).items():
+            samples[name].append(elapsed)
+
+    metrics = {name: round(statistics.median(values), 3) for name, values in samples.items()}
+    metrics['pois'] = len(workload.pois)
+    metrics['num_days'] = workload.num_days
+    metrics['time_exceeded_days'] = sum(1 for day in result['days'] if day.get('time_exceeded'))
+    metrics['window_violations'] = sum(day.get('window_violations', 0) for day in result['days'])
+    metrics['total_distance_km'] = result['summary']['total_distance']
+    metrics['quality_gap'] = measure_quality(workload)
+    return metrics
+
+
+def run_benchmarks(workloads: List[Workload], repeat: int = 5) -> Dict[str, Dict[str, Any]]:
+    """
+    运行全部工作负载
+
+    Args:
+        workloads: 工作负载列表
+        repeat: 每个负载的重复次数
+
+    Returns:
+        按负载名称索引的指标
+    """
+    # 预热：导入、首次分配等一次性开销不计入结果
+    run_workload(workloads[0], repeat=1)
+    return {workload.name: run_workload(workload, repeat) for workload in workloads}
+
+
+def load_baseline(path: str = BASELINE_PATH) -> Optional[Dict[str, Dict[str, Any]]]:
+    """读取基线文件，不存在时返回None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(results: Dict[str, Dict[str, Any]], path: str = BASELINE_PATH):
+    """将本次结果保存为基线"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def check_workload_sizing(results: Dict[str, Dict[str, Any]],
+                          max_share: float = MAX_TIME_EXCEEDED_SHARE) -> List[str]:
+    """
+    检查负载是否大体排得下：超时天数不超过总天数的max_share
+
+    Args:
+        results: 本次结果
+        max_share: 允许的超时天数占比
+
+    Returns:
+        问题描述列表，为空表示通过
+    """
+    return [
+        f'{name}: 超时天数 {metrics["time_exceeded_days"]}/{metrics["num_days"]} 超过{max_share:.0%}，负载过满'
+        for name, metrics in results.items()
+        if metrics['time_exceeded_days'] > metrics['num_days'] * max_share
+    ]
+
+
+def compare_with_baseline(results: Dict[str, Dict[str, Any]],
+                          baseline: Dict[str, Dict[str, Any]],
+                          latency_tolerance: float = DEFAULT_LATENCY_TOLERANCE,
+                          quality_tolerance: float = DEFAULT_QUALITY_TOLERANCE) -> List[str]:
+    """
+    与基线比较，返回退化描述（也包括超时天数占比超过上限的负载）
+
+    Args:
+        results: 本次结果
+        baseline: 基线结果
+        latency_tolerance: 允许的耗时增加比例
+        quality_tolerance: 允许的路线差距增加量
+
+    Returns:
+        退化项列表，为空表示通过
+    """
+    regressions = check_workload_sizing(results)
+    for name, expected in baseline.items():
+        actual = results.get(name)
+        if actual is None:
+            continue
+
+        limit = max(expected['total_ms'] * (1 + latency_tolerance),
+                    expected['total_ms'] + DEFAULT_LATENCY_SLACK_MS)
+        if actual['total_ms'] > limit:
+            regressions.append(
+                f'{name}: 总耗时 {actual["total_ms"]:.2f}ms 超过基线 {expected["total_ms"]:.2f}ms'
+            )
+
+        if expected.get('quality_gap') is not None and actual.get('quality_gap') is not None:
+            if actual['quality_gap'] > expected['quality_gap'] + quality_tolerance:
+                regressions.append(
+                    f'{name}: 路线差距 {actual["quality_gap"]:.2%} 超过基线 {expected["quality_gap"]:.2%}'
+                )
+
+        if actual['window_violations'] > expected.get('window_violations', 0):
+            regressions.append(
+                f'{name}: 营业时间冲突 {actual["window_violations"]} 多于基线 {expected.get("window_violations", 0)}'
+            )
+
+        if actual['time_exceeded_days'] > expected['time_exceeded_days']:
+            regressions.append(
+                f'{name}: 超时天数 {actual["time_exceeded_days"]} 多于基线 {expected["time_exceeded_days"]}'
+            )
+
+    return regressions
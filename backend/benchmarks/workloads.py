@@ -0,0 +1,158 @@
+"""
+基准测试工作负载
+生成可复现的合成POI集合：均匀分布、多中心聚集、按北京示例景点放大的城市分布、带营业时间的分布，以及已知最优解的单条和多条经线分布
+"""
+
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+# 与init_db.py中的北京示例景点一致（名称, 纬度, 经度, 类别, 建议游览时长）
+BEIJING_SAMPLE_POIS = [
+    ('天安门广场', 39.9042, 116.4074, '景点', 120),
+    ('故宫博物院', 39.9163, 116.3972, '景点', 180),
+    ('颐和园', 39.9999, 116.2755, '景点', 150),
+    ('长城（八达岭）', 40.3584, 116.0138, '景点', 240),
+    ('王府井大街', 39.9097, 116.4180, '购物', 90),
+]
+
+# 合成POI使用的类别和建议游览时长（分钟）
+CATEGORIES = ['博物馆', '公园', '历史遗迹', '商业街', '餐厅', '观景台', '寺庙', '广场', '建筑']
+DURATIONS = [30, 60, 90, 120, 180]
+
+# 合成POI使用的营业时间（None表示不限制）；都与默认的09:00起8小时有交集，营业到次日凌晨的也在白天开门
+OPEN_HOURS = [None, '08:30-17:00', '09:00-16:30', '10:00-22:00', '11:00-14:00，17:00-21:00', '07:00-次日01:00']
+
+# 北京市中心，用于均匀和聚集分布
+CITY_CENTER = (39.9042, 116.4074)
+
+
+class Workload(NamedTuple):
+    """基准测试工作负载"""
+    name: str
+    pois: List[Dict]
+    num_days: int
+
+
+def _make_poi(index: int, lat: float, lng: float, rng: np.random.Generator,
+              category: Optional[str] = None, duration: Optional[int] = None) -> Dict:
+    """构造与plan_trip传给优化器相同格式的POI"""
+    return {
+        'id': f'bench_{index}',
+        'name': f'合成景点{index}',
+        'coordinates': {'lat': float(lat), 'lng': float(lng)},
+        'suggestedDuration': int(duration if duration is not None else rng.choice(DURATIONS)),
+        'category': category if category is not None else str(rng.choice(CATEGORIES))
+    }
+
+
+def uniform_pois(count: int, seed: int, span_deg: float = 0.3) -> List[Dict]:
+    """在市中心周围的正方形区域内均匀分布"""
+    rng = np.random.default_rng(seed)
+    lats = CITY_CENTER[0] + (rng.random(count) - 0.5) * span_deg
+    lngs = CITY_CENTER[1] + (rng.random(count) - 0.5) * span_deg
+    return [_make_poi(i, lat, lng, rng) for i, (lat, lng) in enumerate(zip(lats, lngs))]
+
+
+def clustered_pois(count: int, seed: int, num_centers: int = 5,
+                   span_deg: float = 0.5, spread_deg: float = 0.015) -> List[Dict]:
+    """围绕若干随机中心的高斯聚集分布（景区、商圈）"""
+    rng = np.random.default_rng(seed)
+    centers = np.column_stack([
+        CITY_CENTER[0] + (rng.random(num_centers) - 0.5) * span_deg,
+        CITY_CENTER[1] + (rng.random(num_centers) - 0.5) * span_deg
+    ])
+    assignment = rng.integers(num_centers, size=count)
+    points = centers[assignment] + rng.normal(0, spread_deg, size=(count, 2))
+    return [_make_poi(i, lat, lng, rng) for i, (lat, lng) in enumerate(points)]
+
+
+def beijing_pois(count: int, seed: int, spread_deg: float = 0.02) -> List[Dict]:
+    """以北京示例景点为中心放大：每个合成POI围绕一个示例景点分布并沿用其类别和时长"""
+    rng = np.random.default_rng(seed)
+    pois = []
+    for i in range(count):
+        _, lat, lng, category, duration = BEIJING_SAMPLE_POIS[i % len(BEIJING_SAMPLE_POIS)]
+        lat += rng.normal(0, spread_deg)
+        lng += rng.normal(0, spread_deg)
+        pois.append(_make_poi(i, lat, lng, rng, category=category, duration=duration))
+    return pois
+
+
+def windowed_pois(count: int, seed: int) -> List[Dict]:
+    """多中心聚集分布，并为大部分POI设置营业时间（含午晚两段和跨午夜的时间窗）"""
+    rng = np.random.default_rng(seed)
+    pois = clustered_pois(count, seed)
+    for poi in pois:
+        open_hours = OPEN_HOURS[rng.integers(len(OPEN_HOURS))]
+        if open_hours is not None:
+            poi['openHours'] = open_hours
+    return pois
+
+
+def line_pois(count: int, seed: int, length_deg: float = 0.2) -> List[Dict]:
+    """
+    沿同一经线分布、起点位于一端的POI（其余顺序打乱），停留时间较短，25个以内可在一天内走完
+
+    同一经线上的大圆距离可加，从端点出发的最优开放路径即为整段经线，最优长度已知。
+    """
+    rng = np.random.default_rng(seed)
+    offsets = np.sort(rng.random(count - 1)) * length_deg
+    shuffled = rng.permutation(offsets)
+    lats = np.concatenate([[CITY_CENTER[0]], CITY_CENTER[0] + shuffled])
+    return [_make_poi(i, lat, CITY_CENTER[1], rng, duration=10) for i, lat in enumerate(lats)]
+
+
+def meridian_pois(num_lines: int, per_line: int, seed: int,
+                  length_deg: float = 0.15, spacing_deg: float = 0.3) -> List[Dict]:
+    """
+    分布在若干条相距较远的经线上的POI，停留时间较短，每条经线可在一天内走完
+
+    每天的POI落在同一经线上时最优路线长度可直接算出（见benchmarks.runner.reference_length），
+    每条线的POI数超过精确求解阈值，用于检验多日行程中启发式求解的质量。
+    """
+    rng = np.random.default_rng(seed)
+    pois = []
+    for line in range(num_lines):
+        lng = CITY_CENTER[1] + (line - (num_lines - 1) / 2) * spacing_deg
+        lats = CITY_CENTER[0] + rng.permutation(rng.random(per_line)) * length_deg
+        for lat in lats:
+            pois.append(_make_poi(len(pois), lat, lng, rng, duration=10))
+    order = rng.permutation(len(pois))
+    return [dict(pois[i], id=f'bench_{index}') for index, i in enumerate(order)]
+
+
+def default_workloads(seed: int = 2024) -> List[Workload]:
+    """
+    默认工作负载集合
+
+    天数按每天大致排得下设置（合成POI每天3-4个，北京示例景点游览时间较长，每天约2个），
+    避免基线落在每天都超时的不现实区间
+
+    Args:
+        seed: 随机种子
+
+    Returns:
+        工作负载列表
+    """
+    return [
+        Workload('uniform_20x5', uniform_pois(20, seed), 5),
+        Workload('uniform_60x15', uniform_pois(60, seed + 1), 15),
+        Workload('clustered_40x10', clustered_pois(40, seed + 2), 10),
+        Workload('clustered_120x30', clustered_pois(120, seed + 3, num_centers=10), 30),
+        Workload('beijing_30x15', beijing_pois(30, seed + 4), 15),
+        Workload('beijing_80x40', beijing_pois(80, seed + 5), 40),
+        Workload('windowed_36x9', windowed_pois(36, seed + 6), 9),
+        Workload('line_25x1', line_pois(25, seed), 1),
+        Workload('meridians_60x3', meridian_pois(3, 20, seed + 7), 3),
+        Workload('meridians_100x4', meridian_pois(4, 25, seed + 8), 4),
+    ]
+
+
+WORKLOAD_FACTORIES: Dict[str, Callable[[int, int], List[Dict]]] = {
+    'uniform': uniform_pois,
+    'clustered': clustered_pois,
+    'beijing': beijing_pois,
+    'windowed': windowed_pois,
+    'line': line_pois,
+}
@@ -0,0 +1 @@
+# catalog包初始化文件
\ No newline at end of file
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+POI目录构建入口
+
+用法（在backend目录下）：
+    python -m catalog build                         # 从前端内置数据构建目录
+    python -m catalog build --import pois.jsonl     # 同时导入批量文件（.json/.jsonl/.csv，可重复）
+    python -m catalog build --no-frontend --import pois.csv --output /srv/catalog
+    python -m catalog info                          # 查看当前目录
+"""
+
+import argparse
+import itertools
+import sys
+
+from catalog.ingest import deduplicate, load_frontend_datasets, load_import_file
+from catalog.store import Catalog, catalog_path, write_catalog
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='内置POI目录')
+    parser.add_argument('command', choices=['build', 'info'])
+    parser.add_argument('--import', dest='imports', action='append', default=[], metavar='FILE',
+                        help='批量导入文件（build）')
+    parser.add_argument('--no-frontend', action='store_true', help='不导入前端内置数据（build）')
+    parser.add_argument('--output', help='目录路径，默认为POI_CATALOG_PATH或instance/catalog')
+    args = parser.parse_args()
+
+    path = args.output or catalog_path()
+
+    if args.command == 'info':
+        try:
+            catalog = Catalog(path)
+        except FileNotFoundError:
+            print(f'目录不存在: {path}')
+            return 1
+        print(f'目录: {path}')
+        print(f"记录数: {len(catalog)}，构建时间: {catalog.meta['built_at']}")
+        print(f"来源: {', '.join(catalog.meta['sources']) or '-'}")
+        print(f"城市: {len(catalog.meta['dictionaries']['city'])}，"
+              f"类别: {len(catalog.meta['dictionaries']['category'])}")
+        return 0
+
+    sources, streams = [], []
+    if not args.no_frontend:
+        sources.append('frontend')
+        streams.append(load_frontend_datasets())
+    for filename in args.imports:
+        sources.append(filename)
+        streams.append(load_import_file(filename))
+    if not streams:
+        parser.error('没有数据来源')
+
+    count = write_catalog(deduplicate(itertools.chain.from_iterable(streams)), path, sources)
+    print(f'已写入 {count} 条记录: {path}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
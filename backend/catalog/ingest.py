@@ -0,0 +1,223 @@
+"""
+POI目录数据导入
+解析前端内置的城市景点数据（TypeScript对象字面量）以及JSON、JSON Lines、CSV格式的批量导入文件，
+统一为与POI.to_dict字段命名一致的记录
+"""
+
+import csv
+import json
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# 前端数据目录（相对backend目录）
+FRONTEND_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                 'frontend', 'src', 'data')
+
+# 前端数据文件中导出的数组名及对应城市；热门景点从地址推断城市
+FRONTEND_DATASETS = (
+    ('hotspots.ts', 'hotspotPOIs', None),
+    ('extendedPOIs.ts', 'beijingPOIs', '北京'),
+    ('extendedPOIs.ts', 'shanghaiPOIs', '上海'),
+    ('extendedPOIs.ts', 'guangzhouPOIs', '广州'),
+    ('extendedPOIs.ts', 'shenzhenPOIs', '深圳'),
+)
+
+_ARRAY_START = r'export\s+const\s+{name}\s*(?::[^=]+)?=\s*\['
+_FIELD = re.compile(
+    r"""(\w+)\s*:\s*("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|\{[^{}]*\}|-?\d+(?:\.\d+)?|true|false|null)"""
+)
+_CITY = re.compile(r'^(?:[^省市]{2,3}省|[^市]{2,8}?自治区)?([^省市]{2,4}?)市')
+
+
+def _literal(value: str):
+    """将TypeScript字面量转换为Python值"""
+    if value[0] in '\'"':
+        body = value[1:-1]
+        return body.replace("\\'", "'").replace('\\"', '"').replace('\\\\', '\\')
+    if value[0] == '{':
+        return {key: _literal(item) for key, item in _FIELD.findall(value)}
+    if value in ('true', 'false'):
+        return value == 'true'
+    if value == 'null':
+        return None
+    return float(value) if '.' in value else int(value)
+
+
+def _array_body(source: str, name: str) -> str:
+    """取出导出数组的方括号内容（跳过字符串和注释中的括号）"""
+    match = re.search(_ARRAY_START.format(name=re.escape(name)), source)
+    if not match:
+        raise ValueError(f'未找到数据数组: {name}')
+
+    depth, position, quote = 1, match.end(), None
+    while depth:
+        char = source[position]
+        if quote:
+            if char == '\\':
+                position += 1
+            elif char == quote:
+                quote = None
+        elif char in '\'"`':
+            quote = char
+        elif source.startswith('//', position):
+            position = source.index('\n', position)
+        elif char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+        position += 1
+    return source[match.end():position - 1]
+
+
+def _top_level_objects(body: str) -> Iterator[str]:
+    """按顶层花括号切分数组中的对象字面量"""
+    depth, start, quote, comment = 0, 0, None, False
+    for position, char in enumerate(body):
+        if comment:
+            comment = char != '\n'
+        elif quote:
+            if char == quote and body[position - 1] != '\\':
+                quote = None
+        elif char in '\'"':
+            quote = char
+        elif body.startswith('//', position):
+            comment = True
+        elif char == '{':
+            if depth == 0:
+                start = position
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                yield body[start:position + 1]
+
+
+def city_from_address(address: Optional[str]) -> Optional[str]:
+    """从地址开头推断城市（如'北京市东城区...' -> '北京'，'四川省成都市...' -> '成都'）"""
+    match = _CITY.match(address or '')
+    return match.group(1) if match else None
+
+
+def normalize_record(raw: Dict, city: Optional[str] = None) -> Optional[Dict]:
+    """
+    统一记录字段；缺少ID、名称或有效坐标的记录返回None
+
+    Args:
+        raw: 原始记录（驼峰或下划线命名，坐标可为coordinates或lat/lng）
+        city: 默认城市
+
+    Returns:
+        目录记录
+    """
+    def pick(*keys):
+        for key in keys:
+            if raw.get(key) not in (None, ''):
+                return raw[key]
+        return None
+
+    def number(value, cast):
+        try:
+            return cast(value) if value not in (None, '') else None
+        except (TypeError, ValueError):
+            return None
+
+    coordinates = raw.get('coordinates') or {}
+    if not isinstance(coordinates, dict):
+        return None
+    lat = number(pick('lat', 'latitude') if not coordinates else coordinates.get('lat'), float)
+    lng = number(pick('lng', 'longitude') if not coordinates else coordinates.get('lng'), float)
+    poi_id, name = pick('id'), pick('name')
+    if poi_id is None or not name or lat is None or lng is None:
+        return None
+    # 超出范围（含NaN）的坐标视为无效
+    if not -90 <= lat <= 90 or not -180 <= lng <= 180:
+        return None
+
+    address = pick('address')
+    return {
+        'id': str(poi_id),
+        'name': str(name),
+        'coordinates': {'lat': lat, 'lng': lng},
+        'address': address,
+        'category': pick('category'),
+        'city': pick('city') or city or city_from_address(address),
+        'description': pick('description'),
+        'openHours': pick('openHours', 'open_hours'),
+        'suggestedDuration': number(pick('suggestedDuration', 'suggested_duration'), int),
+        'rating': number(pick('rating'), float),
+        'ticketPrice': number(pick('ticketPrice', 'ticket_price'), float),
+        'hotRank': number(pick('hotRank', 'hot_rank'), int),
+        'imageUrl': pick('imageUrl', 'image_url')
+    }
+
+
+def load_frontend_datasets(data_dir: str = FRONTEND_DATA_DIR) -> List[Dict]:
+    """
+    读取前端内置的热门景点和各城市景点
+
+    Args:
+        data_dir: 前端数据目录
+
+    Returns:
+        目录记录列表
+    """
+    records = []
+    sources = {}
+    for filename, array_name, city in FRONTEND_DATASETS:
+        if filename not in sources:
+            with open(os.path.join(data_dir, filename), encoding='utf-8') as f:
+                sources[filename] = f.read()
+        for literal in _top_level_objects(_array_body(sources[filename], array_name)):
+            raw = {key: _literal(value) for key, value in _FIELD.findall(literal)}
+            record = normalize_record(raw, city)
+            if record is not None:
+                records.append(record)
+    return records
+
+
+def load_import_file(path: str) -> Iterator[Dict]:
+    """
+    读取批量导入文件：.json（数组）、.jsonl（每行一个对象）或.csv（表头为字段名）
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        目录记录迭代器（跳过无效记录）
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8', newline='') as f:
+        if extension == '.json':
+            rows: Iterable[Dict] = json.load(f)
+        elif extension == '.jsonl':
+            rows = (json.loads(line) for line in f if line.strip())
+        elif extension == '.csv':
+            rows = csv.DictReader(f)
+        else:
+            raise ValueError(f'不支持的导入格式: {extension}')
+
+        for row in rows:
+            record = normalize_record(row)
+            if record is not None:
+                yield record
+
+
+def deduplicate(records: Iterable[Dict]) -> Iterator[Dict]:
+    """
+    去重：ID相同或名称与坐标（约1米）相同的记录只保留第一条
+
+    Args:
+        records: 目录记录
+
+    Returns:
+        去重后的记录迭代器
+    """
+    seen_ids, seen_places = set(), set()
+    for record in records:
+        place = (record['name'], round(record['coordinates']['lat'], 5), round(record['coordinates']['lng'], 5))
+        if record['id'] in seen_ids or place in seen_places:
+            continue
+        seen_ids.add(record['id'])
+        seen_places.add(place)
+        yield record
@@ -0,0 +1,304 @@
+"""
+POI目录的列式存储
+每列一个文件：数值列为.npy数组，字符串列为偏移数组+UTF-8数据，类别和城市存为编码；
+按ID查找使用开放寻址哈希表。所有文件以只读内存映射打开，多个工作进程共享操作系统页缓存
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+CATALOG_FORMAT_VERSION = 1
+
+# 默认目录位置（backend/instance/catalog），可用POI_CATALOG_PATH覆盖
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                    'instance', 'catalog')
+
+# 字符串列：文件名 -> 记录字段
+STRING_COLUMNS = (('id', 'id'), ('name', 'name'), ('address', 'address'), ('description', 'description'),
+                  ('open_hours', 'openHours'), ('image_url', 'imageUrl'))
+
+# 数值列：文件名 -> (记录字段, 类型, 缺失值)
+NUMERIC_COLUMNS = (
+    ('suggested_duration', 'suggestedDuration', np.int32, -1),
+    ('rating', 'rating', np.float32, np.nan),
+    ('ticket_price', 'ticketPrice', np.float32, np.nan),
+    ('hot_rank', 'hotRank', np.int32, 0),
+)
+
+# 编码列：文件名 -> 记录字段（-1表示缺失）
+CODED_COLUMNS = (('category', 'category'), ('city', 'city'))
+
+
+def _id_hash(poi_id: str) -> int:
+    """ID的64位哈希（与进程无关，写入文件后各进程一致）"""
+    return int.from_bytes(hashlib.blake2b(poi_id.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _hash_table(ids: List[str]) -> np.ndarray:
+    """构建线性探测哈希表，槽位存放行号+1，0表示空槽；装载因子不超过0.5"""
+    size = 1
+    while size < max(2 * len(ids), 8):
+        size <<= 1
+    mask = size - 1
+    table = np.zeros(size, dtype=np.int64)
+    for row, poi_id in enumerate(ids):
+        slot = _id_hash(poi_id) & mask
+        while table[slot]:
+            slot = (slot + 1) & mask
+        table[slot] = row + 1
+    return table
+
+
+def _write_strings(directory: str, name: str, values: List[Optional[str]]):
+    """写入字符串列：name.offsets.npy（n+1个字节偏移）和name.bin"""
+    encoded = [(value or '').encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    np.save(os.path.join(directory, f'{name}.offsets.npy'), offsets)
+    with open(os.path.join(directory, f'{name}.bin'), 'wb') as f:
+        for value in encoded:
+            f.write(value)
+
+
+def write_catalog(records: Iterable[Dict], path: str, sources: Optional[List[str]] = None) -> int:
+    """
+    写入目录：先写到临时目录，完成后替换旧目录，已打开旧文件的进程不受影响
+
+    Args:
+        records: 目录记录（ID唯一）
+        path: 目录路径
+        sources: 数据来源说明，写入元数据
+
+    Returns:
+        写入的记录数
+    """
+    records = list(records)
+    temporary = f'{path}.tmp-{os.getpid()}'
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+
+    np.save(os.path.join(temporary, 'lat.npy'),
+            np.array([record['coordinates']['lat'] for record in records], dtype=np.float64))
+    np.save(os.path.join(temporary, 'lng.npy'),
+            np.array([record['coordinates']['lng'] for record in records], dtype=np.float64))
+
+    for name, field, dtype, missing in NUMERIC_COLUMNS:
+        values = [record.get(field) for record in records]
+        np.save(os.path.join(temporary, f'{name}.npy'),
+                np.array([missing if value is None else value for value in values], dtype=dtype))
+
+    dictionaries = {}
+    for name, field in CODED_COLUMNS:
+        labels: Dict[str, int] = {}
+        codes = np.array([
+            -1 if not record.get(field) else labels.setdefault(record[field], len(labels))
+            for record in records
+        ], dtype=np.int32)
+        np.save(os.path.join(temporary, f'{name}.npy'), codes)
+        dictionaries[name] = list(labels)
+
+    for name, field in STRING_COLUMNS:
+        _write_strings(temporary, name, [record.get(field) for record in records])
+
+    np.save(os.path.join(temporary, 'id_hash.npy'), _hash_table([record['id'] for record in records]))
+
+    with open(os.path.join(temporary, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': CATALOG_FORMAT_VERSION,
+            'count': len(records),
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'sources': sources or [],
+            'dictionaries': dictionaries
+        }, f, ensure_ascii=False, indent=2)
+
+    previous = f'{path}.old-{os.getpid()}'
+    if os.path.exists(path):
+        os.replace(path, previous)
+    os.replace(temporary, path)
+    shutil.rmtree(previous, ignore_errors=True)
+    return len(records)
+
+
+class _StringColumn:
+    """内存映射的字符串列"""
+
+    def __init__(self, directory: str, name: str):
+        self.offsets = np.load(os.path.join(directory, f'{name}.offsets.npy'), mmap_mode='r')
+        data_path = os.path.join(directory, f'{name}.bin')
+        if os.path.getsize(data_path):
+            self.data = np.memmap(data_path, dtype=np.uint8, mode='r')
+        else:
+            self.data = np.empty(0, dtype=np.uint8)
+
+    def __getitem__(self, row: int) -> Optional[str]:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return self.data[start:end].tobytes().decode('utf-8') if end > start else None
+
+    def values(self) -> Iterator[Optional[str]]:
+        """顺序读取整列（构建索引时使用，比逐行访问快一个数量级）"""
+        offsets = self.offsets.tolist()
+        data = self.data.tobytes()
+        for start, end in zip(offsets, offsets[1:]):
+            yield data[start:end].decode('utf-8') if end > start else None
+
+
+class Catalog:
+    """只读的POI目录；行号即记录在目录中的位置"""
+
+    def __init__(self, path: str):
+        """
+        以内存映射方式打开目录
+
+        Args:
+            path: 目录路径
+
+        Raises:
+            ValueError: 格式版本不兼容
+        """
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != CATALOG_FORMAT_VERSION:
+            raise ValueError(f"不支持的目录格式版本: {self.meta.get('version')}")
+
+        self.path = path
+        self.size = int(self.meta['count'])
+        self.lat = np.load(os.path.join(path, 'lat.npy'), mmap_mode='r')
+        self.lng = np.load(os.path.join(path, 'lng.npy'), mmap_mode='r')
+        self._numeric = {
+            field: (np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r'), missing)
+            for name, field, _, missing in NUMERIC_COLUMNS
+        }
+        self._coded = {
+            field: (np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r'), self.meta['dictionaries'][name])
+            for name, field in CODED_COLUMNS
+        }
+        self._strings = {field: _StringColumn(path, name) for name, field in STRING_COLUMNS}
+        self._hash = np.load(os.path.join(path, 'id_hash.npy'), mmap_mode='r')
+        self._mask = len(self._hash) - 1
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, row: int) -> Dict:
+        return self.record(row)
+
+    def __iter__(self):
+        return (self.record(row) for row in range(self.size))
+
+    def iter_fields(self, fields: Sequence[str]) -> Iterator[Dict]:
+        """
+        按行顺序读取部分字段（类别、城市及字符串字段）
+
+        Args:
+            fields: 字段名
+
+        Returns:
+            只含这些字段的记录迭代器
+        """
+        columns = []
+        for field in fields:
+            if field in self._coded:
+                codes, labels = self._coded[field]
+                columns.append(labels[code] if code >= 0 else None for code in codes.tolist())
+            else:
+                columns.append(self._strings[field].values())
+        for values in zip(*columns):
+            yield dict(zip(fields, values))
+
+    def categories(self) -> List[Optional[str]]:
+        """每行的类别"""
+        codes, labels = self._coded['category']
+        return [labels[code] if code >= 0 else None for code in codes.tolist()]
+
+    def record(self, row: int) -> Dict:
+        """
+        读取一行，字段命名与POI.to_dict一致
+
+        Args:
+            row: 行号
+
+        Returns:
+            目录记录
+        """
+        record = {field: column[row] for field, column in self._strings.items()}
+        record['coordinates'] = {'lat': float(self.lat[row]), 'lng': float(self.lng[row])}
+        for field, (codes, labels) in self._coded.items():
+            code = int(codes[row])
+            record[field] = labels[code] if code >= 0 else None
+        for field, (values, missing) in self._numeric.items():
+            value = values[row].item()
+            if value == missing or value != value:
+                value = None
+            elif isinstance(value, float):
+                # float32存储，去掉转换出的多余小数位
+                value = round(value, 2)
+            record[field] = value
+        record['isCustom'] = False
+        return record
+
+    def find(self, poi_id: str) -> Optional[int]:
+        """
+        按ID查找行号（开放寻址，平均O(1)）
+
+        Args:
+            poi_id: POI ID
+
+        Returns:
+            行号，不存在时为None
+        """
+        if not self.size:
+            return None
+        ids = self._strings['id']
+        slot = _id_hash(poi_id) & self._mask
+        while True:
+            entry = int(self._hash[slot])
+            if entry == 0:
+                return None
+            if ids[entry - 1] == poi_id:
+                return entry - 1
+            slot = (slot + 1) & self._mask
+
+    def get(self, poi_id: str) -> Optional[Dict]:
+        """按ID获取记录，不存在时为None"""
+        row = self.find(poi_id)
+        return None if row is None else self.record(row)
+
+
+_catalog: Optional[Catalog] = None
+_catalog_stamp = None
+_catalog_lock = threading.Lock()
+
+
+def catalog_path() -> str:
+    """目录路径（POI_CATALOG_PATH环境变量）"""
+    return os.getenv('POI_CATALOG_PATH') or DEFAULT_CATALOG_PATH
+
+
+def get_catalog() -> Optional[Catalog]:
+    """
+    获取当前进程打开的目录；尚未构建时返回None，目录被重新构建后自动重新打开
+
+    Returns:
+        目录
+    """
+    global _catalog, _catalog_stamp
+    path = catalog_path()
+    try:
+        stat = os.stat(os.path.join(path, 'meta.json'))
+    except OSError:
+        return None
+
+    stamp = (path, stat.st_ino, stat.st_mtime_ns)
+    if stamp != _catalog_stamp:
+        with _catalog_lock:
+            if stamp != _catalog_stamp:
+                _catalog = Catalog(path)
+                _catalog_stamp = stamp
+    return _catalog
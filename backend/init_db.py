@@ -1,13 +1,14 @@
 #!/usr/bin/env python3
 """
 数据库初始化脚本
-创建所有数据表并添加示例数据
+执行数据库迁移并添加示例数据
 """
 
 from app import create_app
 from database import db
 from models.user import User
 from models.trip import Trip, POI, DayItinerary
+from migrations.runner import upgrade
 from datetime import datetime, timedelta
 import os
 
@@ -16,13 +17,14 @@ def init_database():
     app = create_app()
     
     with app.app_context():
-        # 删除所有表（谨慎使用）
-        print("正在删除现有表...")
-        db.drop_all()
+        # 执行待执行的迁移（保留已有数据）
+        print("正在执行数据库迁移...")
+        for migration in upgrade(db.engine):
+            print(f"已执行迁移: {migration.version:04d} {migration.description}")
         
-        # 创建所有表
-        print("正在创建数据表...")
-        db.create_all()
+        if User.query.filter_by(email='test@example.com').first():
+            print("示例数据已存在，跳过")
+            return
         
         # 添加示例用户
         print("正在添加示例数据...")
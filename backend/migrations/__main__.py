@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+数据库迁移入口
+
+用法（在backend目录下）：
+    python -m migrations            # 执行所有待执行的迁移
+    python -m migrations status     # 查看已执行和待执行的迁移
+    python -m migrations check      # 用EXPLAIN检查热点查询的索引使用，未使用时返回非零退出码
+"""
+
+import argparse
+import sys
+
+from app import create_app
+from database import db
+from migrations.runner import check_index_usage, pending_migrations, upgrade
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='数据库迁移')
+    parser.add_argument('command', nargs='?', default='upgrade', choices=['upgrade', 'status', 'check'])
+    parser.add_argument('--target', type=int, help='执行到指定版本为止（upgrade）')
+    parser.add_argument('--verbose', action='store_true', help='输出完整的查询计划（check）')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        engine = db.engine
+
+        if args.command == 'status':
+            pending = pending_migrations(engine)
+            if not pending:
+                print('数据库已是最新版本')
+            for migration in pending:
+                print(f'待执行: {migration.version:04d} {migration.description}')
+            return 0
+
+        if args.command == 'check':
+            failed = 0
+            for result in check_index_usage(engine):
+                status = 'OK  ' if result['uses_index'] else 'SCAN'
+                print(f"{status} {result['name']} (预期: {', '.join(result['indexes'])})")
+                if args.verbose or not result['uses_index']:
+                    for line in result['plan'].splitlines():
+                        print(f'       {line}')
+                failed += not result['uses_index']
+            return 1 if failed else 0
+
+        executed = upgrade(engine, target=args.target)
+        for migration in executed:
+            print(f'已执行: {migration.version:04d} {migration.description}')
+        if not executed:
+            print('没有待执行的迁移')
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
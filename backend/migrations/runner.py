@@ -0,0 +1,156 @@
+"""
+数据库迁移执行与索引检查
+记录已执行的迁移版本并按顺序补齐；用EXPLAIN确认热点查询实际使用了预期索引
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select, true
+from sqlalchemy.engine import Connection, Engine
+
+from migrations.versions import MIGRATIONS, Migration
+
+_metadata = MetaData()
+
+schema_migrations = Table(
+    'schema_migrations', _metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def applied_versions(conn: Connection) -> List[int]:
+    """
+    获取已执行的迁移版本
+
+    Args:
+        conn: 数据库连接
+
+    Returns:
+        升序排列的版本号
+    """
+    schema_migrations.create(conn, checkfirst=True)
+    rows = conn.execute(select(schema_migrations.c.version).order_by(schema_migrations.c.version))
+    return [row[0] for row in rows]
+
+
+def pending_migrations(engine: Engine) -> List[Migration]:
+    """
+    获取尚未执行的迁移
+
+    Args:
+        engine: 数据库引擎
+
+    Returns:
+        按版本排序的待执行迁移
+    """
+    with engine.begin() as conn:
+        applied = set(applied_versions(conn))
+    return [migration for migration in MIGRATIONS if migration.version not in applied]
+
+
+def upgrade(engine: Engine, target: Optional[int] = None) -> List[Migration]:
+    """
+    执行所有待执行的迁移（或执行到target版本为止）
+
+    每个迁移与其版本记录在同一事务中提交，失败时回滚该迁移并停止。
+
+    Args:
+        engine: 数据库引擎
+        target: 目标版本，为空时执行到最新
+
+    Returns:
+        本次执行的迁移
+    """
+    executed = []
+    for migration in pending_migrations(engine):
+        if target is not None and migration.version > target:
+            break
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.utcnow()
+            ))
+        executed.append(migration)
+    return executed
+
+
+def _index_checks():
+    """热点查询及可接受的索引（查询, 索引名列表）"""
+    from models.trip import Trip, POI, DayItinerary
+
+    return {
+        'trip_list': (
+            select(Trip.id).where(Trip.user_id == 'u').order_by(Trip.updated_at.desc(), Trip.id.desc()),
+            ['ix_trips_user_updated', 'ix_trips_user_status_updated']
+        ),
+        'trip_list_by_status': (
+            select(Trip.id).where(Trip.user_id == 'u', Trip.status == 'draft')
+            .order_by(Trip.updated_at.desc(), Trip.id.desc()),
+            ['ix_trips_user_status_updated']
+        ),
+        'trip_pois': (
+            select(POI.id).where(POI.trip_id == 't'),
+            ['ix_pois_trip_custom']
+        ),
+        'wishlist': (
+            select(POI.id).where(POI.trip_id.is_(None), POI.is_custom == true()),
+            ['ix_pois_trip_custom']
+        ),
+        'trip_day_itineraries': (
+            select(DayItinerary.id).where(DayItinerary.trip_id == 't').order_by(DayItinerary.day),
+            ['uq_day_itineraries_trip_day']
+        ),
+    }
+
+
+def _explain(conn: Connection, statement) -> str:
+    """以当前方言执行EXPLAIN，返回计划文本"""
+    dialect = conn.dialect.name
+    compiled = statement.compile(dialect=conn.dialect)
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+
+    if dialect == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+        if dialect == 'postgresql':
+            # 小表上规划器总会选择顺序扫描，禁用后才能判断索引是否可用
+            conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+
+    rows = conn.exec_driver_sql(prefix + str(compiled), params).fetchall()
+    return '\n'.join(' '.join(str(value) for value in row) for row in rows)
+
+
+def check_index_usage(engine: Engine, names: Optional[Sequence[str]] = None) -> List[Dict]:
+    """
+    用EXPLAIN检查热点查询是否使用了预期索引
+
+    Args:
+        engine: 数据库引擎
+        names: 只检查指定的查询，为空时检查全部
+
+    Returns:
+        每个查询的检查结果（name, indexes, uses_index, plan）
+    """
+    results = []
+    for name, (statement, indexes) in _index_checks().items():
+        if names and name not in names:
+            continue
+        # SET LOCAL只在当前事务内生效
+        with engine.connect() as conn, conn.begin():
+            plan = _explain(conn, statement)
+        results.append({
+            'name': name,
+            'indexes': indexes,
+            'uses_index': any(index in plan for index in indexes),
+            'plan': plan
+        })
+    return results
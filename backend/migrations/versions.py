@@ -0,0 +1,213 @@
+"""
+数据库迁移版本
+按版本号顺序执行，每个迁移在独立事务中运行；新增迁移时追加到MIGRATIONS末尾，不要修改已发布的迁移
+"""
+
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import (
+    JSON, Boolean, Column, Date, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table, Text,
+    delete, func, inspect, select
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Connection
+
+
+class Migration(NamedTuple):
+    """单个迁移"""
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def create_index(conn: Connection, table_name: str, name: str, *columns: str, unique: bool = False):
+    """
+    创建索引（已存在时跳过）
+
+    直接反射当前表结构，不依赖模型定义，模型以后变化时迁移仍然可以重放。
+
+    Args:
+        conn: 数据库连接
+        table_name: 表名
+        name: 索引名
+        *columns: 索引列（按顺序）
+        unique: 是否为唯一索引
+    """
+    existing = {index['name'] for index in inspect(conn).get_indexes(table_name)}
+    if name in existing:
+        return
+    table = Table(table_name, MetaData(), autoload_with=conn)
+    Index(name, *(table.c[column] for column in columns), unique=unique).create(conn)
+
+
+def drop_index(conn: Connection, table_name: str, name: str):
+    """
+    删除索引（不存在时跳过）
+
+    Args:
+        conn: 数据库连接
+        table_name: 表名
+        name: 索引名
+    """
+    indexes = {index['name']: index for index in inspect(conn).get_indexes(table_name)}
+    if name not in indexes:
+        return
+    table = Table(table_name, MetaData(), autoload_with=conn)
+    Index(name, *(table.c[column] for column in indexes[name]['column_names'])).drop(conn)
+
+
+def add_column(conn: Connection, table_name: str, column: Column):
+    """
+    添加列（已存在时跳过）
+
+    Args:
+        conn: 数据库连接
+        table_name: 表名
+        column: 列定义（非空列须带server_default）
+    """
+    existing = {item['name'] for item in inspect(conn).get_columns(table_name)}
+    if column.name in existing:
+        return
+    column_type = column.type.compile(dialect=conn.dialect)
+    ddl = f'ALTER TABLE {table_name} ADD COLUMN {column.name} {column_type}'
+    if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg}"
+    if not column.nullable:
+        ddl += ' NOT NULL'
+    conn.exec_driver_sql(ddl)
+
+
+def _baseline(conn: Connection):
+    """
+    创建初始数据表；此前由db.create_all()建立的数据库原样保留
+
+    表结构固定为引入迁移之前的版本，不引用模型：之后的索引和列类型变化都由后续迁移完成，
+    新建数据库与已有数据库经过相同的迁移路径。
+    """
+    metadata = MetaData()
+    Table(
+        'users', metadata,
+        Column('id', String(36), primary_key=True),
+        Column('email', String(120), nullable=False, unique=True, index=True),
+        Column('name', String(80), nullable=True),
+        Column('password_hash', String(255), nullable=False),
+        Column('avatar', String(255), nullable=True),
+        Column('is_active', Boolean, nullable=True),
+        Column('created_at', DateTime, nullable=True),
+        Column('updated_at', DateTime, nullable=True),
+    )
+    Table(
+        'trips', metadata,
+        Column('id', String(36), primary_key=True),
+        Column('name', String(200), nullable=False),
+        Column('user_id', String(36), ForeignKey('users.id'), nullable=False),
+        Column('total_days', Integer, nullable=False),
+        Column('transport_mode', String(20), nullable=False),
+        Column('start_date', Date, nullable=True),
+        Column('start_time', String(10), nullable=True),
+        Column('end_time', String(10), nullable=True),
+        Column('status', String(20), nullable=True),
+        Column('created_at', DateTime, nullable=True),
+        Column('updated_at', DateTime, nullable=True),
+    )
+    Table(
+        'pois', metadata,
+        Column('id', String(36), primary_key=True),
+        Column('name', String(200), nullable=False),
+        Column('latitude', Float, nullable=False),
+        Column('longitude', Float, nullable=False),
+        Column('address', Text, nullable=True),
+        Column('category', String(50), nullable=True),
+        Column('description', Text, nullable=True),
+        Column('open_hours', String(200), nullable=True),
+        Column('suggested_duration', Integer, nullable=True),
+        Column('custom_duration', Integer, nullable=True),
+        Column('is_custom', Boolean, nullable=True),
+        Column('image_url', String(500), nullable=True),
+        Column('trip_id', String(36), ForeignKey('trips.id'), nullable=True),
+        Column('created_at', DateTime, nullable=True),
+    )
+    Table(
+        'day_itineraries', metadata,
+        Column('id', String(36), primary_key=True),
+        Column('trip_id', String(36), ForeignKey('trips.id'), nullable=False),
+        Column('day', Integer, nullable=False),
+        Column('date', Date, nullable=True),
+        Column('poi_sequence', Text, nullable=True),
+        Column('routes_data', Text, nullable=True),
+        Column('total_duration', Integer, nullable=True),
+        Column('total_distance', Float, nullable=True),
+        Column('created_at', DateTime, nullable=True),
+    )
+    metadata.create_all(conn, checkfirst=True)
+
+
+def _foreign_key_indexes(conn: Connection):
+    """为高频过滤的外键列添加复合索引"""
+    # 行程列表：按用户（及状态）过滤、按更新时间倒序分页；同时覆盖trips.user_id外键
+    create_index(conn, 'trips', 'ix_trips_user_status_updated', 'user_id', 'status', 'updated_at', 'id')
+    create_index(conn, 'trips', 'ix_trips_user_updated', 'user_id', 'updated_at', 'id')
+    # 按行程加载POI，以及愿望清单（trip_id IS NULL AND is_custom）
+    create_index(conn, 'pois', 'ix_pois_trip_custom', 'trip_id', 'is_custom')
+    # 按行程加载单日行程并按天排序
+    create_index(conn, 'day_itineraries', 'ix_day_itineraries_trip_day', 'trip_id', 'day')
+
+
+def _json_itinerary_columns(conn: Connection):
+    """单日行程的poi_sequence、routes_data由TEXT改为原生JSON（PostgreSQL为JSONB）"""
+    dialect = conn.dialect.name
+    columns = {column['name']: column['type'] for column in inspect(conn).get_columns('day_itineraries')}
+    for name in ('poi_sequence', 'routes_data'):
+        if isinstance(columns.get(name), JSON):
+            continue
+        if dialect == 'postgresql':
+            conn.exec_driver_sql(
+                f"ALTER TABLE day_itineraries ALTER COLUMN {name} TYPE JSONB "
+                f"USING NULLIF({name}, '')::jsonb"
+            )
+        elif dialect == 'mysql':
+            conn.exec_driver_sql(f"UPDATE day_itineraries SET {name} = NULL WHERE {name} = ''")
+            conn.exec_driver_sql(f'ALTER TABLE day_itineraries MODIFY {name} JSON NULL')
+        else:
+            # SQLite的JSON列本身以文本存储，已有数据无需转换，只清理空字符串
+            conn.exec_driver_sql(f"UPDATE day_itineraries SET {name} = NULL WHERE {name} = ''")
+
+
+def _unique_itinerary_day(conn: Connection):
+    """单日行程(trip_id, day)改为唯一索引，重复的记录只保留最新创建的一条"""
+    table = Table('day_itineraries', MetaData(), autoload_with=conn)
+    duplicates = conn.execute(
+        select(table.c.trip_id, table.c.day)
+        .group_by(table.c.trip_id, table.c.day)
+        .having(func.count() > 1)
+    ).fetchall()
+    for trip_id, day in duplicates:
+        ids = conn.execute(
+            select(table.c.id)
+            .where(table.c.trip_id == trip_id, table.c.day == day)
+            .order_by(table.c.created_at.desc(), table.c.id.desc())
+        ).scalars().all()
+        conn.execute(delete(table).where(table.c.id.in_(ids[1:])))
+
+    drop_index(conn, 'day_itineraries', 'ix_day_itineraries_trip_day')
+    create_index(conn, 'day_itineraries', 'uq_day_itineraries_trip_day', 'trip_id', 'day', unique=True)
+
+
+def _trip_itinerary_version(conn: Connection):
+    """行程增加日程版本号，规划结果保存前检查规划期间行程是否被修改"""
+    add_column(conn, 'trips', Column('itinerary_version', Integer, nullable=False, server_default='0'))
+
+
+def _trip_plan_options(conn: Connection):
+    """行程保存最近一次规划使用的参数（JSON，PostgreSQL为JSONB）"""
+    add_column(conn, 'trips', Column('plan_options', JSON().with_variant(JSONB(), 'postgresql'), nullable=True))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, '基线数据表', _baseline),
+    Migration(2, '外键与列表查询索引', _foreign_key_indexes),
+    Migration(3, '单日行程使用原生JSON列', _json_itinerary_columns),
+    Migration(4, '单日行程(trip_id, day)唯一约束', _unique_itinerary_day),
+    Migration(5, '行程日程版本号', _trip_itinerary_version),
+    Migration(6, '行程保存规划参数', _trip_plan_options),
+]
@@ -3,16 +3,24 @@
 """
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
 import uuid
-import json
 
 # 从database.py导入db实例
 from database import db
 
+# 原生JSON列：PostgreSQL使用JSONB，SQLite等以JSON文本存储；由驱动在加载时解码一次
+JSONColumn = db.JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql')
+
 class Trip(db.Model):
     """行程模型"""
     __tablename__ = 'trips'
+    __table_args__ = (
+        # 行程列表按用户（及状态）过滤、按更新时间倒序做游标分页
+        db.Index('ix_trips_user_status_updated', 'user_id', 'status', 'updated_at', 'id'),
+        db.Index('ix_trips_user_updated', 'user_id', 'updated_at', 'id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = db.Column(db.String(200), nullable=False)
@@ -25,14 +33,26 @@ class Trip(db.Model):
     status = db.Column(db.String(20), default='draft')    # draft, completed, archived
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # 日程版本：增删POI时递增，规划任务保存结果前据此丢弃规划期间已过期的结果
+    itinerary_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # 最近一次保存的规划参数（每日时长、交通方式、开始时间、是否周末），增删POI时按相同参数增量规划
+    plan_options = db.Column(JSONColumn, nullable=True)
     
     # 关系
     pois = db.relationship('POI', backref='trip', lazy=True, cascade='all, delete-orphan')
     day_itineraries = db.relationship('DayItinerary', backref='trip', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
-        """转换为字典"""
-        return {
+    def to_dict(self, include=('pois', 'day_itineraries')):
+        """
+        转换为字典
+
+        Args:
+            include: 需要展开的嵌套集合（pois、day_itineraries），未列出的集合不会被加载
+
+        Returns:
+            行程字典
+        """
+        data = {
             'id': self.id,
             'name': self.name,
             'user_id': self.user_id,
@@ -43,10 +63,13 @@ class Trip(db.Model):
             'end_time': self.end_time,
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'pois': [poi.to_dict() for poi in self.pois],
-            'day_itineraries': [day.to_dict() for day in self.day_itineraries]
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        if 'pois' in include:
+            data['pois'] = [poi.to_dict() for poi in self.pois]
+        if 'day_itineraries' in include:
+            data['day_itineraries'] = [day.to_dict() for day in self.day_itineraries]
+        return data
     
     def __repr__(self):
         return f'<Trip {self.name}>'
@@ -54,6 +77,10 @@ class Trip(db.Model):
 class POI(db.Model):
     """兴趣点模型"""
     __tablename__ = 'pois'
+    __table_args__ = (
+        # 按行程加载POI，以及愿望清单（trip_id IS NULL AND is_custom）
+        db.Index('ix_pois_trip_custom', 'trip_id', 'is_custom'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = db.Column(db.String(200), nullable=False)
@@ -97,36 +124,36 @@ class POI(db.Model):
 class DayItinerary(db.Model):
     """单日行程模型"""
     __tablename__ = 'day_itineraries'
+    __table_args__ = (
+        # 每个行程每天只有一条记录；同时用于按行程加载并按天排序
+        db.Index('uq_day_itineraries_trip_day', 'trip_id', 'day', unique=True),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     trip_id = db.Column(db.String(36), db.ForeignKey('trips.id'), nullable=False)
     day = db.Column(db.Integer, nullable=False)
     date = db.Column(db.Date, nullable=True)
-    poi_sequence = db.Column(db.Text, nullable=True)  # JSON格式存储POI顺序
-    routes_data = db.Column(db.Text, nullable=True)   # JSON格式存储路线信息
+    poi_sequence = db.Column(JSONColumn, nullable=True)  # POI ID顺序
+    routes_data = db.Column(JSONColumn, nullable=True)   # 路线信息
     total_duration = db.Column(db.Integer, nullable=True)  # 分钟
     total_distance = db.Column(db.Float, nullable=True)    # 米
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def get_poi_sequence(self):
         """获取POI顺序"""
-        if self.poi_sequence:
-            return json.loads(self.poi_sequence)
-        return []
+        return self.poi_sequence or []
     
     def set_poi_sequence(self, sequence):
-        """设置POI顺序"""
-        self.poi_sequence = json.dumps(sequence)
+        """设置POI顺序（JSON列不跟踪原地修改，需整体赋值）"""
+        self.poi_sequence = list(sequence)
     
     def get_routes_data(self):
         """获取路线数据"""
-        if self.routes_data:
-            return json.loads(self.routes_data)
-        return []
+        return self.routes_data or []
     
     def set_routes_data(self, routes):
         """设置路线数据"""
-        self.routes_data = json.dumps(routes)
+        self.routes_data = routes
     
     def to_dict(self):
         """转换为字典"""
@@ -9,6 +9,8 @@ import os
 
 from database import db
 from models.trip import POI
+from catalog.store import get_catalog
+from services.poi_index import get_poi_index, index_poi
 
 pois_bp = Blueprint('pois', __name__, url_prefix='/api/pois')
 
@@ -26,34 +28,49 @@ def search_pois():
         if not query:
             return jsonify({'error': '搜索关键词不能为空'}), 400
         
-        # 模拟POI搜索结果
-        # 在实际应用中，这里应该调用地图API（如高德地图、百度地图等）
-        mock_pois = [
-            {
-                'id': f'poi_{i}',
-                'name': f'{query}相关地点{i}',
-                'coordinates': {
-                    'lat': float(lat) + (i * 0.001) if lat else 39.9042 + (i * 0.001),
-                    'lng': float(lng) + (i * 0.001) if lng else 116.4074 + (i * 0.001)
-                },
-                'address': f'北京市朝阳区某某街道{i}号',
-                'category': '景点',
-                'description': f'这是一个关于{query}的地点描述',
-                'openHours': '09:00-18:00',
-                'suggestedDuration': 60 + (i * 30),
-                'imageUrl': f'https://example.com/image_{i}.jpg'
-            }
-            for i in range(1, 6)
-        ]
+        try:
+            lat = float(lat) if lat else None
+            lng = float(lng) if lng else None
+            radius = float(radius)
+            limit = min(int(request.args.get('limit', 20)), 100)
+        except ValueError:
+            return jsonify({'error': '经纬度、半径或数量格式错误'}), 400
+        
+        # 给出位置时，半径内的结果按距离加权
+        pois = get_poi_index().search(query, limit=limit, lat=lat, lng=lng, radius_m=radius)
         
         return jsonify({
-            'pois': mock_pois,
-            'total': len(mock_pois)
+            'pois': pois,
+            'total': len(pois)
         }), 200
         
     except Exception as e:
         return jsonify({'error': f'搜索POI失败: {str(e)}'}), 500
 
+@pois_bp.route('/suggest', methods=['GET'])
+@jwt_required()
+def suggest_pois():
+    """按名称前缀联想POI（输入提示）"""
+    try:
+        prefix = request.args.get('q', '').strip()
+        try:
+            limit = min(int(request.args.get('limit', 10)), 50)
+        except ValueError:
+            return jsonify({'error': '数量格式错误'}), 400
+        
+        if not prefix:
+            return jsonify({'pois': [], 'total': 0}), 200
+        
+        pois = get_poi_index().suggest(prefix, limit=limit)
+        
+        return jsonify({
+            'pois': pois,
+            'total': len(pois)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'POI联想失败: {str(e)}'}), 500
+
 @pois_bp.route('/nearby', methods=['GET'])
 @jwt_required()
 def get_nearby_pois():
@@ -72,40 +89,57 @@ def get_nearby_pois():
             lat = float(lat)
             lng = float(lng)
             radius = int(radius)
+            limit = min(int(request.args.get('limit', 50)), 200)
+            k = request.args.get('k')
+            k = min(int(k), 200) if k else None
         except ValueError:
             return jsonify({'error': '经纬度或半径格式错误'}), 400
         
-        # 模拟附近POI数据
-        # 在实际应用中，这里应该调用地图API
-        categories = ['餐厅', '景点', '购物', '酒店', '交通'] if not category else [category]
-        
-        mock_pois = []
-        for i, cat in enumerate(categories):
-            for j in range(3):
-                mock_pois.append({
-                    'id': f'nearby_{cat}_{j}',
-                    'name': f'{cat}{j+1}',
-                    'coordinates': {
-                        'lat': lat + (i * 0.001) + (j * 0.0005),
-                        'lng': lng + (i * 0.001) + (j * 0.0005)
-                    },
-                    'address': f'附近的{cat}地址{j+1}',
-                    'category': cat,
-                    'description': f'这是一个{cat}',
-                    'openHours': '09:00-21:00',
-                    'suggestedDuration': 30 + (j * 15),
-                    'distance': 100 + (i * 200) + (j * 50),  # 距离（米）
-                    'imageUrl': f'https://example.com/{cat}_{j}.jpg'
-                })
+        if not -90 <= lat <= 90 or not -180 <= lng <= 180 or radius <= 0:
+            return jsonify({'error': '经纬度或半径超出范围'}), 400
+        
+        # category可传多个，逗号分隔；传k时返回最近的k个（radius为最大搜索半径）
+        categories = [item.strip() for item in category.split(',') if item.strip()] if category else None
+        pois = get_poi_index().nearby(lat, lng, radius, categories=categories, limit=limit, k=k)
         
         return jsonify({
-            'pois': mock_pois,
-            'total': len(mock_pois)
+            'pois': pois,
+            'total': len(pois)
         }), 200
         
     except Exception as e:
         return jsonify({'error': f'获取附近POI失败: {str(e)}'}), 500
 
+@pois_bp.route('/clusters', methods=['GET'])
+@jwt_required()
+def get_poi_clusters():
+    """地图视口内的POI聚合，bbox为西,南,东,北（经纬度）"""
+    try:
+        bbox = request.args.get('bbox')
+        zoom = request.args.get('zoom')
+        if not bbox or zoom is None:
+            return jsonify({'error': 'bbox和zoom不能为空'}), 400
+
+        try:
+            west, south, east, north = (float(value) for value in bbox.split(','))
+            zoom = int(zoom)
+        except ValueError:
+            return jsonify({'error': 'bbox或zoom格式错误'}), 400
+
+        if (not -90 <= south <= north <= 90 or not -180 <= west <= 180 or not -180 <= east <= 180
+                or not 0 <= zoom <= 22):
+            return jsonify({'error': 'bbox或zoom超出范围'}), 400
+
+        try:
+            result = get_poi_index().clusters(west, south, east, north, zoom)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify(dict(result, zoom=zoom)), 200
+
+    except Exception as e:
+        return jsonify({'error': f'获取POI聚合失败: {str(e)}'}), 500
+
 @pois_bp.route('/categories', methods=['GET'])
 @jwt_required()
 def get_poi_categories():
@@ -143,41 +177,14 @@ def get_poi_detail(poi_id):
                 'poi': poi.to_dict()
             }), 200
         
-        # 如果是外部POI，返回模拟数据
-        # 在实际应用中，这里应该调用地图API获取详情
-        mock_poi = {
-            'id': poi_id,
-            'name': f'POI详情_{poi_id}',
-            'coordinates': {
-                'lat': 39.9042,
-                'lng': 116.4074
-            },
-            'address': '北京市朝阳区某某街道123号',
-            'category': '景点',
-            'description': '这是一个详细的POI描述，包含了该地点的历史、特色、开放时间等信息。',
-            'openHours': '周一至周日 09:00-18:00',
-            'suggestedDuration': 120,
-            'phone': '010-12345678',
-            'website': 'https://example.com',
-            'rating': 4.5,
-            'reviews': 1234,
-            'price': '免费',
-            'tags': ['热门', '必去', '拍照'],
-            'images': [
-                'https://example.com/image1.jpg',
-                'https://example.com/image2.jpg',
-                'https://example.com/image3.jpg'
-            ],
-            'facilities': ['停车场', 'WiFi', '无障碍通道', '餐厅'],
-            'tips': [
-                '建议提前预约',
-                '周末人较多，建议工作日前往',
-                '可以带相机拍照'
-            ]
-        }
-        
+        # 否则查内置POI目录
+        catalog = get_catalog()
+        record = catalog.get(poi_id) if catalog is not None else None
+        if record is None:
+            return jsonify({'error': 'POI不存在'}), 404
+
         return jsonify({
-            'poi': mock_poi
+            'poi': record
         }), 200
         
     except Exception as e:
@@ -232,6 +239,7 @@ def create_custom_poi():
         
         db.session.add(poi)
         db.session.commit()
+        index_poi(poi)
         
         return jsonify({
             'message': '自定义POI创建成功',
@@ -0,0 +1,99 @@
+"""
+路线计算路由
+"""
+
+from flask import Blueprint, Response, request, jsonify
+from flask_jwt_extended import jwt_required
+import json
+import logging
+
+from algorithms.distance_matrix import DISTANCE_MODES
+from algorithms.route_optimizer import RouteOptimizer, parse_clock
+from services.route_matrix import (
+    MAX_MATRIX_POINTS, STREAM_THRESHOLD_CELLS, TRANSPORT_MODES,
+    iter_matrix_rows, matrix_header, resolve_points, row_payload
+)
+from services.serializers import parse_bool
+
+logger = logging.getLogger(__name__)
+
+routes_bp = Blueprint('routes', __name__, url_prefix='/api/routes')
+
+@routes_bp.route('/matrix', methods=['POST'])
+@jwt_required()
+def get_distance_matrix():
+    """
+    起点×终点的距离和预估时间矩阵
+
+    请求体：origins（坐标{lat, lng}、POI对象或POI ID的列表）、destinations（可选，默认与origins相同）、
+    transportMode、distanceMode、startTime、isWeekend。较大的矩阵（或传stream=true）以NDJSON逐行返回：
+    首行为矩阵信息，之后每行为{row, distances, durations}，计算中途出错时最后一行为{error}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        origins = data.get('origins')
+        destinations = data.get('destinations')
+        transport_mode = data.get('transportMode', 'driving')
+        distance_mode = data.get('distanceMode', 'haversine')
+        start_time = data.get('startTime', '09:00')
+
+        if not isinstance(origins, list) or not origins:
+            return jsonify({'error': 'origins不能为空'}), 400
+        if destinations is not None and (not isinstance(destinations, list) or not destinations):
+            return jsonify({'error': 'destinations必须是非空列表'}), 400
+        if len(origins) > MAX_MATRIX_POINTS or len(destinations or ()) > MAX_MATRIX_POINTS:
+            return jsonify({'error': f'起点和终点各不能超过{MAX_MATRIX_POINTS}个'}), 400
+        if transport_mode not in TRANSPORT_MODES:
+            return jsonify({'error': f'不支持的交通方式: {transport_mode}'}), 400
+        if distance_mode not in DISTANCE_MODES:
+            return jsonify({'error': f'不支持的距离计算模式: {distance_mode}'}), 400
+        try:
+            is_weekend = parse_bool(data.get('isWeekend', False), 'isWeekend')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        try:
+            hour = parse_clock(start_time) // 60
+        except ValueError:
+            return jsonify({'error': 'startTime格式错误，应为00:00-23:59'}), 400
+
+        try:
+            origin_coords = resolve_points(origins)
+            destination_coords = resolve_points(destinations) if destinations is not None else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        optimizer = RouteOptimizer(distance_mode=distance_mode)
+        rows = iter_matrix_rows(optimizer, origin_coords, destination_coords, transport_mode, hour, is_weekend)
+        columns = len(destination_coords) if destination_coords is not None else len(origin_coords)
+        header = matrix_header(len(origin_coords), columns, transport_mode, distance_mode)
+
+        stream = request.args.get('stream', '').lower() in ('1', 'true')
+        if not stream and len(origin_coords) * columns <= STREAM_THRESHOLD_CELLS:
+            distances, durations = [], []
+            for _, distance_block, duration_block in rows:
+                block_distances, block_durations = row_payload(distance_block, duration_block)
+                distances.extend(block_distances)
+                durations.extend(block_durations)
+            return jsonify(dict(header, distances=distances, durations=durations)), 200
+
+        # 大矩阵按行块计算并逐行输出，内存占用与矩阵大小无关；
+        # 响应头发出后无法再改状态码，中途出错时以{"error": ...}行结束，客户端据此判断结果不完整
+        def generate():
+            yield json.dumps(header, ensure_ascii=False) + '\n'
+            try:
+                for row_start, distance_block, duration_block in rows:
+                    block_distances, block_durations = row_payload(distance_block, duration_block)
+                    for offset, (row_distances, row_durations) in enumerate(zip(block_distances, block_durations)):
+                        yield json.dumps({
+                            'row': row_start + offset,
+                            'distances': row_distances,
+                            'durations': row_durations
+                        }, separators=(',', ':')) + '\n'
+            except Exception as e:
+                logger.exception('距离矩阵流式输出失败')
+                yield json.dumps({'error': f'计算距离矩阵失败: {str(e)}'}, ensure_ascii=False) + '\n'
+
+        return Response(generate(), mimetype='application/x-ndjson'), 200
+
+    except Exception as e:
+        return jsonify({'error': f'计算距离矩阵失败: {str(e)}'}), 500
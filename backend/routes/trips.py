@@ -2,18 +2,31 @@
 行程管理路由
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import insert
+from sqlalchemy.orm import defer
 from datetime import datetime, date, timedelta
 import json
+import os
 
 from database import db
 from models.user import User
 from models.trip import Trip, POI, DayItinerary
-from algorithms.route_optimizer import RouteOptimizer
+from algorithms.route_optimizer import RouteOptimizer, parse_clock
+from services.locks import trip_locks
+from services.pagination import keyset_page
+from services.plan_jobs import StalePlanResult, get_job_manager, run_plan_optimization
+from services.poi_index import index_poi, unindex_poi
+from services.serializers import (
+    DETAIL_FIELDS, LIST_FIELDS, parse_bool, parse_fields, serialize_trip, serialize_trips, with_collections
+)
 
 trips_bp = Blueprint('trips', __name__, url_prefix='/api/trips')
 
+# 增删POI时在请求内（持有行程锁）做增量规划的时间预算（毫秒）
+INCREMENTAL_PLAN_BUDGET_MS = float(os.getenv('INCREMENTAL_PLAN_BUDGET_MS', 200))
+
 @trips_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_trips():
@@ -23,30 +36,40 @@ def get_trips():
         
         # 获取查询参数
         status = request.args.get('status')
-        page = int(request.args.get('page', 1))
-        per_page = min(int(request.args.get('per_page', 10)), 50)
+        cursor = request.args.get('cursor')
+        per_page = max(min(int(request.args.get('per_page', 10)), 50), 1)
+        # 总数需要额外的COUNT查询，客户端可以用count=false跳过
+        include_total = request.args.get('count', 'true').lower() not in ('false', '0', 'no')
+        
+        # 默认只返回POI和单日行程的数量，fields=pois,day_itineraries可展开嵌套集合
+        try:
+            fields = parse_fields(request.args.get('fields'), LIST_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # 构建查询
-        query = Trip.query.filter_by(user_id=user_id)
+        query = with_collections(Trip.query.filter_by(user_id=user_id), fields)
         
         if status:
             query = query.filter_by(status=status)
         
-        # 分页查询
-        trips = query.order_by(Trip.updated_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        # 按(updated_at, id)游标分页，避免OFFSET扫描
+        try:
+            trips, next_cursor = keyset_page(query, Trip, per_page, cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        pagination = {
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None
+        }
+        if include_total:
+            pagination['total'] = query.order_by(None).count()
         
         return jsonify({
-            'trips': [trip.to_dict() for trip in trips.items],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': trips.total,
-                'pages': trips.pages,
-                'has_next': trips.has_next,
-                'has_prev': trips.has_prev
-            }
+            'trips': serialize_trips(trips, fields),
+            'pagination': pagination
         }), 200
         
     except Exception as e:
@@ -114,12 +137,17 @@ def get_trip(trip_id):
     try:
         user_id = get_jwt_identity()
         
-        trip = Trip.query.filter_by(id=trip_id, user_id=user_id).first()
+        try:
+            fields = parse_fields(request.args.get('fields'), DETAIL_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        trip = with_collections(Trip.query.filter_by(id=trip_id, user_id=user_id), fields).first()
         if not trip:
             return jsonify({'error': '行程不存在'}), 404
         
         return jsonify({
-            'trip': trip.to_dict()
+            'trip': serialize_trip(trip, fields)
         }), 200
         
     except Exception as e:
@@ -266,11 +294,19 @@ def add_poi_to_trip(trip_id):
             poi.image_url = data['imageUrl']
         
         db.session.add(poi)
-        db.session.commit()
+        db.session.flush()
+        
+        # 已规划的行程只把新POI插入受影响的一天（与规划结果保存按行程串行）
+        with trip_locks.hold(trip_id):
+            day_itinerary = _insert_into_itinerary(trip, poi)
+            _bump_itinerary_version(trip_id)
+            db.session.commit()
+        index_poi(poi)
         
         return jsonify({
             'message': 'POI添加成功',
-            'poi': poi.to_dict()
+            'poi': poi.to_dict(),
+            'day_itinerary': day_itinerary.to_dict() if day_itinerary else None
         }), 201
         
     except Exception as e:
@@ -292,21 +328,207 @@ def remove_poi_from_trip(trip_id, poi_id):
         if not poi:
             return jsonify({'error': 'POI不存在'}), 404
         
-        db.session.delete(poi)
-        db.session.commit()
+        # 已规划的行程只重新计算包含该POI的一天（与规划结果保存按行程串行）
+        with trip_locks.hold(trip_id):
+            day_itinerary = _remove_from_itinerary(trip, poi)
+            db.session.delete(poi)
+            _bump_itinerary_version(trip_id)
+            db.session.commit()
+        unindex_poi(poi_id)
         
         return jsonify({
-            'message': 'POI移除成功'
+            'message': 'POI移除成功',
+            'day_itinerary': day_itinerary.to_dict() if day_itinerary else None
         }), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'移除POI失败: {str(e)}'}), 500
 
-@trips_bp.route('/<int:trip_id>/plan', methods=['POST'])
+def _poi_to_plan_data(poi):
+    """将POI模型转换为优化算法使用的格式"""
+    return {
+        'id': poi.id,
+        'name': poi.name,
+        'coordinates': {
+            'lat': poi.latitude,
+            'lng': poi.longitude
+        },
+        'suggestedDuration': poi.suggested_duration or 60,
+        'category': poi.category,
+        'openHours': poi.open_hours
+    }
+
+def _day_result_values(day_pois, day_result):
+    """单日优化结果对应的日程记录列值"""
+    return {
+        'poi_sequence': [poi['id'] for poi in day_pois],
+        'routes_data': {
+            'routes': day_result['routes']
+        },
+        'total_duration': day_result['total_duration'],
+        'total_distance': day_result['total_distance']
+    }
+
+def _apply_day_result(day_itinerary, day_pois, day_result):
+    """将单日优化结果写入日程记录"""
+    for key, value in _day_result_values(day_pois, day_result).items():
+        setattr(day_itinerary, key, value)
+
+def _day_date(trip, day):
+    """行程第day天的日期，未设置开始日期时为None"""
+    return trip.start_date + timedelta(days=day - 1) if trip.start_date else None
+
+def _trip_plan_options(trip):
+    """
+    增量规划使用的参数：与最近一次保存的规划相同，尚未规划过时取自行程设置，其余与plan_trip默认值一致
+    
+    增量规划在请求内持有行程锁执行，局部修复的总耗时不超过INCREMENTAL_PLAN_BUDGET_MS
+    """
+    options = {
+        'transport_mode': trip.transport_mode or 'driving',
+        'start_time': trip.start_time or '09:00'
+    }
+    options.update(trip.plan_options or {})
+    options['time_budget_ms'] = INCREMENTAL_PLAN_BUDGET_MS
+    return options
+
+def _load_day_plans(trip, exclude_poi_id=None):
+    """
+    读取行程已保存的日程
+    
+    Args:
+        trip: 行程
+        exclude_poi_id: 不计入日程的POI ID
+        
+    Returns:
+        (每天按顺序排列的POI数据列表, 按天索引的日程记录)，尚未规划时返回(None, {})
+    """
+    itineraries = {
+        itinerary.day: itinerary
+        # 只需要POI顺序，路线数据推迟到实际序列化时再加载解码
+        for itinerary in DayItinerary.query.options(defer(DayItinerary.routes_data))
+        .filter_by(trip_id=trip.id).all()
+    }
+    if not itineraries:
+        return None, {}
+    
+    pois_by_id = {
+        poi.id: poi for poi in POI.query.filter_by(trip_id=trip.id).all()
+        if poi.id != exclude_poi_id
+    }
+    num_days = max([trip.total_days] + list(itineraries))
+    days = []
+    for day in range(1, num_days + 1):
+        sequence = itineraries[day].get_poi_sequence() if day in itineraries else []
+        days.append([_poi_to_plan_data(pois_by_id[poi_id]) for poi_id in sequence if poi_id in pois_by_id])
+    return days, itineraries
+
+def _insert_into_itinerary(trip, poi):
+    """
+    将新POI增量插入已规划行程中的一天并更新该天的日程记录
+    
+    Returns:
+        更新的日程记录，行程尚未规划时返回None
+    """
+    days, itineraries = _load_day_plans(trip, exclude_poi_id=poi.id)
+    if days is None:
+        return None
+    
+    day_index, day_pois, day_result = RouteOptimizer().insert_poi(
+        days, _poi_to_plan_data(poi), _trip_plan_options(trip)
+    )
+    
+    day = day_index + 1
+    day_itinerary = itineraries.get(day)
+    if day_itinerary is None:
+        day_itinerary = DayItinerary(trip_id=trip.id, day=day, date=_day_date(trip, day))
+        db.session.add(day_itinerary)
+    _apply_day_result(day_itinerary, day_pois, day_result)
+    return day_itinerary
+
+def _remove_from_itinerary(trip, poi):
+    """
+    从已规划行程中移除POI并更新包含它的那一天
+    
+    Returns:
+        更新的日程记录，POI不在任何一天中或该天已无POI（记录被删除）时返回None
+    """
+    days, itineraries = _load_day_plans(trip)
+    if days is None:
+        return None
+    
+    for day_index, day_pois in enumerate(days):
+        if any(day_poi['id'] == poi.id for day_poi in day_pois):
+            break
+    else:
+        return None
+    
+    day_itinerary = itineraries[day_index + 1]
+    remaining, day_result = RouteOptimizer().remove_poi(day_pois, poi.id, _trip_plan_options(trip))
+    if not remaining:
+        db.session.delete(day_itinerary)
+        return None
+    
+    _apply_day_result(day_itinerary, remaining, day_result)
+    return day_itinerary
+
+def _bump_itinerary_version(trip_id):
+    """日程版本号加一（在SQL中自增，并发修改不会丢失），使进行中的规划任务结果过期"""
+    Trip.query.filter_by(id=trip_id).update(
+        {Trip.itinerary_version: Trip.itinerary_version + 1}, synchronize_session=False
+    )
+
+def _save_plan_result(trip_id, optimization_result, itinerary_version=None, plan_options=None):
+    """
+    保存优化后的日程安排并更新行程状态（调用方持有行程锁）
+    
+    Args:
+        trip_id: 行程ID
+        optimization_result: RouteOptimizer.optimize_trip的成功结果
+        itinerary_version: 提交规划时的日程版本号，与当前版本不一致时不保存
+        plan_options: 本次规划的参数，保存到行程供之后的增量规划使用
+        
+    Raises:
+        StalePlanResult: 规划期间行程的POI被增删
+    """
+    trip = Trip.query.get(trip_id)
+    if not trip:
+        raise ValueError('行程不存在')
+    if itinerary_version is not None and trip.itinerary_version != itinerary_version:
+        raise StalePlanResult('规划期间行程已被修改，结果未保存，请重新规划')
+    
+    # 先在事务外准备好所有行，写事务只包含一次删除、一条批量插入和状态更新
+    rows = [
+        dict(
+            _day_result_values(day_data['pois'], day_data),
+            trip_id=trip_id,
+            day=day_data['day'],
+            date=_day_date(trip, day_data['day'])
+        )
+        for day_data in optimization_result['days']
+        if day_data['pois']
+    ]
+    
+    try:
+        # 替换现有的日程安排
+        DayItinerary.query.filter_by(trip_id=trip_id).delete(synchronize_session=False)
+        if rows:
+            db.session.execute(insert(DayItinerary), rows)
+        
+        # 更新行程状态
+        trip.status = 'planned'
+        if plan_options is not None:
+            trip.plan_options = plan_options
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+@trips_bp.route('/<trip_id>/plan', methods=['POST'])
 @jwt_required()
 def plan_trip(trip_id):
-    """规划行程路线"""
+    """提交行程路线规划任务，立即返回任务ID"""
     try:
         user_id = get_jwt_identity()
         trip = Trip.query.filter_by(id=trip_id, user_id=user_id).first()
@@ -315,11 +537,36 @@ def plan_trip(trip_id):
             return jsonify({'error': '行程不存在'}), 404
         
         # 获取请求参数
-        data = request.get_json() or {}
+        data = request.get_json(silent=True) or {}
         transport_mode = data.get('transportMode', 'driving')
         daily_time_limit = data.get('dailyTimeLimit', 480)  # 默认8小时
         start_time = data.get('startTime', '09:00')
-        is_weekend = data.get('isWeekend', False)
+        try:
+            is_weekend = parse_bool(data.get('isWeekend', False), 'isWeekend')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if isinstance(daily_time_limit, bool) or not isinstance(daily_time_limit, (int, float)) \
+                or daily_time_limit <= 0:
+            return jsonify({'error': 'dailyTimeLimit必须是大于0的分钟数'}), 400
+        try:
+            parse_clock(start_time)
+        except ValueError:
+            return jsonify({'error': 'startTime格式错误，应为00:00-23:59'}), 400
+        # 请求或配置开启时返回分阶段耗时等诊断信息
+        diagnostics = bool(data.get('diagnostics')) or \
+            os.getenv('PLAN_DIAGNOSTICS', '').lower() in ('1', 'true')
+        # 优化时间预算（毫秒），到期时返回当前最好的方案
+        time_budget_ms = data.get('timeBudgetMs') or os.getenv('PLAN_TIME_BUDGET_MS') or None
+        if time_budget_ms is not None:
+            try:
+                time_budget_ms = float(time_budget_ms)
+            except (TypeError, ValueError):
+                return jsonify({'error': 'timeBudgetMs必须是数字'}), 400
+            if time_budget_ms <= 0:
+                return jsonify({'error': 'timeBudgetMs必须大于0'}), 400
+        
+        # 先记下日程版本再读取POI：此后的增删都会使本次规划结果在保存时被丢弃
+        itinerary_version = trip.itinerary_version
         
         # 获取行程的所有POI
         pois = POI.query.filter_by(trip_id=trip_id).all()
@@ -328,67 +575,56 @@ def plan_trip(trip_id):
             return jsonify({'error': '行程中没有POI'}), 400
         
         # 转换POI数据格式以供算法使用
-        poi_data = []
-        for poi in pois:
-            poi_data.append({
-                'id': poi.id,
-                'name': poi.name,
-                'coordinates': {
-                    'lat': poi.latitude,
-                    'lng': poi.longitude
-                },
-                'suggestedDuration': poi.suggested_duration or 60,
-                'category': poi.category
-            })
-        
-        # 使用路线优化算法
-        optimizer = RouteOptimizer()
-        optimization_result = optimizer.optimize_trip(
-            pois=poi_data,
-            num_days=trip.total_days,
-            daily_time_limit=daily_time_limit,
-            transport_mode=transport_mode,
-            start_time=start_time,
-            is_weekend=is_weekend
+        poi_data = [_poi_to_plan_data(poi) for poi in pois]
+        
+        # 规划参数随结果保存到行程，之后增删POI的增量规划沿用
+        plan_options = {
+            'daily_time_limit': daily_time_limit,
+            'transport_mode': transport_mode,
+            'start_time': start_time,
+            'is_weekend': is_weekend
+        }
+        options = dict(plan_options, diagnostics=diagnostics, time_budget_ms=time_budget_ms)
+        
+        # 优化在任务执行器中运行，完成后在本进程的应用上下文中保存结果
+        app = current_app._get_current_object()
+        
+        def on_success(job, optimization_result):
+            with app.app_context():
+                _save_plan_result(job.trip_id, optimization_result, itinerary_version, plan_options)
+        
+        # 相同行程和参数的规划仍在进行时复用该任务，避免重复点击和重试重复计算
+        job = get_job_manager().submit_once(
+            trip_id=trip_id,
+            user_id=user_id,
+            fn=run_plan_optimization,
+            args=(poi_data, trip.total_days, options),
+            on_success=on_success
         )
         
-        if not optimization_result['success']:
-            return jsonify({'error': optimization_result['error']}), 400
-        
-        # 清除现有的日程安排
-        DayItinerary.query.filter_by(trip_id=trip_id).delete()
-        
-        # 创建优化后的日程安排
-        for day_data in optimization_result['days']:
-            if not day_data['pois']:
-                continue
-                
-            poi_sequence = [poi['id'] for poi in day_data['pois']]
-            
-            day_itinerary = DayItinerary(
-                trip_id=trip_id,
-                day=day_data['day'],
-                date=trip.start_date + timedelta(days=day_data['day']-1) if trip.start_date else None,
-                poi_sequence=poi_sequence,
-                routes_data={
-                    'routes': day_data['routes']
-                },
-                total_duration=day_data['total_duration'],
-                total_distance=day_data['total_distance']
-            )
-            
-            db.session.add(day_itinerary)
+        return jsonify({
+            'message': '行程规划任务已提交',
+            'trip_id': trip_id,
+            'job': job
+        }), 202
         
-        # 更新行程状态
-        trip.status = 'planned'
-        db.session.commit()
+    except Exception as e:
+        return jsonify({'error': f'提交规划任务失败: {str(e)}'}), 500
+
+@trips_bp.route('/<trip_id>/plan/<job_id>', methods=['GET'])
+@jwt_required()
+def get_plan_job(trip_id, job_id):
+    """查询行程规划任务的进度和结果"""
+    try:
+        user_id = get_jwt_identity()
+        
+        job = get_job_manager().get(job_id)
+        if not job or job['trip_id'] != trip_id or job['user_id'] != user_id:
+            return jsonify({'error': '规划任务不存在'}), 404
         
         return jsonify({
-            'message': '行程规划完成',
-            'trip_id': trip_id,
-            'optimization_result': optimization_result
-        })
+            'job': job
+        }), 200
         
     except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': f'获取规划任务失败: {str(e)}'}), 500
@@ -0,0 +1 @@
+# services包初始化文件
\ No newline at end of file
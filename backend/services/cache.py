@@ -0,0 +1,202 @@
+"""
+缓存后端
+配置了REDIS_URL且Redis可连接时使用Redis在多个工作进程/节点间共享，否则退化为进程内内存缓存
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 所有缓存键的统一前缀
+KEY_PREFIX = 'travelmap:'
+
+# 内存后端的默认最大条目数
+DEFAULT_MEMORY_MAX_ENTRIES = 4096
+
+# 比较后删除的Lua脚本
+_DELETE_IF_EQUAL_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class MemoryCacheBackend:
+    """进程内缓存后端（Redis不可用时的替代实现）"""
+
+    # 数据仅在当前进程内可见
+    shared = False
+
+    def __init__(self, max_entries: int = DEFAULT_MEMORY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """读取缓存值"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[int] = None):
+        """写入缓存值"""
+        expires_at = time.monotonic() + ttl if ttl else 0.0
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, expires_at)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def set_if_absent(self, key: str, value: bytes, ttl: Optional[int] = None) -> bool:
+        """键不存在（或已过期）时写入，返回是否写入成功"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not (entry[1] and entry[1] < now):
+                return False
+            self._entries.pop(key, None)
+            self._entries[key] = (value, now + ttl if ttl else 0.0)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def delete(self, key: str):
+        """删除缓存值"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_if_equal(self, key: str, value: bytes):
+        """值仍为value时删除（只释放自己写入的键）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == value:
+                del self._entries[key]
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCacheBackend:
+    """Redis缓存后端，Redis异常时按未命中处理而不影响请求"""
+
+    # 数据在所有连接同一Redis的进程间共享
+    shared = True
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key: str) -> Optional[bytes]:
+        """读取缓存值"""
+        try:
+            return self.client.get(key)
+        except Exception as e:
+            logger.warning('Redis读取失败: %s', e)
+            return None
+
+    def set(self, key: str, value: bytes, ttl: Optional[int] = None):
+        """写入缓存值"""
+        try:
+            self.client.set(key, value, ex=ttl or None)
+        except Exception as e:
+            logger.warning('Redis写入失败: %s', e)
+
+    def set_if_absent(self, key: str, value: bytes, ttl: Optional[int] = None) -> bool:
+        """
+        键不存在时写入（SET NX），返回是否写入成功
+
+        Redis异常时返回True，退化为各进程各自执行，而不是阻塞请求
+        """
+        try:
+            return bool(self.client.set(key, value, ex=ttl or None, nx=True))
+        except Exception as e:
+            logger.warning('Redis写入失败: %s', e)
+            return True
+
+    def delete(self, key: str):
+        """删除缓存值"""
+        try:
+            self.client.delete(key)
+        except Exception as e:
+            logger.warning('Redis删除失败: %s', e)
+
+    def delete_if_equal(self, key: str, value: bytes):
+        """值仍为value时删除（只释放自己写入的键，比较和删除在Redis中原子执行）"""
+        try:
+            self.client.eval(_DELETE_IF_EQUAL_SCRIPT, 1, key, value)
+        except Exception as e:
+            logger.warning('Redis删除失败: %s', e)
+
+
+def create_cache_backend(redis_url: Optional[str] = None):
+    """
+    创建缓存后端
+
+    Args:
+        redis_url: Redis连接地址，为空时读取REDIS_URL环境变量
+
+    Returns:
+        Redis可用时返回RedisCacheBackend，否则返回MemoryCacheBackend
+    """
+    redis_url = redis_url if redis_url is not None else os.getenv('REDIS_URL')
+    if not redis_url:
+        return MemoryCacheBackend()
+
+    try:
+        import redis
+    except ImportError:
+        logger.info('未安装redis，使用进程内缓存')
+        return MemoryCacheBackend()
+
+    try:
+        client = redis.Redis.from_url(
+            redis_url,
+            socket_connect_timeout=0.2,
+            socket_timeout=0.5
+        )
+        client.ping()
+    except Exception as e:
+        logger.info('Redis不可用（%s），使用进程内缓存', e)
+        return MemoryCacheBackend()
+
+    return RedisCacheBackend(client)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_cache_backend():
+    """获取当前进程的缓存后端（首次调用时创建）"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_cache_backend()
+    return _backend
+
+
+def set_cache_backend(backend):
+    """
+    替换当前进程的缓存后端
+
+    Args:
+        backend: 新的缓存后端，为None时下次使用时重新创建
+    """
+    global _backend
+    with _backend_lock:
+        _backend = backend
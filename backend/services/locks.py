@@ -0,0 +1,90 @@
+"""
+按键加锁
+同一键（如行程ID）的操作串行执行，不同键互不影响；锁在无人持有时自动回收。
+配置了共享缓存（Redis）时，进程内加锁后再获取带租期的跨进程锁，多个工作进程之间同样串行
+"""
+
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Hashable, List, Optional
+
+from services.cache import KEY_PREFIX, get_cache_backend
+
+# 跨进程锁的租期（秒），持有者异常退出时到期自动释放
+SHARED_LOCK_TTL = int(os.getenv('SHARED_LOCK_TTL', 60))
+
+# 等待跨进程锁的最长时间（秒）
+SHARED_LOCK_WAIT = float(os.getenv('SHARED_LOCK_WAIT', 15))
+
+
+class KeyedLocks:
+    """按键分配的互斥锁集合"""
+
+    def __init__(self, namespace: Optional[str] = None):
+        """
+        Args:
+            namespace: 跨进程锁的键前缀，为空时只在进程内加锁
+        """
+        self.namespace = namespace
+        self._locks: Dict[Hashable, List] = {}
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def hold(self, key: Hashable):
+        """
+        持有指定键的锁
+
+        Args:
+            key: 锁的键
+
+        Raises:
+            TimeoutError: 等待跨进程锁超时
+        """
+        with self._guard:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+
+        try:
+            with entry[0]:
+                with self._hold_shared(key):
+                    yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    @contextmanager
+    def _hold_shared(self, key: Hashable):
+        """在共享缓存中获取跨进程锁（SET NX加租期），释放时只删除自己持有的锁"""
+        backend = get_cache_backend()
+        if self.namespace is None or not backend.shared:
+            yield
+            return
+
+        lock_key = f'{KEY_PREFIX}lock:{self.namespace}:{key}'
+        token = uuid.uuid4().hex.encode('utf-8')
+        deadline = time.monotonic() + SHARED_LOCK_WAIT
+        delay = 0.01
+        while not backend.set_if_absent(lock_key, token, SHARED_LOCK_TTL):
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f'等待锁超时: {key}')
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+
+        try:
+            yield
+        finally:
+            backend.delete_if_equal(lock_key, token)
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+# 行程日程写入锁：整体规划结果保存与增量增删POI按行程串行（跨工作进程）
+trip_locks = KeyedLocks(namespace='trip')
@@ -0,0 +1,89 @@
+"""
+游标分页
+按(updated_at, id)降序的键集分页：每页只扫描索引中游标之后的per_page + 1行，翻页深度不影响查询代价
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+# 游标格式版本，变更排序键时递增以拒绝旧游标
+CURSOR_VERSION = 1
+
+
+def encode_cursor(updated_at: datetime, row_id: str) -> str:
+    """
+    将排序键编码为不透明的游标
+
+    Args:
+        updated_at: 最后一行的更新时间
+        row_id: 最后一行的ID
+
+    Returns:
+        URL安全的游标字符串
+    """
+    payload = [CURSOR_VERSION, updated_at.isoformat(), row_id]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    解码游标
+
+    Args:
+        cursor: encode_cursor生成的游标
+
+    Returns:
+        (更新时间, ID)
+
+    Raises:
+        ValueError: 游标格式无效
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        version, updated_at, row_id = json.loads(raw.decode('utf-8'))
+        if version != CURSOR_VERSION or not isinstance(row_id, str):
+            raise ValueError
+        return datetime.fromisoformat(updated_at), row_id
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError('无效的分页游标')
+
+
+def keyset_page(query, model, per_page: int, cursor: Optional[str] = None) -> Tuple[List[Any], Optional[str]]:
+    """
+    按(updated_at DESC, id DESC)取一页数据
+
+    同一时间戳内按ID排序保证翻页稳定；updated_at由模型默认值保证非空，
+    按用户（及状态）过滤后，排序和游标条件都可以直接走行程表的复合索引。
+
+    Args:
+        query: 已添加过滤条件的查询
+        model: 含updated_at和id列的模型
+        per_page: 每页数量
+        cursor: 上一页返回的游标，为空时取第一页
+
+    Returns:
+        (当前页数据, 下一页游标；没有下一页时为None)
+
+    Raises:
+        ValueError: 游标格式无效
+    """
+    if cursor:
+        updated_at, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            model.updated_at < updated_at,
+            and_(model.updated_at == updated_at, model.id < row_id)
+        ))
+
+    rows = query.order_by(model.updated_at.desc(), model.id.desc()).limit(per_page + 1).all()
+
+    if len(rows) <= per_page:
+        return rows, None
+    rows = rows[:per_page]
+    last = rows[-1]
+    return rows, encode_cursor(last.updated_at, last.id)
@@ -0,0 +1,152 @@
+"""
+行程规划结果缓存
+按POI坐标、停留时长、类别及规划参数的规范化哈希缓存optimize_trip结果
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Tuple
+
+from services.cache import KEY_PREFIX, get_cache_backend
+
+# 规划结果默认缓存时间（秒）
+PLAN_CACHE_TTL = int(os.getenv('PLAN_CACHE_TTL', 6 * 60 * 60))
+
+# 缓存格式版本，结果结构或算法变化时递增使旧缓存失效
+PLAN_CACHE_VERSION = 2
+
+# 参与缓存键计算的POI字段（不含id、名称等不影响规划的字段）
+_POI_KEY_FIELDS = ('suggestedDuration', 'customDuration', 'category', 'openHours')
+
+
+def _poi_signature(poi: Dict) -> Tuple:
+    """POI在规划中有意义的属性，用于排序和生成缓存键"""
+    coordinates = poi['coordinates']
+    return (
+        round(float(coordinates['lat']), 6),
+        round(float(coordinates['lng']), 6),
+    ) + tuple(str(poi.get(field) or '') for field in _POI_KEY_FIELDS)
+
+
+def canonicalize_pois(pois: List[Dict]) -> List[Dict]:
+    """
+    按POI签名排序，使相同POI集合无论输入顺序如何都得到相同的规划
+
+    Args:
+        pois: POI列表
+
+    Returns:
+        排序后的POI列表
+    """
+    return sorted(pois, key=_poi_signature)
+
+
+def plan_cache_key(pois: List[Dict], num_days: int, **params) -> str:
+    """
+    生成规划结果的规范化缓存键
+
+    Args:
+        pois: 已规范化排序的POI列表
+        num_days: 天数
+        **params: 传给optimize_trip的其他参数
+
+    Returns:
+        缓存键
+    """
+    payload = {
+        'version': PLAN_CACHE_VERSION,
+        'pois': [_poi_signature(poi) for poi in pois],
+        'num_days': num_days,
+        'params': params
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    digest = hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}plan:{digest}'
+
+
+def _to_template(result: Dict[str, Any], pois: List[Dict]) -> Dict[str, Any]:
+    """将结果中的POI替换为索引，使缓存与POI的id、名称无关"""
+    index_of = {id(poi): index for index, poi in enumerate(pois)}
+    days = []
+    for day in result['days']:
+        day = dict(day)
+        day['pois'] = [index_of[id(poi)] for poi in day['pois']]
+        day['routes'] = [
+            {k: v for k, v in route.items() if k not in ('from_poi_id', 'to_poi_id')}
+            for route in day['routes']
+        ]
+        days.append(day)
+    template = dict(result)
+    template['days'] = days
+    # 诊断信息只描述本次计算，不随缓存返回
+    template.pop('diagnostics', None)
+    return template
+
+
+def _from_template(template: Dict[str, Any], pois: List[Dict]) -> Dict[str, Any]:
+    """使用调用方的POI还原缓存的结果"""
+    days = []
+    for day in template['days']:
+        day = dict(day)
+        day_pois = [pois[index] for index in day['pois']]
+        day['pois'] = day_pois
+        day['routes'] = [
+            dict(route, from_poi_id=day_pois[i]['id'], to_poi_id=day_pois[i + 1]['id'])
+            for i, route in enumerate(day['routes'])
+        ]
+        days.append(day)
+    result = dict(template)
+    result['days'] = days
+    return result
+
+
+def cached_optimize_trip(optimizer, pois: List[Dict], num_days: int, **params) -> Dict[str, Any]:
+    """
+    带缓存的行程优化，未变化的行程重新规划时直接返回缓存结果
+
+    Args:
+        optimizer: RouteOptimizer实例
+        pois: POI列表
+        num_days: 天数
+        **params: 传给optimize_trip的其他参数（diagnostics和time_budget_ms不参与缓存键）
+
+    Returns:
+        优化结果，命中缓存时包含'cached': True
+    """
+    started = time.perf_counter()
+    pois = canonicalize_pois(pois)
+    diagnostics = params.pop('diagnostics', False)
+    time_budget_ms = params.pop('time_budget_ms', None)
+    key = plan_cache_key(pois, num_days, distance_mode=optimizer.distance_mode, **params)
+
+    backend = get_cache_backend()
+    blob = backend.get(key)
+    if blob is not None:
+        try:
+            result = _from_template(json.loads(blob), pois)
+            result['cached'] = True
+            if diagnostics:
+                result['diagnostics'] = {
+                    'phases': {'plan_cache_ms': round((time.perf_counter() - started) * 1000, 3)},
+                    'days': []
+                }
+            return result
+        except (ValueError, KeyError, IndexError, TypeError):
+            backend.delete(key)
+
+    lookup_ms = (time.perf_counter() - started) * 1000
+    result = optimizer.optimize_trip(pois=pois, num_days=num_days, diagnostics=diagnostics,
+                                     time_budget_ms=time_budget_ms, **params)
+    if 'diagnostics' in result:
+        result['diagnostics']['phases']['plan_cache_ms'] = round(lookup_ms, 3)
+
+    # 只缓存成功且完整的结果，时间预算内未完成优化的结果不缓存
+    if result.get('success'):
+        if not result['summary'].get('best_effort'):
+            template = _to_template(result, pois)
+            backend.set(key, json.dumps(template, ensure_ascii=False).encode('utf-8'), PLAN_CACHE_TTL)
+        result['cached'] = False
+
+    return result
@@ -0,0 +1,406 @@
+"""
+异步规划任务
+将CPU密集的行程优化放到独立的进程池中执行，请求线程只负责入队并返回任务ID
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from algorithms.diagnostics import emit_diagnostics
+from services.cache import KEY_PREFIX, get_cache_backend
+from services.locks import trip_locks
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SAVING = 'saving'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+# 各状态对应的进度（百分比）
+JOB_PROGRESS = {
+    JOB_QUEUED: 0,
+    JOB_RUNNING: 10,
+    JOB_SAVING: 90,
+    JOB_SUCCEEDED: 100,
+    JOB_FAILED: 100
+}
+
+# 已结束任务的保留时间（秒）
+JOB_RETENTION_SECONDS = int(os.getenv('PLAN_JOB_RETENTION', 60 * 60))
+
+# 保存规划结果的线程数
+PLAN_SAVE_WORKERS = int(os.getenv('PLAN_SAVE_WORKERS', 2))
+
+
+def run_plan_optimization(pois: List[Dict], num_days: int, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    在工作进程中执行行程优化（模块级函数，便于进程池序列化）
+
+    Args:
+        pois: POI列表
+        num_days: 天数
+        options: 传给optimize_trip的参数
+
+    Returns:
+        优化结果
+    """
+    from algorithms.route_optimizer import RouteOptimizer
+    from services.plan_cache import cached_optimize_trip
+
+    return cached_optimize_trip(RouteOptimizer(), pois=pois, num_days=num_days, **options)
+
+
+class StalePlanResult(Exception):
+    """规划期间行程已被修改，结果不再适用（由保存回调抛出，任务以失败结束且不记录异常堆栈）"""
+
+
+class PlanJob:
+    """规划任务"""
+
+    def __init__(self, trip_id: str, user_id: str, request_key: Optional[str] = None):
+        self.id = str(uuid.uuid4())
+        self.trip_id = trip_id
+        self.user_id = user_id
+        self.request_key = request_key
+        self.coalesced = 0
+        self.status = JOB_QUEUED
+        self.error = None
+        self.result = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future: Optional[Future] = None
+
+    @property
+    def finished(self) -> bool:
+        """任务是否已结束"""
+        return self.status in (JOB_SUCCEEDED, JOB_FAILED)
+
+    def current_status(self) -> str:
+        """结合Future状态返回当前任务状态"""
+        if self.status == JOB_QUEUED and self.future is not None and self.future.running():
+            return JOB_RUNNING
+        return self.status
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        status = self.current_status()
+        data = {
+            'job_id': self.id,
+            'trip_id': self.trip_id,
+            'user_id': self.user_id,
+            'status': status,
+            'progress': JOB_PROGRESS[status],
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'coalesced_requests': self.coalesced
+        }
+        if self.error:
+            data['error'] = self.error
+        if self.result is not None:
+            data['optimization_result'] = self.result
+        return data
+
+
+class InlineExecutor(Executor):
+    """在调用线程中同步执行的执行器（调试和测试用）"""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def create_executor(kind: str, max_workers: int) -> Executor:
+    """
+    创建任务执行器
+
+    Args:
+        kind: 'process'（默认，进程池）、'thread'（线程池）或'inline'（同步执行）
+        max_workers: 最大并发任务数
+
+    Returns:
+        执行器
+    """
+    if kind == 'inline':
+        return InlineExecutor()
+    if kind == 'thread':
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='plan-job')
+    if kind == 'process':
+        # 使用spawn避免复制父进程中的数据库连接和线程状态
+        return ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    raise ValueError(f'不支持的任务执行器类型: {kind}')
+
+
+class PlanJobManager:
+    """规划任务管理器：提交任务、跟踪状态并在完成后回调保存结果"""
+
+    def __init__(self, executor: Executor, completion_executor: Optional[Executor] = None):
+        """
+        Args:
+            executor: 运行优化的执行器
+            completion_executor: 运行结果保存等完成处理的执行器，默认为小线程池；
+                完成处理会等待行程锁和写数据库，不能在执行器的回调线程中进行，否则会阻塞其他任务的完成通知
+        """
+        self.executor = executor
+        self.completion_executor = completion_executor or ThreadPoolExecutor(
+            max_workers=PLAN_SAVE_WORKERS, thread_name_prefix='plan-save'
+        )
+        self._jobs: Dict[str, PlanJob] = {}
+        self._inflight: Dict[str, PlanJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, trip_id: str, user_id: str, fn: Callable, args: tuple,
+               on_success: Optional[Callable[[PlanJob, Dict[str, Any]], None]] = None) -> PlanJob:
+        """
+        提交规划任务
+
+        Args:
+            trip_id: 行程ID
+            user_id: 用户ID
+            fn: 在执行器中运行的函数（进程池时须为模块级函数）
+            args: 函数参数
+            on_success: 优化成功后在当前进程中调用的回调，用于保存结果
+
+        Returns:
+            规划任务
+        """
+        self._prune()
+
+        job = PlanJob(trip_id, user_id)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._start(job, fn, args, on_success)
+        return job
+
+    def submit_once(self, trip_id: str, user_id: str, fn: Callable, args: tuple,
+                    on_success: Optional[Callable[[PlanJob, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        提交规划任务，相同行程和参数的任务仍在进行时直接复用该任务（单飞合并）
+
+        重复点击或重试产生的并发请求共享同一次计算和结果，不会重复优化和写入日程。
+        配置了共享缓存时，其他工作进程中进行中的相同任务也会被复用。
+
+        Args:
+            trip_id: 行程ID
+            user_id: 用户ID
+            fn: 在执行器中运行的函数（进程池时须为模块级函数）
+            args: 函数参数
+            on_success: 优化成功后在当前进程中调用的回调，用于保存结果
+
+        Returns:
+            任务字典，复用已有任务时包含'coalesced': True
+        """
+        self._prune()
+        key = self._request_key(trip_id, fn, args)
+
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is not None:
+                job.coalesced += 1
+                return dict(job.to_dict(), coalesced=True)
+
+            job = PlanJob(trip_id, user_id, request_key=key)
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+
+        # 多个工作进程同时提交时，只有原子写入合并键成功的一方执行，其余复用它的任务；
+        # 先发布任务状态，其他进程读到登记时能查到该任务
+        self._publish(job)
+        shared = self._claim_shared(key, job)
+        if shared is not None:
+            with self._lock:
+                del self._jobs[job.id]
+                del self._inflight[key]
+            get_cache_backend().delete(self._cache_key(job.id))
+            return dict(shared, coalesced=True)
+
+        self._start(job, fn, args, on_success)
+        return dict(job.to_dict(), coalesced=False)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取任务状态，本进程中没有时从共享缓存读取（多工作进程部署）
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            任务字典，不存在时返回None
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+
+        blob = get_cache_backend().get(self._cache_key(job_id))
+        if blob is None:
+            return None
+        return json.loads(blob)
+
+    def _start(self, job: PlanJob, fn: Callable, args: tuple,
+               on_success: Optional[Callable[[PlanJob, Dict[str, Any]], None]]):
+        """发布任务状态并提交到执行器"""
+        self._publish(job)
+        job.future = self.executor.submit(fn, *args)
+        # 回调只把完成处理交给保存线程池，立即返回
+        job.future.add_done_callback(
+            lambda future: self.completion_executor.submit(self._complete, job, future, on_success)
+        )
+
+    def _claim_shared(self, key: str, job: PlanJob) -> Optional[Dict[str, Any]]:
+        """
+        在共享缓存中原子地登记进行中的任务（SET NX），调用前任务状态须已发布
+
+        Returns:
+            登记失败时返回其他工作进程中进行中的相同任务，登记成功（或未配置共享缓存）时返回None
+        """
+        backend = get_cache_backend()
+        if not backend.shared:
+            return None
+
+        inflight_key = self._inflight_key(key)
+        for _ in range(3):
+            if backend.set_if_absent(inflight_key, job.id.encode('utf-8'), JOB_RETENTION_SECONDS):
+                return None
+            owner = backend.get(inflight_key)
+            if owner is None:
+                continue
+            shared = self.get(owner.decode('utf-8'))
+            if shared is not None and shared['status'] not in (JOB_SUCCEEDED, JOB_FAILED):
+                return shared
+            # 登记的任务已结束或状态已过期（持有进程异常退出），只删除这条过期登记后重试
+            backend.delete_if_equal(inflight_key, owner)
+
+        # 登记反复被抢占时直接执行，最多多算一次
+        return None
+
+    def _release(self, job: PlanJob):
+        """任务结束后不再参与合并"""
+        if job.request_key is None:
+            return
+        with self._lock:
+            if self._inflight.get(job.request_key) is job:
+                del self._inflight[job.request_key]
+        backend = get_cache_backend()
+        if backend.shared:
+            backend.delete_if_equal(self._inflight_key(job.request_key), job.id.encode('utf-8'))
+
+    def _complete(self, job: PlanJob, future: Future,
+                  on_success: Optional[Callable[[PlanJob, Dict[str, Any]], None]]):
+        """任务执行结束后的处理"""
+        try:
+            result = future.result()
+            if not result.get('success'):
+                job.status = JOB_FAILED
+                job.error = result.get('error', '路线优化失败')
+            else:
+                job.status = JOB_SAVING
+                self._publish(job)
+                if on_success is not None:
+                    saving_started = time.perf_counter()
+                    # 同一行程的日程写入串行执行
+                    with trip_locks.hold(job.trip_id):
+                        on_success(job, result)
+                    if 'diagnostics' in result:
+                        result['diagnostics']['phases']['save_ms'] = round(
+                            (time.perf_counter() - saving_started) * 1000, 3
+                        )
+                job.result = result
+                job.status = JOB_SUCCEEDED
+        except StalePlanResult as e:
+            logger.info('规划任务%s的结果已过期: %s', job.id, e)
+            job.status = JOB_FAILED
+            job.error = str(e)
+        except Exception as e:
+            logger.exception('规划任务%s失败', job.id)
+            job.status = JOB_FAILED
+            job.error = str(e)
+
+        job.finished_at = time.time()
+        self._release(job)
+
+        diagnostics = job.result.get('diagnostics') if job.result is not None else None
+        if diagnostics is not None:
+            # 包含排队、优化和保存的端到端耗时
+            diagnostics['phases']['job_ms'] = round((job.finished_at - job.created_at) * 1000, 3)
+            diagnostics['cached'] = job.result.get('cached', False)
+
+        self._publish(job)
+
+        if diagnostics is not None:
+            emit_diagnostics(logger, 'plan_job_finished', diagnostics,
+                             job_id=job.id, trip_id=job.trip_id)
+
+    def _publish(self, job: PlanJob):
+        """将任务状态写入共享缓存，使其他工作进程也能查询"""
+        get_cache_backend().set(
+            self._cache_key(job.id),
+            json.dumps(job.to_dict(), ensure_ascii=False).encode('utf-8'),
+            JOB_RETENTION_SECONDS
+        )
+
+    def _prune(self):
+        """清理超过保留时间的已结束任务"""
+        expire_before = time.time() - JOB_RETENTION_SECONDS
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished and job.finished_at < expire_before
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    @staticmethod
+    def _cache_key(job_id: str) -> str:
+        return f'{KEY_PREFIX}plan-job:{job_id}'
+
+    @staticmethod
+    def _inflight_key(request_key: str) -> str:
+        return f'{KEY_PREFIX}plan-inflight:{request_key}'
+
+    @staticmethod
+    def _request_key(trip_id: str, fn: Callable, args: tuple) -> str:
+        """按行程、任务函数和参数生成合并键"""
+        payload = json.dumps(
+            [trip_id, f'{fn.__module__}.{fn.__qualname__}', args],
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> PlanJobManager:
+    """获取当前进程的规划任务管理器（首次调用时按环境变量创建执行器）"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                kind = os.getenv('PLAN_JOB_EXECUTOR', 'process')
+                executor = create_executor(
+                    kind,
+                    int(os.getenv('PLAN_JOB_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+                )
+                # 同步执行模式下结果也在调用线程中保存，请求返回时任务已经结束
+                _manager = PlanJobManager(executor, InlineExecutor() if kind == 'inline' else None)
+    return _manager
@@ -0,0 +1,505 @@
+"""
+POI索引服务
+每个工作进程从内置POI目录和POI表构建一份网格空间索引、全文索引和地图聚合索引，新建/删除的POI增量更新。
+索引只在首次使用和目录重新构建后完整构建；到期后由后台线程只同步POI表的变化（其他工作进程写入的POI），不阻塞请求。
+目录记录占据位置0..C-1，按需从内存映射文件读取，不在进程内复制
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+from flask import Flask, current_app
+
+from algorithms.cluster_index import ClusterIndex
+from algorithms.spatial_index import EARTH_RADIUS_M, SpatialIndex
+from algorithms.text_search import FIELD_WEIGHTS, TextIndex, name_has_prefix
+from catalog.store import Catalog, get_catalog
+from database import db
+from models.trip import POI
+
+logger = logging.getLogger(__name__)
+
+# 索引刷新间隔（秒），到期后从POI表同步其他工作进程写入的POI
+POI_INDEX_TTL = int(os.getenv('POI_INDEX_TTL', 300))
+
+# 后台刷新失败后的重试间隔（秒）
+REFRESH_RETRY_DELAY = 30
+
+# 增量新增的POI超过该数量时合并进网格索引
+PENDING_REBUILD_THRESHOLD = 2048
+
+# 搜索时先取limit的若干倍候选再按名称前缀和位置重新排序
+RERANK_FACTOR = 5
+RERANK_MIN = 100
+
+# 名称以查询词开头时的得分倍数
+PREFIX_BOOST = 1.5
+
+# 位置加权：查询点处得分乘以(1 + GEO_BOOST)，到半径边界线性降为1
+GEO_BOOST = 1.0
+
+
+def poi_record(poi: POI) -> Dict:
+    """
+    POI的公开字段（不含所属行程等用户信息）
+
+    Args:
+        poi: POI模型
+
+    Returns:
+        与POI.to_dict字段命名一致的字典
+    """
+    return {
+        'id': poi.id,
+        'name': poi.name,
+        'coordinates': {
+            'lat': poi.latitude,
+            'lng': poi.longitude
+        },
+        'address': poi.address,
+        'category': poi.category,
+        'description': poi.description,
+        'openHours': poi.open_hours,
+        'suggestedDuration': poi.suggested_duration,
+        'imageUrl': poi.image_url
+    }
+
+
+def load_poi_records() -> List[Dict]:
+    """
+    从POI表读取索引记录；同名同坐标的POI（多个行程各自保存的同一地点）只保留一条
+
+    Returns:
+        POI记录列表
+    """
+    columns = (POI.id, POI.name, POI.latitude, POI.longitude, POI.address, POI.category,
+               POI.description, POI.open_hours, POI.suggested_duration, POI.image_url)
+    records = []
+    seen = set()
+    for row in db.session.query(*columns).order_by(POI.created_at).yield_per(10000):
+        key = (row.name, round(row.latitude, 5), round(row.longitude, 5))
+        if key in seen:
+            continue
+        seen.add(key)
+        records.append(poi_record(row))
+    return records
+
+
+def _place_keys(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """坐标保留5位小数（约1米）后编码为整数，用于判断同一地点"""
+    rows = np.round((np.asarray(lats, dtype=np.float64) + 90.0) * 1e5).astype(np.int64)
+    cols = np.round((np.asarray(lngs, dtype=np.float64) + 180.0) * 1e5).astype(np.int64)
+    return rows * 36000001 + cols
+
+
+class _IndexedRecords:
+    """按位置顺序排列的目录记录和POI表记录，供全文索引构建使用；目录部分只读取检索字段"""
+
+    def __init__(self, index: 'PoiIndex'):
+        self.index = index
+
+    def __len__(self) -> int:
+        return self.index.catalog_size + len(self.index.records)
+
+    def __iter__(self):
+        if self.index.catalog_size:
+            yield from self.index.catalog.iter_fields([field for field, _ in FIELD_WEIGHTS])
+        yield from self.index.records
+
+
+class PoiIndex:
+    """POI记录及其空间索引、全文索引和聚合索引；记录位置同时作为各索引的文档ID，增删和查询通过同一把锁互斥"""
+
+    def __init__(self, records: List[Dict], catalog: Optional[Catalog] = None):
+        """
+        构建索引
+
+        Args:
+            records: POI表记录（含coordinates、category及文本字段）
+            catalog: 内置POI目录，与其中同名同坐标的POI表记录不重复索引
+        """
+        self.catalog = catalog
+        self.catalog_size = len(catalog) if catalog is not None else 0
+        # 目录各行的类别，合并增量时重建网格索引使用
+        self._catalog_categories = catalog.categories() if self.catalog_size else []
+        # 目录坐标键的排序（首次去重时计算）
+        self._catalog_places = None
+        records = list(records)
+        if self.catalog_size and records:
+            records = self._without_catalog_duplicates(records)
+
+        # POI表及增量记录，位置从catalog_size开始
+        self.records = records
+        self.positions = {record['id']: self.catalog_size + offset for offset, record in enumerate(records)}
+        lats = [record['coordinates']['lat'] for record in records]
+        lngs = [record['coordinates']['lng'] for record in records]
+        categories = [record.get('category') for record in records]
+        if self.catalog_size:
+            lats = np.concatenate([catalog.lat, np.asarray(lats, dtype=np.float64)])
+            lngs = np.concatenate([catalog.lng, np.asarray(lngs, dtype=np.float64)])
+            categories = self._catalog_categories + categories
+        self.spatial = SpatialIndex(lats, lngs, categories)
+        self.clustering = ClusterIndex(lats, lngs)
+        self.text = TextIndex(_IndexedRecords(self))
+        # 构建时的记录中已删除或被替换的位置
+        self.removed = np.zeros(self.catalog_size + len(records), dtype=bool)
+        self.has_removed = False
+        # 构建后新增的记录（ID -> 位置），在合并进网格前线性扫描
+        self.pending: Dict[str, int] = {}
+        self.refreshed_at = time.monotonic()
+        # 同步POI表期间经add/remove变更的ID，同步时以增量结果为准
+        self._touched: Optional[set] = None
+        self._lock = threading.Lock()
+
+    def _catalog_duplicates(self, records: List[Dict]) -> List[bool]:
+        """每条记录是否与目录中的某条同名同坐标（从目录加入行程的POI）"""
+        if self._catalog_places is None:
+            catalog_keys = _place_keys(self.catalog.lat, self.catalog.lng)
+            order = np.argsort(catalog_keys, kind='stable')
+            self._catalog_places = (order, catalog_keys[order])
+        order, sorted_keys = self._catalog_places
+
+        keys = _place_keys([record['coordinates']['lat'] for record in records],
+                           [record['coordinates']['lng'] for record in records])
+        starts = np.searchsorted(sorted_keys, keys, side='left')
+        ends = np.searchsorted(sorted_keys, keys, side='right')
+        return [
+            record['name'] in {self.catalog.record(int(row))['name'] for row in order[start:end]}
+            for record, start, end in zip(records, starts.tolist(), ends.tolist())
+        ]
+
+    def _without_catalog_duplicates(self, records: List[Dict]) -> List[Dict]:
+        """去掉与目录重复的记录"""
+        return [record for record, duplicate in zip(records, self._catalog_duplicates(records)) if not duplicate]
+
+    def record(self, position: int) -> Dict:
+        """按位置读取记录"""
+        if position < self.catalog_size:
+            return self.catalog.record(position)
+        return self.records[position - self.catalog_size]
+
+    def catalog_changed(self) -> bool:
+        """目录是否已重新构建（需要完整重建索引）"""
+        return get_catalog() is not self.catalog
+
+    def refresh_due(self) -> bool:
+        """是否超过刷新间隔或积累了过多未合并进网格索引的增量"""
+        return (time.monotonic() - self.refreshed_at > POI_INDEX_TTL
+                or len(self.pending) > PENDING_REBUILD_THRESHOLD)
+
+    def fragmented(self) -> bool:
+        """已失效的POI表记录是否多于有效记录（需要完整重建以回收）"""
+        dead = len(self.records) - len(self.positions)
+        return dead > max(len(self.positions), PENDING_REBUILD_THRESHOLD)
+
+    def _discard(self, poi_id: str):
+        """使已有记录失效（调用方持有锁）"""
+        if self._touched is not None:
+            self._touched.add(poi_id)
+        position = self.positions.pop(poi_id, None)
+        if position is None:
+            return
+        if position < len(self.removed):
+            self.removed[position] = True
+            self.has_removed = True
+        self.pending.pop(poi_id, None)
+        self.text.remove(position)
+        self.clustering.remove(position)
+
+    def add(self, record: Dict):
+        """增量加入或替换一个POI；与目录重复的记录按重建时的规则不加入"""
+        duplicate = bool(self.catalog_size) and self._catalog_duplicates([record])[0]
+        with self._lock:
+            self._discard(record['id'])
+            if not duplicate:
+                self._append(record)
+
+    def _append(self, record: Dict):
+        """追加一条记录，在合并进网格索引前放入增量（调用方持有锁）"""
+        position = self.catalog_size + len(self.records)
+        self.records.append(record)
+        self.positions[record['id']] = position
+        self.pending[record['id']] = position
+        self.text.add(position, record)
+        self.clustering.add(position, record['coordinates']['lat'], record['coordinates']['lng'])
+
+    def remove(self, poi_id: str):
+        """删除一个POI"""
+        with self._lock:
+            self._discard(poi_id)
+
+    def refresh(self, load: Callable[[], List[Dict]]):
+        """
+        与POI表同步：只增删与索引中不同的记录，目录部分不重新构建；增量过多时合并进网格索引
+
+        同步期间经add/remove变更的POI以增量结果为准，不被读取时的旧数据覆盖。
+
+        Args:
+            load: 读取POI表记录的函数
+        """
+        with self._lock:
+            self._touched = set()
+        try:
+            records = list(load())
+            if self.catalog_size and records:
+                records = self._without_catalog_duplicates(records)
+        except Exception:
+            with self._lock:
+                self._touched = None
+            raise
+
+        latest = {record['id']: record for record in records}
+        with self._lock:
+            touched, self._touched = self._touched, None
+            for poi_id in [poi_id for poi_id in self.positions if poi_id not in latest]:
+                if poi_id not in touched:
+                    self._discard(poi_id)
+            for poi_id, record in latest.items():
+                position = self.positions.get(poi_id)
+                if poi_id in touched or (position is not None and self.record(position) == record):
+                    continue
+                self._discard(poi_id)
+                self._append(record)
+            self.refreshed_at = time.monotonic()
+
+        if len(self.pending) > PENDING_REBUILD_THRESHOLD:
+            self._merge_pending()
+
+    def _merge_pending(self):
+        """将增量记录合并进网格索引；全文索引和聚合索引本身支持增量，只重建网格索引"""
+        with self._lock:
+            records = self.records[:]
+        lats = np.array([record['coordinates']['lat'] for record in records], dtype=np.float64)
+        lngs = np.array([record['coordinates']['lng'] for record in records], dtype=np.float64)
+        categories = [record.get('category') for record in records]
+        if self.catalog_size:
+            lats = np.concatenate([self.catalog.lat, lats])
+            lngs = np.concatenate([self.catalog.lng, lngs])
+            categories = self._catalog_categories + categories
+        spatial = SpatialIndex(lats, lngs, categories)
+
+        size = self.catalog_size + len(records)
+        with self._lock:
+            removed = np.ones(size, dtype=bool)
+            removed[:self.catalog_size] = False
+            live = [position for position in self.positions.values() if position < size]
+            removed[live] = False
+            self.spatial = spatial
+            self.removed = removed
+            self.has_removed = bool(removed.any())
+            self.pending = {poi_id: position for poi_id, position in self.pending.items() if position >= size}
+
+    def _distances(self, lat: float, lng: float, records: List[Dict]) -> np.ndarray:
+        """查询点到记录的Haversine距离（米）"""
+        coords = np.radians([[record['coordinates']['lat'], record['coordinates']['lng']] for record in records])
+        lat_rad, lng_rad = np.radians(lat), np.radians(lng)
+        h = (np.sin((coords[:, 0] - lat_rad) / 2) ** 2
+             + np.cos(lat_rad) * np.cos(coords[:, 0]) * np.sin((coords[:, 1] - lng_rad) / 2) ** 2)
+        return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+    def _pending_matches(self, lat: float, lng: float, radius_m: float,
+                         categories: Optional[Iterable[str]]) -> List[tuple]:
+        """增量POI中半径内的(距离, 记录)（调用方持有锁）"""
+        pending = [self.record(position) for position in self.pending.values()]
+        if categories:
+            categories = set(categories)
+            pending = [record for record in pending if record.get('category') in categories]
+        if not pending:
+            return []
+
+        distances = self._distances(lat, lng, pending)
+        return [(distance, record) for distance, record in zip(distances.tolist(), pending)
+                if distance <= radius_m]
+
+    def nearby(self, lat: float, lng: float, radius_m: float,
+               categories: Optional[Iterable[str]] = None,
+               limit: int = 50, k: Optional[int] = None) -> List[Dict]:
+        """
+        附近POI查询
+
+        Args:
+            lat: 查询点纬度
+            lng: 查询点经度
+            radius_m: 半径（米）；k近邻模式下为最大搜索半径
+            categories: 只返回这些类别
+            limit: 半径模式下最多返回的数量
+            k: 指定时按k近邻返回
+
+        Returns:
+            按距离升序的POI记录，附带distance（米）
+        """
+        categories = list(categories) if categories else None
+        count = k if k is not None else limit
+        with self._lock:
+            exclude = self.removed if self.has_removed else None
+            if k is not None:
+                positions, distances = self.spatial.nearest(lat, lng, k, categories, radius_m, exclude)
+            else:
+                positions, distances = self.spatial.query_radius(lat, lng, radius_m, categories, limit, exclude)
+
+            matches = [(distance, self.record(position))
+                       for position, distance in zip(positions.tolist(), distances.tolist())]
+            if self.pending:
+                matches.extend(self._pending_matches(lat, lng, radius_m, categories))
+        if len(matches) > len(positions):
+            matches.sort(key=lambda match: match[0])
+
+        return [dict(record, distance=round(distance)) for distance, record in matches[:count]]
+
+    def search(self, query: str, limit: int = 20, lat: Optional[float] = None,
+               lng: Optional[float] = None, radius_m: Optional[float] = None) -> List[Dict]:
+        """
+        关键词搜索
+
+        先按BM25取候选，再对名称以查询词开头的结果加权；给出位置时，
+        半径内的结果按距离线性加权（中心处得分翻倍），半径外不加权。
+
+        Args:
+            query: 查询文本
+            limit: 返回数量
+            lat: 用户位置纬度
+            lng: 用户位置经度
+            radius_m: 位置加权的半径（米）
+
+        Returns:
+            按得分降序的POI记录，附带score，给出位置时附带distance（米）
+        """
+        with self._lock:
+            docs, scores = self.text.search(query, max(limit * RERANK_FACTOR, RERANK_MIN))
+            records = [self.record(doc) for doc in docs.tolist()]
+        if not records:
+            return []
+
+        scores = scores.copy()
+        scores *= np.array([PREFIX_BOOST if name_has_prefix(record.get('name'), query) else 1.0
+                            for record in records])
+
+        distances = None
+        if lat is not None and lng is not None:
+            distances = self._distances(lat, lng, records)
+            if radius_m:
+                scores *= 1.0 + GEO_BOOST * np.clip(1.0 - distances / radius_m, 0.0, 1.0)
+
+        order = np.argsort(-scores, kind='stable')[:limit]
+        results = []
+        for index in order.tolist():
+            result = dict(records[index], score=round(float(scores[index]), 4))
+            if distances is not None:
+                result['distance'] = round(float(distances[index]))
+            results.append(result)
+        return results
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict]:
+        """
+        名称前缀联想
+
+        Args:
+            prefix: 输入前缀
+            limit: 返回数量
+
+        Returns:
+            POI记录，较短的名称优先
+        """
+        with self._lock:
+            return [self.record(doc) for doc in self.text.suggest(prefix, limit)]
+
+    def clusters(self, west: float, south: float, east: float, north: float, zoom: int) -> Dict:
+        """
+        地图视口内的POI聚合
+
+        Args:
+            west: 视口西边界经度
+            south: 视口南边界纬度
+            east: 视口东边界经度
+            north: 视口北边界纬度
+            zoom: 地图缩放级别
+
+        Returns:
+            含clusters（聚合点）、pois（单个POI记录）和total（POI总数）的字典
+
+        Raises:
+            ValueError: 视口覆盖的网格过多
+        """
+        with self._lock:
+            clusters, positions = self.clustering.query(west, south, east, north, zoom)
+        pois = [self.record(position) for position in positions]
+        return {
+            'clusters': clusters,
+            'pois': pois,
+            'total': sum(cluster['count'] for cluster in clusters) + len(pois)
+        }
+
+
+_index: Optional[PoiIndex] = None
+_index_lock = threading.Lock()
+# 后台刷新线程运行期间持有
+_refresh_lock = threading.Lock()
+_retry_at = 0.0
+
+
+def build_poi_index() -> PoiIndex:
+    """从内置目录和POI表构建新的POI索引（需要应用上下文）"""
+    return PoiIndex(load_poi_records(), get_catalog())
+
+
+def get_poi_index() -> PoiIndex:
+    """
+    获取当前进程的POI索引（需要应用上下文）
+
+    首次调用时同步构建；之后的到期刷新和目录更新后的重建都在后台线程进行，请求始终使用当前索引而不等待。
+    """
+    global _index
+    current = _index
+    if current is None:
+        with _index_lock:
+            if _index is None:
+                _index = build_poi_index()
+            return _index
+
+    if time.monotonic() >= _retry_at and (current.refresh_due() or current.catalog_changed()):
+        _start_refresh(current_app._get_current_object())
+    return current
+
+
+def _start_refresh(app: Flask):
+    """启动后台刷新线程；已有刷新在进行时不重复启动"""
+    if not _refresh_lock.acquire(blocking=False):
+        return
+    try:
+        threading.Thread(target=_refresh, args=(app,), name='poi-index-refresh', daemon=True).start()
+    except Exception:
+        _refresh_lock.release()
+        raise
+
+
+def _refresh(app: Flask):
+    """后台刷新：目录已重新构建或失效记录过多时完整重建，否则只同步POI表的变化"""
+    global _index, _retry_at
+    try:
+        with app.app_context():
+            current = _index
+            if current.catalog_changed() or current.fragmented():
+                _index = current = build_poi_index()
+            # 完整重建后再同步一次，补上构建期间写入的POI
+            current.refresh(load_poi_records)
+    except Exception:
+        logger.exception('POI索引刷新失败')
+        _retry_at = time.monotonic() + REFRESH_RETRY_DELAY
+    finally:
+        _refresh_lock.release()
+
+
+def index_poi(poi: POI):
+    """将新建或修改的POI加入已构建的索引"""
+    if _index is not None:
+        _index.add(poi_record(poi))
+
+
+def unindex_poi(poi_id: str):
+    """从已构建的索引中移除POI"""
+    if _index is not None:
+        _index.remove(poi_id)
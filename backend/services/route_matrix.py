@@ -0,0 +1,171 @@
+"""
+距离矩阵服务
+起点×终点矩阵按固定大小的瓦片向量化计算，瓦片存入单独的瓦片缓存（独立的内存上限和共享键前缀，
+配置Redis时跨进程共享），不与行程规划争用距离缓存；超大的一次性请求只读缓存不写入。
+起点和终点相同的中小规模矩阵走优化器的分块距离缓存，与行程规划共用缓存条目
+"""
+
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from algorithms.distance_cache import DistanceCache, get_matrix_tile_cache
+from algorithms.distance_matrix import compute_distance_matrix
+from algorithms.route_optimizer import RouteOptimizer
+from catalog.store import get_catalog
+from models.trip import POI
+
+# 每侧最多的点数
+MAX_MATRIX_POINTS = 5000
+
+# 瓦片边长（点数），每个瓦片作为一个缓存条目
+MATRIX_TILE_SIZE = 256
+
+# 单元格数超过该值时逐行流式返回
+STREAM_THRESHOLD_CELLS = 250_000
+
+# 起点即终点且不超过该点数时使用优化器的分块距离缓存
+SHARED_SQUARE_MAX = 512
+
+# 单次请求超过该瓦片数时不写入缓存（一次性的大矩阵，缓存只会挤掉其他条目）
+MAX_CACHED_TILES = 16
+
+# 支持的交通方式（与RouteOptimizer.calculate_time_estimate一致）
+TRANSPORT_MODES = ('driving', 'walking', 'cycling', 'transit')
+
+
+def resolve_points(items: Sequence) -> np.ndarray:
+    """
+    解析矩阵的点：坐标对象{lat, lng}、带coordinates的POI对象，或POI ID（行程POI或内置目录）
+
+    Args:
+        items: 点列表
+
+    Returns:
+        (n, 2)坐标数组
+
+    Raises:
+        ValueError: 格式错误、坐标超出范围或POI不存在
+    """
+    ids = [item for item in items if isinstance(item, str)]
+    known = {}
+    if ids:
+        for poi in POI.query.filter(POI.id.in_(set(ids))).all():
+            known[poi.id] = (poi.latitude, poi.longitude)
+        catalog = get_catalog()
+        for poi_id in ids:
+            if poi_id not in known and catalog is not None:
+                record = catalog.get(poi_id)
+                if record is not None:
+                    known[poi_id] = (record['coordinates']['lat'], record['coordinates']['lng'])
+
+    coordinates = np.empty((len(items), 2), dtype=np.float64)
+    for index, item in enumerate(items):
+        if isinstance(item, str):
+            if item not in known:
+                raise ValueError(f'POI不存在: {item}')
+            coordinates[index] = known[item]
+            continue
+        if not isinstance(item, dict):
+            raise ValueError(f'第{index + 1}个点格式错误')
+        point = item.get('coordinates') or item
+        try:
+            lat, lng = float(point['lat']), float(point['lng'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'第{index + 1}个点格式错误')
+        if not -90 <= lat <= 90 or not -180 <= lng <= 180:
+            raise ValueError(f'第{index + 1}个点坐标超出范围')
+        coordinates[index] = (lat, lng)
+    return coordinates
+
+
+def distance_tile(cache: DistanceCache, mode: str, origins: np.ndarray, destinations: np.ndarray,
+                  store: bool = True) -> np.ndarray:
+    """
+    计算一个瓦片的距离（公里），先查缓存，距离对称因此也查转置的瓦片
+
+    Args:
+        cache: 瓦片缓存
+        mode: 距离计算模式
+        origins: 瓦片的起点坐标
+        destinations: 瓦片的终点坐标
+        store: 未命中时是否写入缓存
+
+    Returns:
+        (len(origins), len(destinations))只读距离数组
+    """
+    key = cache.matrix_key(np.concatenate([origins, destinations]), mode, kind=f'tile{len(origins)}')
+    tile = cache.get_array(key)
+    if tile is not None:
+        return tile
+
+    transposed_key = cache.matrix_key(np.concatenate([destinations, origins]), mode,
+                                      kind=f'tile{len(destinations)}')
+    transposed = cache.get_array(transposed_key)
+    if transposed is not None:
+        return transposed.T
+
+    tile = compute_distance_matrix(origins, destinations, mode=mode)
+    if store:
+        cache.set_array(key, tile)
+    else:
+        tile.setflags(write=False)
+    return tile
+
+
+def iter_matrix_rows(optimizer: RouteOptimizer, origins: np.ndarray, destinations: Optional[np.ndarray],
+                     transport_mode: str = 'driving', time_of_day: int = 9,
+                     is_weekend: bool = False) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+    """
+    按行块计算距离和时间矩阵
+
+    Args:
+        optimizer: 提供距离模式、时间估算和距离缓存的路线优化器
+        origins: (n, 2)起点坐标
+        destinations: (m, 2)终点坐标，为空时与起点相同
+        transport_mode: 交通方式
+        time_of_day: 出发时间（小时）
+        is_weekend: 是否为周末
+
+    Returns:
+        (起始行号, 距离块（公里）, 时间块（分钟）)迭代器，每块最多MATRIX_TILE_SIZE行
+    """
+    if destinations is None and len(origins) <= SHARED_SQUARE_MAX:
+        distances = optimizer.build_distance_matrix(
+            [{'coordinates': {'lat': lat, 'lng': lng}} for lat, lng in origins.tolist()]
+        )
+        yield 0, distances, optimizer.calculate_time_estimates(distances, transport_mode, time_of_day, is_weekend)
+        return
+
+    if destinations is None:
+        destinations = origins
+    cache = get_matrix_tile_cache()
+    tile_count = -(-len(origins) // MATRIX_TILE_SIZE) * -(-len(destinations) // MATRIX_TILE_SIZE)
+    store = tile_count <= MAX_CACHED_TILES
+    for row_start in range(0, len(origins), MATRIX_TILE_SIZE):
+        band = origins[row_start:row_start + MATRIX_TILE_SIZE]
+        tiles = [distance_tile(cache, optimizer.distance_mode, band,
+                               destinations[col_start:col_start + MATRIX_TILE_SIZE], store)
+                 for col_start in range(0, len(destinations), MATRIX_TILE_SIZE)]
+        distances = np.hstack(tiles) if len(tiles) > 1 else tiles[0]
+        yield row_start, distances, optimizer.calculate_time_estimates(distances, transport_mode,
+                                                                       time_of_day, is_weekend)
+
+
+def row_payload(distances: np.ndarray, durations: np.ndarray) -> Tuple[List, List]:
+    """矩阵块转换为JSON列表：距离保留到米，时间为整数分钟"""
+    return np.round(distances, 3).tolist(), durations.tolist()
+
+
+def matrix_header(origins: int, destinations: int, transport_mode: str, distance_mode: str) -> Dict:
+    """矩阵响应的公共字段"""
+    return {
+        'origins': origins,
+        'destinations': destinations,
+        'transportMode': transport_mode,
+        'distanceMode': distance_mode,
+        'units': {
+            'distance': 'km',
+            'duration': 'min'
+        }
+    }
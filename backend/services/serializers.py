@@ -0,0 +1,153 @@
+"""
+行程序列化
+按需预加载嵌套集合（selectinload），列表视图使用只含数量的精简投影，避免逐行懒加载产生的N+1查询
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+
+from database import db
+from models.trip import Trip, POI, DayItinerary
+
+# 可通过fields参数展开的嵌套集合
+TRIP_COLLECTIONS = ('pois', 'day_itineraries')
+
+# 列表视图默认不展开集合，详情视图默认全部展开
+LIST_FIELDS: Tuple[str, ...] = ()
+DETAIL_FIELDS: Tuple[str, ...] = TRIP_COLLECTIONS
+
+
+def parse_fields(value: Optional[str], default: Sequence[str]) -> Tuple[str, ...]:
+    """
+    解析fields查询参数
+
+    Args:
+        value: 逗号分隔的集合名称；None表示使用默认值，空字符串表示不展开任何集合
+        default: 默认展开的集合
+
+    Returns:
+        需要展开的集合名称
+
+    Raises:
+        ValueError: 包含未知的集合名称
+    """
+    if value is None:
+        return tuple(default)
+
+    fields = []
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in TRIP_COLLECTIONS:
+            raise ValueError(f'未知字段: {name}，可选值为{", ".join(TRIP_COLLECTIONS)}')
+        if name not in fields:
+            fields.append(name)
+    return tuple(fields)
+
+
+def parse_bool(value, name: str) -> bool:
+    """
+    解析请求中的布尔参数：接受JSON布尔值或'true'/'false'字符串（不区分大小写）
+
+    Args:
+        value: 参数值
+        name: 参数名（用于错误信息）
+
+    Returns:
+        布尔值
+
+    Raises:
+        ValueError: 其他类型或取值
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ('true', 'false'):
+        return value.strip().lower() == 'true'
+    raise ValueError(f'{name}必须是true或false')
+
+
+def with_collections(query, include: Iterable[str]):
+    """
+    为行程查询添加嵌套集合的预加载选项
+
+    每个展开的集合只额外发出一条IN查询，与返回的行程数量无关。
+
+    Args:
+        query: Trip查询
+        include: 需要展开的集合
+
+    Returns:
+        添加了预加载选项的查询
+    """
+    include = set(include)
+    if 'pois' in include:
+        query = query.options(selectinload(Trip.pois))
+    if 'day_itineraries' in include:
+        query = query.options(selectinload(Trip.day_itineraries))
+    return query
+
+
+def collection_counts(trip_ids: List[str]) -> Dict[str, Dict[str, int]]:
+    """
+    用分组计数查询一次获取多个行程的POI数量和单日行程数量
+
+    Args:
+        trip_ids: 行程ID列表
+
+    Returns:
+        行程ID到{'poi_count', 'day_count'}的映射
+    """
+    counts = {trip_id: {'poi_count': 0, 'day_count': 0} for trip_id in trip_ids}
+    if not trip_ids:
+        return counts
+
+    for key, model in (('poi_count', POI), ('day_count', DayItinerary)):
+        rows = db.session.query(model.trip_id, func.count(model.id)).filter(
+            model.trip_id.in_(trip_ids)
+        ).group_by(model.trip_id)
+        for trip_id, count in rows:
+            counts[trip_id][key] = count
+    return counts
+
+
+def serialize_trips(trips: List[Trip], include: Sequence[str]) -> List[Dict]:
+    """
+    序列化行程列表
+
+    未展开的集合以数量代替（poi_count、day_count），由分组计数查询得到，不加载集合本身。
+
+    Args:
+        trips: 行程列表（展开的集合应已通过with_collections预加载）
+        include: 需要展开的集合
+
+    Returns:
+        行程字典列表
+    """
+    counts = None
+    if set(TRIP_COLLECTIONS) - set(include):
+        counts = collection_counts([trip.id for trip in trips])
+
+    result = []
+    for trip in trips:
+        data = trip.to_dict(include=include)
+        if counts is not None:
+            data.update(counts[trip.id])
+        result.append(data)
+    return result
+
+
+def serialize_trip(trip: Trip, include: Sequence[str] = DETAIL_FIELDS) -> Dict:
+    """
+    序列化单个行程
+
+    Args:
+        trip: 行程
+        include: 需要展开的集合
+
+    Returns:
+        行程字典
+    """
+    return serialize_trips([trip], include)[0]
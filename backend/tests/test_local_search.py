@@ -0,0 +1,54 @@
+"""
+局部搜索测试：2-opt与Or-opt不会让路线变长，结果仍是以原起点开头的排列
+"""
+
+import numpy as np
+import pytest
+
+from algorithms.distance_matrix import route_length
+from algorithms.local_search import _Budget, build_neighbour_lists, improve_route, or_opt, two_opt
+
+SIZES = [3, 4, 5, 8, 20, 60]
+
+
+def random_instance(seed: int, n: int):
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, 10, size=(n, 2))
+    matrix = np.linalg.norm(points[:, None, :] - points[None, :, :], axis=2)
+    return matrix, [int(city) for city in rng.permutation(n)]
+
+
+@pytest.mark.parametrize('stage', [two_opt, or_opt])
+@pytest.mark.parametrize('n', SIZES)
+def test_stage_never_lengthens_route(stage, n):
+    for seed in range(10):
+        matrix, route = random_instance(seed * 100 + n, n)
+        original = list(route)
+
+        moves = stage(matrix.tolist(), route, build_neighbour_lists(matrix), _Budget(None, None))
+
+        assert sorted(route) == list(range(n))
+        assert route[0] == original[0]
+        assert route_length(matrix, route) <= route_length(matrix, original) + 1e-9
+        if moves == 0:
+            assert route == original
+
+
+@pytest.mark.parametrize('n', SIZES)
+def test_improve_route_never_lengthens_route(n):
+    for seed in range(10):
+        matrix, route = random_instance(seed * 100 + n, n)
+
+        improved, _ = improve_route(matrix, route)
+
+        assert sorted(improved) == list(range(n))
+        assert improved[0] == route[0]
+        assert route_length(matrix, improved) <= route_length(matrix, route) + 1e-9
+
+
+def test_iteration_budget_limits_moves():
+    matrix, route = random_instance(7, 60)
+
+    _, moves = improve_route(matrix, route, max_iterations=3)
+
+    assert moves <= 3
@@ -0,0 +1,66 @@
+"""
+POI索引测试：到期刷新只同步POI表的变化，不重建全文索引和聚合索引
+"""
+
+import pytest
+
+from services import poi_index
+from services.poi_index import PoiIndex
+
+
+def record(poi_id: str, name: str, lat: float = 39.9, lng: float = 116.4, category: str = '景点'):
+    return {'id': poi_id, 'name': name, 'coordinates': {'lat': lat, 'lng': lng}, 'category': category}
+
+
+def ids(results):
+    return {result['id'] for result in results}
+
+
+@pytest.fixture
+def index():
+    return PoiIndex([record('a', '故宫博物院'), record('b', '景山公园', 39.92)])
+
+
+def test_refresh_applies_only_changes(index):
+    text, clustering = index.text, index.clustering
+
+    index.refresh(lambda: [record('b', '景山公园', 39.92), record('c', '北海公园', 39.93)])
+
+    assert index.text is text and index.clustering is clustering
+    assert ids(index.search('公园')) == {'b', 'c'}
+    assert ids(index.nearby(39.9, 116.4, 10000)) == {'b', 'c'}
+    # 未变化的记录保留原位置
+    assert index.positions['b'] == 1
+
+
+def test_refresh_replaces_modified_record(index):
+    index.refresh(lambda: [record('a', '故宫'), record('b', '景山公园', 39.92)])
+
+    assert index.search('博物院') == []
+    assert ids(index.search('故宫')) == {'a'}
+
+
+def test_writes_during_refresh_take_precedence(index):
+    def load():
+        # 读取POI表之后、应用变化之前，本进程新增d并删除b
+        stale = [record('a', '故宫博物院'), record('b', '景山公园', 39.92)]
+        index.add(record('d', '天坛公园', 39.88))
+        index.remove('b')
+        return stale
+
+    index.refresh(load)
+
+    assert ids(index.nearby(39.9, 116.4, 10000)) == {'a', 'd'}
+
+
+def test_refresh_merges_pending_into_grid(index, monkeypatch):
+    monkeypatch.setattr(poi_index, 'PENDING_REBUILD_THRESHOLD', 2)
+    spatial = index.spatial
+    latest = [record('a', '故宫博物院')] + [record(f'n{i}', f'胡同{i}', 39.9 + i / 1000) for i in range(5)]
+
+    index.refresh(lambda: latest)
+
+    assert index.spatial is not spatial
+    assert index.pending == {}
+    assert ids(index.nearby(39.9, 116.4, 10000)) == {record['id'] for record in latest}
+    assert not index.refresh_due()
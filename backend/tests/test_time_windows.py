@@ -0,0 +1,61 @@
+"""
+营业时间窗测试：open_hours解析，以及按时间窗调整顺序后消除超时
+"""
+
+import numpy as np
+import pytest
+
+from algorithms.time_windows import TimeWindowProblem, parse_open_hours, solve_with_time_windows, visit_start
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('09:00-18:00', ((540, 1080),)),
+    ('周一至周日 08:30-17:00', ((510, 1020),)),
+    ('18:00-次日02:00', ((1080, 1560),)),
+    ('22:00-02:00', ((1320, 1560),)),
+    ('11:00-14:00，17:00-21:00', ((660, 840), (1020, 1260))),
+    ('17:00-21:00; 11:00-14:00', ((660, 840), (1020, 1260))),
+    ('09:00-12:00，11:30-15:00', ((540, 900),)),
+])
+def test_parse_open_hours(text, expected):
+    assert parse_open_hours(text) == expected
+
+
+@pytest.mark.parametrize('text', [None, '', '全天', '全天开放', '24小时营业', '00:00-24:00', '节假日另行通知'])
+def test_parse_open_hours_unrestricted(text):
+    assert parse_open_hours(text) is None
+
+
+def test_visit_start_waits_for_next_window():
+    windows = parse_open_hours('11:00-14:00，17:00-21:00')
+
+    assert visit_start(600, 60, windows) == (660, 0.0)
+    assert visit_start(800, 60, windows) == (1020, 0.0)
+    assert visit_start(1230, 60, windows) == (1230, 30)
+
+
+def test_solver_removes_lateness_of_distance_order():
+    # 三个POI排成一线，距离顺序为0→1→2，但2只在上午开放一小时
+    positions = np.array([0.0, 1.0, 2.0])
+    dist = np.abs(positions[:, None] - positions[None, :])
+    travel = dist * 10
+    windows = [None, None, parse_open_hours('09:00-10:00')]
+    problem = TimeWindowProblem(dist, travel, stay=[60, 60, 60], windows=windows, day_start=540)
+
+    _, lateness = problem.timeline([0, 1, 2])
+    assert lateness[-1] > 0
+
+    route, total_lateness, moves = solve_with_time_windows(problem, [0, 1, 2])
+
+    assert total_lateness == 0
+    assert problem.timeline(route)[1][-1] == 0
+    assert sorted(route) == [0, 1, 2]
+    assert moves > 0
+
+
+def test_solver_keeps_feasible_route():
+    dist = np.array([[0.0, 1.0], [1.0, 0.0]])
+    problem = TimeWindowProblem(dist, dist * 10, stay=[60, 60],
+                                windows=[parse_open_hours('09:00-18:00'), None], day_start=540)
+
+    assert solve_with_time_windows(problem, [0, 1]) == ([0, 1], 0.0, 0)
@@ -0,0 +1,44 @@
+"""
+TSP求解器测试：Held-Karp与暴力枚举在小规模随机矩阵上的最优值一致
+"""
+
+from itertools import permutations
+
+import numpy as np
+import pytest
+
+from algorithms.distance_matrix import route_length
+from algorithms.tsp_solvers import HELD_KARP_MAX_SIZE, held_karp_path
+
+
+def brute_force_length(matrix: np.ndarray, start: int) -> float:
+    others = [i for i in range(len(matrix)) if i != start]
+    return min(route_length(matrix, [start, *order]) for order in permutations(others))
+
+
+def random_matrix(rng: np.random.Generator, n: int, symmetric: bool) -> np.ndarray:
+    if symmetric:
+        points = rng.uniform(0, 10, size=(n, 2))
+        return np.linalg.norm(points[:, None, :] - points[None, :, :], axis=2)
+    matrix = rng.uniform(1, 10, size=(n, n))
+    np.fill_diagonal(matrix, 0)
+    return matrix
+
+
+@pytest.mark.parametrize('symmetric', [True, False])
+@pytest.mark.parametrize('n', range(1, 9))
+def test_held_karp_matches_brute_force(n, symmetric):
+    rng = np.random.default_rng(n * 2 + symmetric)
+    for trial in range(5):
+        matrix = random_matrix(rng, n, symmetric)
+        start = trial % n
+        path = held_karp_path(matrix, start)
+
+        assert path[0] == start
+        assert sorted(path) == list(range(n))
+        assert route_length(matrix, path) == pytest.approx(brute_force_length(matrix, start))
+
+
+def test_held_karp_rejects_oversized_input():
+    with pytest.raises(ValueError):
+        held_karp_path(np.zeros((HELD_KARP_MAX_SIZE + 1, HELD_KARP_MAX_SIZE + 1)))
@@ -87,8 +87,11 @@ export const tripsAPI = {
   // 从行程移除POI
   removePOI: (tripId, poiId) => api.delete(`/trips/${tripId}/pois/${poiId}`),
   
-  // 规划行程路线
-  planTrip: (tripId) => api.post(`/trips/${tripId}/plan`),
+  // 提交行程路线规划任务
+  planTrip: (tripId, planData = {}) => api.post(`/trips/${tripId}/plan`, planData),
+  
+  // 查询规划任务状态
+  getPlanJob: (tripId, jobId) => api.get(`/trips/${tripId}/plan/${jobId}`),
 };
 
 // POI API
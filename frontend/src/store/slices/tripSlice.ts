@@ -48,12 +48,42 @@ export const createTrip = createAsyncThunk(
   }
 );
 
+// 规划任务轮询：间隔从1秒开始按1.5倍退避到最长5秒，总等待不超过5分钟
+const PLAN_POLL_INITIAL_MS = 1000;
+const PLAN_POLL_MAX_INTERVAL_MS = 5000;
+const PLAN_POLL_TIMEOUT_MS = 5 * 60 * 1000;
+
 // 异步thunk - 规划行程路线
 export const planTripRoute = createAsyncThunk(
   'trip/planTripRoute',
   async (tripId: string, { rejectWithValue }) => {
     try {
-      const response = await tripsAPI.planTrip(tripId);
+      // 规划在后台任务中执行，轮询任务状态直到结束
+      const submitResponse = await tripsAPI.planTrip(tripId);
+      let job = submitResponse.data.job;
+      let interval = PLAN_POLL_INITIAL_MS;
+      const deadline = Date.now() + PLAN_POLL_TIMEOUT_MS;
+      while (job.status !== 'succeeded' && job.status !== 'failed') {
+        if (Date.now() + interval > deadline) {
+          return rejectWithValue('路线规划超时，请稍后刷新行程查看结果');
+        }
+        await new Promise(resolve => setTimeout(resolve, interval));
+        interval = Math.min(interval * 1.5, PLAN_POLL_MAX_INTERVAL_MS);
+        try {
+          const jobResponse = await tripsAPI.getPlanJob(tripId, job.job_id);
+          job = jobResponse.data.job;
+        } catch (error: any) {
+          // 任务已被清理或不在当前可查询的工作进程中，不再继续轮询
+          if (error.response?.status === 404) {
+            return rejectWithValue('规划任务不存在或已过期，请重新规划');
+          }
+          throw error;
+        }
+      }
+      if (job.status === 'failed') {
+        return rejectWithValue(job.error || '路线规划失败');
+      }
+      const response = await tripsAPI.getTrip(tripId);
       return response.data.trip;
     } catch (error: any) {
       const message = error.response?.data?.error || '路线规划失败';